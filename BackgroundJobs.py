@@ -0,0 +1,99 @@
+"""
+Run validation, simulation and file transfer jobs off of the Qt UI thread.
+
+A job is a function that takes the BackgroundJob running it as its first argument.  The job reports progress and
+output through the BackgroundJob and the results are delivered to the GUI through Qt signals.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import threading
+import traceback
+
+from PySide6 import QtCore
+
+__version__ = "1.0.0"
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside of a job when the user has cancelled it.
+    """
+
+    def __init__(self, msg="Job cancelled", *args):
+        super(JobCancelled, self).__init__(msg, *args)
+
+
+class JobSignals(QtCore.QObject):
+    # Items done and total items.  A total of 0 means the length of the job is unknown.
+    progress = QtCore.Signal(int, int)
+    output = QtCore.Signal(str)
+    result = QtCore.Signal(object)
+    error = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+    finished = QtCore.Signal()
+
+
+class BackgroundJob(QtCore.QRunnable):
+    def __init__(self, function, *args, **kwargs):
+        super(BackgroundJob, self).__init__()
+        # The GUI holds on to the job so Qt must not delete it when run() returns.
+        self.setAutoDelete(False)
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self._cancel_event = threading.Event()
+        self._cancel_callbacks = []
+
+    def run(self):
+        try:
+            result = self.function(self, *self.args, **self.kwargs)
+        except JobCancelled:
+            self.signals.cancelled.emit()
+        except Exception:
+            if self.is_cancelled():
+                # Stopping a job usually means closing whatever it was waiting on, which raises in the job.
+                self.signals.cancelled.emit()
+            else:
+                self.signals.error.emit(traceback.format_exc())
+        else:
+            if self.is_cancelled():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+    def cancel(self):
+        """
+        Called from the GUI thread.  Flags the job and runs the callbacks that stop whatever the job is waiting on.
+        :return:
+        """
+        self._cancel_event.set()
+        for callback in self._cancel_callbacks:
+            try:
+                callback()
+            except Exception:
+                traceback.print_exc()
+
+    def on_cancel(self, callback):
+        self._cancel_callbacks.append(callback)
+        if self.is_cancelled():
+            callback()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.is_cancelled():
+            raise JobCancelled()
+
+    def progress(self, done, total=0):
+        self.signals.progress.emit(int(done), int(total))
+
+    def output(self, text):
+        self.signals.output.emit(text)
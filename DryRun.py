@@ -0,0 +1,880 @@
+"""
+Fast dry run of a robot program against a lightweight stand in for the opentrons ProtocolContext.
+
+A full opentrons simulation plans every move and takes several seconds.  For the checks made before it we only need to
+know which liquids and tips go where, so the dry run provides the part of the ProtocolContext, InstrumentContext and
+labware API used by the robot programs and Utilities, and records every aspirate, dispense and tip event in a compact
+list.  A 96 well PCR setup finishes in a few tens of milliseconds.  Mistakes the robot would stop on, such as running
+out of tips or aspirating without a tip, raise DryRunError.  Every tip pick-up is recorded with its box and well, and
+a program that runs out of tips is run to the end so the error can say how many tips it needs.  The liquid in every
+well is followed with a VolumeLedger so wells that run dry or overflow are reported.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import json
+import os
+import re
+import sys
+import time
+import types
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+import TemplateParser
+from TipPlanner import TipPickup, describe_pickups
+from VolumeLedger import VolumeLedger, template_volumes
+
+__version__ = "1.0.0"
+
+# Compact record of one liquid handling or tip step.  Slot and well are where it happened.
+Event = namedtuple("Event", ["command", "mount", "volume", "slot", "well"])
+
+Point = namedtuple("Point", ["x", "y", "z"])
+
+# Display name, minimum and maximum volume in uL and number of channels.
+PIPETTES = {
+    "p10_single": ("P10 Single-Channel GEN1", 1, 10, 1),
+    "p10_multi": ("P10 8-Channel GEN1", 1, 10, 8),
+    "p20_single_gen2": ("P20 Single-Channel GEN2", 1, 20, 1),
+    "p20_multi_gen2": ("P20 8-Channel GEN2", 1, 20, 8),
+    "p300_single_gen2": ("P300 Single-Channel GEN2", 20, 300, 1),
+    "p300_multi_gen2": ("P300 8-Channel GEN2", 20, 300, 8),
+    "p1000_single_gen2": ("P1000 Single-Channel GEN2", 100, 1000, 1),
+    }
+
+# Front left corner of each OT-2 deck slot in mm.
+SLOT_ORIGINS = {
+    1: (0.0, 0.0), 2: (132.5, 0.0), 3: (265.0, 0.0),
+    4: (0.0, 90.5), 5: (132.5, 90.5), 6: (265.0, 90.5),
+    7: (0.0, 181.0), 8: (132.5, 181.0), 9: (265.0, 181.0),
+    10: (0.0, 271.5), 11: (132.5, 271.5), 12: (265.0, 271.5),
+    }
+
+TRASH_SLOT = 12
+TRASH_LABWARE = "opentrons_1_trash_1100ml_fixed"
+
+_volume_in_name = re.compile(r"_(\d+(?:\.\d+)?)(ul|ml)(?:_|$)", re.IGNORECASE)
+
+
+class DryRunError(Exception):
+    """
+    The program did something the robot would stop on.  result is set when the program was run to the end.
+    """
+
+    def __init__(self, msg, result=None, *args):
+        super(DryRunError, self).__init__(msg, *args)
+        self.result = result
+
+
+class Location:
+    """
+    A point on the deck and the well it belongs to.
+    """
+    def __init__(self, point, labware):
+        self.point = point
+        self.labware = labware
+
+    def move(self, point):
+        return Location(Point(self.point.x + point.x, self.point.y + point.y, self.point.z + point.z), self.labware)
+
+    def __repr__(self):
+        return "Location(point={}, labware={})".format(self.point, self.labware)
+
+
+class Well:
+    def __init__(self, parent, name, x, y, depth, diameter, max_volume):
+        self.parent = parent
+        self.well_name = name
+        self.depth = depth
+        self.diameter = diameter
+        self.max_volume = max_volume
+        self.geometry = Point(x, y, 0.0)
+        self.has_tip = parent.is_tiprack
+
+    @property
+    def display_name(self):
+        return "{} of {}".format(self.well_name, self.parent)
+
+    def top(self, z=0.0):
+        return Location(Point(self.geometry.x, self.geometry.y, self.depth + z), self)
+
+    def bottom(self, z=0.0):
+        return Location(Point(self.geometry.x, self.geometry.y, z), self)
+
+    def center(self):
+        return Location(Point(self.geometry.x, self.geometry.y, self.depth / 2), self)
+
+    def __str__(self):
+        return self.display_name
+
+    def __repr__(self):
+        return self.display_name
+
+
+class Labware:
+    """
+    Wells are laid out from the custom labware definition when there is one, otherwise from the well count and volume
+    in the load name.
+    """
+    def __init__(self, load_name, slot, label=None, definition=None):
+        self.load_name = load_name
+        self.slot = slot
+        self.name = label or load_name
+        self.is_tiprack = "tiprack" in load_name
+        self.parent = str(slot)
+        self._wells = []
+
+        origin_x, origin_y = SLOT_ORIGINS.get(slot, (0.0, 0.0))
+        if definition:
+            self.is_tiprack = definition.get("parameters", {}).get("isTiprack", self.is_tiprack)
+            for column in definition["ordering"]:
+                for name in column:
+                    well = definition["wells"][name]
+                    self._wells.append(Well(self, name, origin_x + well["x"], origin_y + well["y"], well["depth"],
+                                            well.get("diameter", well.get("xDimension", 0)), well["totalLiquidVolume"]))
+        else:
+            rows, columns, pitch = _grid(load_name)
+            max_volume = _name_volume(load_name)
+            for column in range(columns):
+                for row in range(rows):
+                    name = "{}{}".format(chr(ord("A") + row), column + 1)
+                    self._wells.append(Well(self, name, origin_x + 14.4 + column * pitch,
+                                            origin_y + 74.2 - row * pitch, 20.0, pitch * 0.6, max_volume))
+
+        self._wells_by_name = {well.well_name: well for well in self._wells}
+
+    def wells(self, *names):
+        if names:
+            return [self._wells_by_name[name] for name in names]
+        return list(self._wells)
+
+    def wells_by_name(self):
+        return dict(self._wells_by_name)
+
+    def columns(self):
+        columns = {}
+        for well in self._wells:
+            columns.setdefault(well.well_name[1:], []).append(well)
+        return list(columns.values())
+
+    def rows(self):
+        rows = {}
+        for well in self._wells:
+            rows.setdefault(well.well_name[0], []).append(well)
+        return list(rows.values())
+
+    def columns_by_name(self):
+        return {column[0].well_name[1:]: column for column in self.columns()}
+
+    def rows_by_name(self):
+        return {row[0].well_name[0]: row for row in self.rows()}
+
+    def next_tip(self, channels=1, start=None):
+        """
+        First well, at or after start, that still has a tip.  Multichannel pipettes need a full column.
+        :param channels:
+        :param start:
+        :return:
+        """
+        wells = self._wells[self._wells.index(start):] if start in self._wells else self._wells
+        if channels == 1:
+            return next((well for well in wells if well.has_tip), None)
+
+        for column in self.columns():
+            if column[0] in wells and all(well.has_tip for well in column[:channels]):
+                return column[0]
+        return None
+
+    def channel_wells(self, well, channels=1):
+        """
+        Wells reached by the channels of a pipette with its first channel in the well.  Every channel is in the one
+        well of a reservoir column, and an 8-channel pipette takes every other row of a 384 well plate.
+        :param well:
+        :param channels:
+        :return:
+        """
+        if channels == 1:
+            return [well]
+        column = self.columns_by_name()[well.well_name[1:]]
+        if len(column) == 1:
+            return [well] * channels
+        step = 2 if len(column) >= 2 * channels else 1
+        start = column.index(well)
+        return column[start:start + channels * step:step]
+
+    def use_tips(self, well, channels=1):
+        column = self.columns_by_name()[well.well_name[1:]]
+        used = [well] if channels == 1 else column[column.index(well):column.index(well) + channels]
+        for tip in used:
+            tip.has_tip = False
+
+    def reset(self):
+        for well in self._wells:
+            well.has_tip = self.is_tiprack
+
+    def set_offset(self, x, y, z):
+        pass
+
+    def __getitem__(self, name):
+        return self._wells_by_name[name]
+
+    def __str__(self):
+        return "{} on slot {}".format(self.name, self.slot)
+
+    def __repr__(self):
+        return str(self)
+
+
+def _grid(load_name):
+    """
+    Rows, columns and well pitch in mm for labware without a definition file.
+    :param load_name:
+    :return:
+    """
+    if "384" in load_name:
+        return 16, 24, 4.5
+    if "_12_reservoir" in load_name:
+        return 1, 12, 9.0
+    if "_24_" in load_name:
+        return 4, 6, 19.3
+    if "_15_" in load_name:
+        return 3, 5, 25.0
+    if "_1_" in load_name:
+        return 1, 1, 0.0
+    return 8, 12, 9.0
+
+
+def _name_volume(load_name):
+    match = _volume_in_name.search(load_name)
+    if not match:
+        return 200.0
+    volume = float(match.group(1))
+    return volume * 1000 if match.group(2).lower() == "ml" else volume
+
+
+def custom_labware_definitions(labware_dir):
+    """
+    Custom labware definitions in the directory, keyed by load name.
+    :param labware_dir:
+    :return:
+    """
+    definitions = {}
+    if not labware_dir or not os.path.isdir(labware_dir):
+        return definitions
+
+    for file_name in sorted(os.listdir(labware_dir)):
+        if not file_name.lower().endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(labware_dir, file_name)) as labware_file:
+                definition = json.load(labware_file)
+            definitions[definition["parameters"]["loadName"]] = definition
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+
+    return definitions
+
+
+def _well_of(location):
+    if isinstance(location, Well):
+        return location
+    if isinstance(location, Labware):
+        return location.wells()[0]
+    labware = getattr(location, "labware", None)
+    # opentrons.types.Location keeps the well in a LabwareLike wrapper.
+    labware = getattr(labware, "object", labware)
+    return labware if isinstance(labware, Well) else None
+
+
+class FlowRates:
+    def __init__(self, max_volume):
+        self.aspirate = self.dispense = self.blow_out = round(max_volume * 0.3786, 2)
+
+
+class Clearances:
+    def __init__(self):
+        self.aspirate = 1.0
+        self.dispense = 1.0
+
+
+class InstrumentContext:
+    def __init__(self, ctx, instrument_name, mount, tip_racks):
+        try:
+            self.display_name, self.min_volume, self.max_volume, self.channels = PIPETTES[instrument_name]
+        except KeyError:
+            raise DryRunError("Pipette {} is not known to the dry run.".format(instrument_name))
+
+        self._ctx = ctx
+        self.name = instrument_name
+        self.model = instrument_name
+        self.mount = mount
+        self.tip_racks = list(tip_racks or [])
+        self.starting_tip = None
+        self.trash_container = ctx.fixed_trash
+        self.flow_rate = FlowRates(self.max_volume)
+        self.well_bottom_clearance = Clearances()
+        self.default_speed = 400.0
+        self.current_volume = 0.0
+        self.has_tip = False
+        self.tip_pickups = []
+        self._tip_location = None
+        self._last_well = None
+
+    @property
+    def tips_used(self):
+        return len(self.tip_pickups)
+
+    @property
+    def tips_missing(self):
+        return sum(1 for pickup in self.tip_pickups if pickup.slot is None)
+
+    @property
+    def hw_pipette(self):
+        return {"name": self.name, "channels": self.channels, "max_volume": self.max_volume,
+                "has_tip": self.has_tip}
+
+    def _record(self, command, volume=None, well=None):
+        if well is not None:
+            self._last_well = well
+            self._ctx.events.append(Event(command, self.mount, volume, well.parent.slot, well.well_name))
+        else:
+            self._ctx.events.append(Event(command, self.mount, volume, None, ""))
+
+    def _target(self, location, command):
+        well = _well_of(location) if location is not None else self._last_well
+        if well is None:
+            raise DryRunError("{} on the {} pipette has no location.".format(command, self.mount))
+        return well
+
+    def _channel_wells(self, well):
+        # Volumes are per channel.  Each channel's well gets its share in the ledger.
+        return well.parent.channel_wells(well, self.channels)
+
+    def pick_up_tip(self, location=None, presses=None, increment=None, prep_after=None):
+        if self.has_tip:
+            raise DryRunError("Cannot pick up a tip with a tip attached on the {} pipette.".format(self.mount))
+
+        if location is not None:
+            well = _well_of(location)
+            if well is None:
+                well = location.next_tip(self.channels)
+        else:
+            # Tips before the starting tip are never used.
+            well = None
+            tip_racks = self.tip_racks
+            start = None
+            if self.starting_tip is not None and self.starting_tip.parent in tip_racks:
+                tip_racks = tip_racks[tip_racks.index(self.starting_tip.parent):]
+                start = self.starting_tip
+            for tip_rack in tip_racks:
+                well = tip_rack.next_tip(self.channels, start)
+                start = None
+                if well is not None:
+                    break
+
+        self.has_tip = True
+        self._tip_location = well
+        if well is None:
+            # Carry on as if there was a tip so the rest of the program is checked and counted.
+            self.tip_pickups.append(TipPickup(self.tips_used + 1, self.mount, None, None))
+            self._record("pick_up_tip")
+            return self
+
+        well.parent.use_tips(well, self.channels)
+        self.tip_pickups.append(TipPickup(self.tips_used + 1, self.mount, well.parent.slot, well.well_name))
+        self._record("pick_up_tip", well=well)
+        return self
+
+    def drop_tip(self, location=None, home_after=None):
+        if not self.has_tip:
+            raise DryRunError("Cannot drop a tip, the {} pipette has no tip attached.".format(self.mount))
+
+        well = _well_of(location) if location is not None else self.trash_container["A1"]
+        self.has_tip = False
+        self.current_volume = 0.0
+        self._record("drop_tip", well=well)
+        return self
+
+    def return_tip(self, home_after=None):
+        if not self.has_tip:
+            raise DryRunError("Cannot return a tip, the {} pipette has no tip attached.".format(self.mount))
+
+        well = self._tip_location
+        if well is not None:
+            well.has_tip = True
+        self.has_tip = False
+        self.current_volume = 0.0
+        self._record("return_tip", well=well)
+        return self
+
+    def aspirate(self, volume=None, location=None, rate=1.0):
+        well = self._target(location, "Aspirate")
+        if not self.has_tip:
+            raise DryRunError("Cannot aspirate from {} without a tip on the {} pipette.".format(well, self.mount))
+
+        available = self.max_volume - self.current_volume
+        if not volume:
+            volume = available
+        if volume > available + 1e-6:
+            raise DryRunError("Cannot aspirate {} uL from {}.  The {} pipette only has room for {} uL."
+                              .format(volume, well, self.mount, round(available, 2)))
+
+        self.current_volume += volume
+        self._record("aspirate", volume, well)
+        for channel_well in self._channel_wells(well):
+            self._ctx.ledger.aspirate(channel_well.parent.slot, channel_well.well_name, volume, len(self._ctx.events))
+        return self
+
+    def dispense(self, volume=None, location=None, rate=1.0, push_out=None):
+        well = self._target(location, "Dispense")
+        if not volume:
+            volume = self.current_volume
+        if volume > self.current_volume + 1e-6:
+            raise DryRunError("Cannot dispense {} uL into {}.  The {} pipette only holds {} uL."
+                              .format(volume, well, self.mount, round(self.current_volume, 2)))
+
+        self.current_volume -= volume
+        self._record("dispense", volume, well)
+        for channel_well in self._channel_wells(well):
+            self._ctx.ledger.dispense(channel_well.parent.slot, channel_well.well_name, volume, len(self._ctx.events))
+        return self
+
+    def blow_out(self, location=None):
+        well = _well_of(location) if location is not None else self._last_well
+        self._record("blow_out", well=well)
+        if well is not None and self.current_volume:
+            for channel_well in self._channel_wells(well):
+                self._ctx.ledger.dispense(channel_well.parent.slot, channel_well.well_name, self.current_volume,
+                                          len(self._ctx.events))
+        self.current_volume = 0.0
+        return self
+
+    def touch_tip(self, location=None, radius=1.0, v_offset=-1.0, speed=60.0):
+        if not self.has_tip:
+            raise DryRunError("Cannot touch tip without a tip on the {} pipette.".format(self.mount))
+        self._record("touch_tip", well=self._target(location, "Touch tip"))
+        return self
+
+    def air_gap(self, volume=None, height=None):
+        if not self.has_tip:
+            raise DryRunError("Cannot air gap without a tip on the {} pipette.".format(self.mount))
+        volume = volume or self.max_volume - self.current_volume
+        self.current_volume += volume
+        self._record("air_gap", volume)
+        return self
+
+    def mix(self, repetitions=1, volume=None, location=None, rate=1.0):
+        well = self._target(location, "Mix")
+        volume = volume or self.max_volume
+        for _ in range(repetitions):
+            self.aspirate(volume, well, rate)
+            self.dispense(volume, well, rate)
+        return self
+
+    def move_to(self, location, force_direct=False, minimum_z_height=None, speed=None, publish=True):
+        well = _well_of(location)
+        if well is not None:
+            self._last_well = well
+        return self
+
+    def home(self):
+        return self
+
+    def reset_tipracks(self):
+        for tip_rack in self.tip_racks:
+            tip_rack.reset()
+
+    def transfer(self, volume, source, dest, **kwargs):
+        sources = _as_wells(source)
+        destinations = _as_wells(dest)
+        if len(sources) == 1:
+            sources = sources * len(destinations)
+        elif len(destinations) == 1:
+            destinations = destinations * len(sources)
+        if len(sources) != len(destinations):
+            raise DryRunError("Transfer needs the same number of sources and destinations.")
+        volumes = volume if isinstance(volume, (list, tuple)) else [volume] * len(sources)
+
+        new_tip = kwargs.get("new_tip", "once")
+        mix_before = kwargs.get("mix_before")
+        mix_after = kwargs.get("mix_after")
+        self._start_transfer(new_tip)
+        for source_well, destination_well, transfer_volume in zip(sources, destinations, volumes):
+            if new_tip == "always" and not self.has_tip:
+                self.pick_up_tip()
+            for chunk in _chunks(transfer_volume, self.max_volume):
+                if mix_before:
+                    self.mix(mix_before[0], mix_before[1], source_well)
+                self.aspirate(chunk, source_well)
+                if kwargs.get("touch_tip"):
+                    self.touch_tip(source_well)
+                self.dispense(chunk, destination_well)
+                if mix_after:
+                    self.mix(mix_after[0], mix_after[1], destination_well)
+                if kwargs.get("touch_tip"):
+                    self.touch_tip(destination_well)
+                if kwargs.get("blow_out"):
+                    self.blow_out(self._blowout_well(kwargs, source_well, destination_well))
+            if new_tip == "always":
+                self.drop_tip()
+        self._finish_transfer(new_tip, kwargs)
+        return self
+
+    def distribute(self, volume, source, dest, **kwargs):
+        source_well = _as_wells(source)[0]
+        destinations = _as_wells(dest)
+        disposal_volume = kwargs.get("disposal_volume")
+        if disposal_volume is None:
+            disposal_volume = self.min_volume
+
+        new_tip = kwargs.get("new_tip", "once")
+        self._start_transfer(new_tip)
+        per_aspirate = max(1, int((self.max_volume - disposal_volume) // volume)) if volume else len(destinations)
+        for i in range(0, len(destinations), per_aspirate):
+            if new_tip == "always" and not self.has_tip:
+                self.pick_up_tip()
+            group = destinations[i:i + per_aspirate]
+            self.aspirate(volume * len(group) + disposal_volume, source_well)
+            if kwargs.get("touch_tip"):
+                self.touch_tip(source_well)
+            for destination_well in group:
+                self.dispense(volume, destination_well)
+                if kwargs.get("touch_tip"):
+                    self.touch_tip(destination_well)
+            if disposal_volume or kwargs.get("blow_out"):
+                self.blow_out(self._blowout_well(kwargs, source_well, group[-1]))
+            if new_tip == "always":
+                self.drop_tip()
+        self._finish_transfer(new_tip, kwargs)
+        return self
+
+    def consolidate(self, volume, source, dest, **kwargs):
+        sources = _as_wells(source)
+        destination_well = _as_wells(dest)[0]
+
+        new_tip = kwargs.get("new_tip", "once")
+        self._start_transfer(new_tip)
+        per_dispense = max(1, int(self.max_volume // volume)) if volume else len(sources)
+        for i in range(0, len(sources), per_dispense):
+            if new_tip == "always" and not self.has_tip:
+                self.pick_up_tip()
+            group = sources[i:i + per_dispense]
+            for source_well in group:
+                self.aspirate(volume, source_well)
+            self.dispense(volume * len(group), destination_well)
+            if kwargs.get("blow_out"):
+                self.blow_out(self._blowout_well(kwargs, group[-1], destination_well))
+            if new_tip == "always":
+                self.drop_tip()
+        self._finish_transfer(new_tip, kwargs)
+        return self
+
+    def _start_transfer(self, new_tip):
+        if new_tip == "once":
+            self.pick_up_tip()
+
+    def _finish_transfer(self, new_tip, kwargs):
+        if new_tip == "once":
+            if kwargs.get("trash", True):
+                self.drop_tip()
+            else:
+                self.return_tip()
+
+    def _blowout_well(self, kwargs, source_well, destination_well):
+        blowout_location = kwargs.get("blowout_location", "trash")
+        if blowout_location == "source well":
+            return source_well
+        if blowout_location == "destination well":
+            return destination_well
+        return self.trash_container["A1"]
+
+    def __str__(self):
+        return "{} on {} mount".format(self.display_name, self.mount)
+
+    def __repr__(self):
+        return str(self)
+
+
+def _as_wells(locations):
+    if isinstance(locations, Labware):
+        return locations.wells()
+    if isinstance(locations, (list, tuple)):
+        wells = []
+        for location in locations:
+            wells.extend(_as_wells(location))
+        return wells
+    return [_well_of(locations)]
+
+
+def _chunks(volume, max_volume):
+    """
+    Split a volume the pipette cannot hold in one go into equal parts, the way transfer does.
+    :param volume:
+    :param max_volume:
+    :return:
+    """
+    parts = max(1, -(-volume // max_volume))
+    return [volume / parts] * int(parts)
+
+
+class ModuleContext:
+    def __init__(self, ctx, module_name, slot):
+        self._ctx = ctx
+        self.module_name = module_name
+        self.slot = slot
+        self.labware = None
+        self.temperature = None
+
+    def load_labware(self, load_name, label=None, namespace=None, version=None):
+        self.labware = self._ctx.load_labware(load_name, self.slot, label, module=self)
+        return self.labware
+
+    def set_temperature(self, celsius):
+        self.temperature = celsius
+
+    def set_block_temperature(self, temperature, hold_time_seconds=None, hold_time_minutes=None, block_max_volume=None):
+        self.temperature = temperature
+
+    def start_set_temperature(self, celsius):
+        self.temperature = celsius
+
+    def await_temperature(self, celsius):
+        self.temperature = celsius
+
+    def deactivate(self):
+        self.temperature = None
+
+    # Lid, latch and magnet controls have no effect on liquids or tips.
+    def _no_effect(self, *args, **kwargs):
+        pass
+
+    open_lid = close_lid = set_lid_temperature = deactivate_lid = deactivate_block = execute_profile = _no_effect
+    engage = disengage = open_labware_latch = close_labware_latch = _no_effect
+
+
+class ProtocolContext:
+    """
+    Stand in for opentrons.protocol_api.ProtocolContext.  Everything the program does is appended to events.  Wells
+    in empty_slots start with nothing in them and starting_volumes is a list of (slot, well, uL) for the wells whose
+    contents are known.  The contents of every other well are unknown.
+    """
+    def __init__(self, labware_definitions=None, api_version="2.15", empty_slots=(), starting_volumes=()):
+        self.api_version = api_version
+        self.labware_definitions = labware_definitions or {}
+        self.ledger = VolumeLedger()
+        self.empty_slots = set(empty_slots)
+        self.starting_volumes = list(starting_volumes)
+        self.events = []
+        self.comments = []
+        self.loaded_labwares = {}
+        self.loaded_instruments = {}
+        self.loaded_modules = {}
+        self.rail_lights_on = False
+        self.door_closed = True
+        self.max_speeds = {}
+        self.fixed_trash = Labware(TRASH_LABWARE, TRASH_SLOT)
+        self.loaded_labwares[TRASH_SLOT] = self.fixed_trash
+
+    @property
+    def deck(self):
+        return dict(self.loaded_labwares)
+
+    def is_simulating(self):
+        return True
+
+    def load_labware(self, load_name, location, label=None, namespace=None, version=None, module=None):
+        slot = int(location)
+        if slot in self.loaded_labwares:
+            raise DryRunError("Cannot load {} in slot {}.  It already holds {}."
+                              .format(load_name, slot, self.loaded_labwares[slot].load_name))
+        if slot in self.loaded_modules and module is None:
+            raise DryRunError("Cannot load {} in slot {}.  It holds a module, load the labware on the module instead."
+                              .format(load_name, slot))
+
+        labware = Labware(load_name, slot, label, self.labware_definitions.get(load_name))
+        self.loaded_labwares[slot] = labware
+        if not labware.is_tiprack:
+            self.ledger.add_labware(slot, load_name, [(well.well_name, well.max_volume) for well in labware.wells()],
+                                    start_empty=slot in self.empty_slots)
+            for volume_slot, well_name, volume in self.starting_volumes:
+                if volume_slot == slot and well_name in labware.wells_by_name():
+                    self.ledger.set_volume(slot, well_name, volume)
+        return labware
+
+    def load_labware_from_definition(self, labware_def, location, label=None):
+        self.labware_definitions[labware_def["parameters"]["loadName"]] = labware_def
+        return self.load_labware(labware_def["parameters"]["loadName"], location, label)
+
+    def load_instrument(self, instrument_name, mount, tip_racks=None, replace=False):
+        mount = str(mount).lower()
+        if mount in self.loaded_instruments and not replace:
+            raise DryRunError("An instrument is already loaded on the {} mount.".format(mount))
+
+        instrument = InstrumentContext(self, instrument_name, mount, tip_racks)
+        self.loaded_instruments[mount] = instrument
+        return instrument
+
+    def load_module(self, module_name, location=None, configuration=None):
+        slot = int(location) if location is not None else 7
+        module = ModuleContext(self, module_name, slot)
+        self.loaded_modules[slot] = module
+        return module
+
+    def comment(self, msg):
+        self.comments.append(msg)
+        self.events.append(Event("comment", "", None, None, ""))
+
+    def pause(self, msg=None):
+        self.events.append(Event("pause", "", None, None, ""))
+
+    def resume(self):
+        pass
+
+    def delay(self, seconds=0, minutes=0, msg=None):
+        self.events.append(Event("delay", "", None, None, ""))
+
+    def home(self):
+        self.events.append(Event("home", "", None, None, ""))
+
+    def set_rail_lights(self, on):
+        self.rail_lights_on = on
+
+
+class DryRunResult:
+    def __init__(self, ctx, seconds):
+        self.events = ctx.events
+        self.comments = ctx.comments
+        self.seconds = seconds
+        self.instruments = dict(ctx.loaded_instruments)
+        self.modules = dict(ctx.loaded_modules)
+        self.tip_pickups = {mount: instrument.tip_pickups for mount, instrument in ctx.loaded_instruments.items()}
+        self.tips_used = {mount: len(pickups) for mount, pickups in self.tip_pickups.items()}
+        self.counts = Counter(event.command for event in ctx.events)
+        self.ledger = ctx.ledger
+
+    @property
+    def volume_problems(self):
+        return self.ledger.problems
+
+    def summary(self):
+        tips = ", ".join("{} {}".format(count, mount) for mount, count in sorted(self.tips_used.items()))
+        summary = "Dry run: {} steps in {} ms.  Tips used: {}.  {} aspirations, {} dispenses."\
+            .format(len(self.events), round(self.seconds * 1000), tips or "none", self.counts["aspirate"],
+                    self.counts["dispense"])
+        for mount, pickups in sorted(self.tip_pickups.items()):
+            if pickups:
+                summary += "\n{} pipette tips:  {}".format(mount.capitalize(), ";  ".join(describe_pickups(pickups)))
+        if self.volume_problems:
+            summary += "\n{} well volume problem(s):\n{}".format(len(self.volume_problems), self.ledger.report())
+        return summary
+
+
+def _opentrons_modules():
+    opentrons = types.ModuleType("opentrons")
+    protocol_api = types.ModuleType("opentrons.protocol_api")
+    opentrons_types = types.ModuleType("opentrons.types")
+
+    protocol_api.ProtocolContext = ProtocolContext
+    protocol_api.InstrumentContext = InstrumentContext
+    protocol_api.Labware = Labware
+    protocol_api.Well = Well
+    protocol_api.MAX_SUPPORTED_VERSION = (2, 15)
+    opentrons_types.Point = Point
+    opentrons_types.Location = Location
+    opentrons_types.Mount = types.SimpleNamespace(LEFT="left", RIGHT="right")
+    opentrons.protocol_api = protocol_api
+    opentrons.types = opentrons_types
+    opentrons.__version__ = "dry run"
+
+    return {"opentrons": opentrons, "opentrons.protocol_api": protocol_api, "opentrons.types": opentrons_types}
+
+
+@contextmanager
+def _dry_run_environment(protocol_path, tsv_path):
+    """
+    Point the program at the TSV file, its run plan and the stand in opentrons modules, and put everything back
+    afterwards.
+    :param protocol_path:
+    :param tsv_path:
+    :return:
+    """
+    replaced_modules = _opentrons_modules()
+    saved_modules = {name: sys.modules.get(name) for name in replaced_modules}
+    from RunPlan import run_plan_path
+
+    saved_environment = {name: os.environ.get(name) for name in ("OT2_PROCEDURE_TSV", "OT2_RUN_PLAN")}
+    protocol_dir = os.path.dirname(os.path.abspath(protocol_path))
+    added_path = protocol_dir not in sys.path
+
+    sys.modules.update(replaced_modules)
+    os.environ["OT2_PROCEDURE_TSV"] = tsv_path
+    os.environ["OT2_RUN_PLAN"] = run_plan_path(tsv_path)
+    if added_path:
+        sys.path.append(protocol_dir)
+    try:
+        yield
+    finally:
+        for name, module in saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        for name, value in saved_environment.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        if added_path:
+            sys.path.remove(protocol_dir)
+
+
+def _template_volumes(tsv_path):
+    """
+    Slots that start empty and the known starting volumes from the TSV file.
+    :param tsv_path:
+    :return:
+    """
+    sample_dictionary, args = TemplateParser.parse_sample_template(tsv_path)
+    empty_slots = [getattr(args, name, "") for name in ("PCR_PlateSlot", "DilutionPlateSlot")]
+    starting_volumes = [(int(slot), well, volume) for slot, well, volume in template_volumes(args) if slot.isdigit()]
+
+    return {int(slot) for slot in empty_slots if slot.isdigit()}, starting_volumes
+
+
+def dry_run(protocol_path, tsv_path, labware_dir=None):
+    """
+    Run the program's run() against the stand in ProtocolContext and return the result.
+    :param protocol_path:
+    :param tsv_path:
+    :param labware_dir:
+    :return:
+    """
+    start_time = time.perf_counter()
+    with open(protocol_path) as protocol_file:
+        code = compile(protocol_file.read(), protocol_path, "exec")
+
+    with _dry_run_environment(protocol_path, tsv_path):
+        namespace = {"__name__": "dry_run_protocol", "__file__": protocol_path}
+        exec(code, namespace)
+        if "run" not in namespace:
+            raise DryRunError("{} has no run() function.".format(os.path.basename(protocol_path)))
+
+        api_level = namespace.get("requirements", namespace.get("metadata", {})).get("apiLevel", "2.15")
+        ctx = ProtocolContext(custom_labware_definitions(labware_dir), api_level, *_template_volumes(tsv_path))
+        namespace["run"](ctx)
+
+    result = DryRunResult(ctx, time.perf_counter() - start_time)
+    out_of_tips = ["The {} pipette ({}) needs {} tips but only {} are loaded from its first tip on.  Pick-up {} is "
+                   "the first without a tip."
+                   .format(mount, instrument.display_name, instrument.tips_used,
+                           instrument.tips_used - instrument.tips_missing,
+                           instrument.tips_used - instrument.tips_missing + 1)
+                   for mount, instrument in sorted(ctx.loaded_instruments.items()) if instrument.tips_missing]
+    if out_of_tips:
+        raise DryRunError("\n".join(out_of_tips), result)
+
+    return result
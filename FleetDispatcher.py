@@ -0,0 +1,333 @@
+"""
+Share the queued plates between several OT-2 robots.
+
+The robots are listed in a small JSON registry.  Their health is checked in parallel: each one is connected to through
+the connection pool and asked whether opentrons_execute is already running.  Validated plates are queued as jobs and
+each job is given to the next idle robot, where its files are synced and the run is started.  Robots work through their
+jobs at the same time on a thread pool, and every change of a robot's state is passed to on_change so the GUI can show
+it.  With a RobotDiscovery, robots it has found to be unreachable are marked offline without an SSH attempt.  A plate
+that cannot be started is given to the next robot, up to MAX_JOB_ATTEMPTS times.  Transfers and runs made outside the
+queue reserve their robot so no plate is given to it meanwhile.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import itertools
+import json
+import os
+import shutil
+import threading
+from collections import Counter, OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+
+from RobotConnection import DEFAULT_ROBOT, RobotConnectionError
+from RobotRun import RemoteRun, RunProgress, execute_command
+from RobotSync import sync_files, sync_to_robot
+from RunPlan import run_plan_path, run_protocol
+
+__version__ = "1.0.0"
+
+DEFAULT_REGISTRY = os.path.join(os.path.expanduser("~"), ".opentrons_gui", "robots.json")
+DEFAULT_SPOOL_DIR = os.path.join(os.path.expanduser("~"), ".opentrons_gui", "fleet_queue")
+
+# Robot states
+UNKNOWN = "Unknown"
+OFFLINE = "Offline"
+IDLE = "Idle"
+BUSY = "Busy"
+UPLOADING = "Uploading"
+RUNNING = "Running"
+FAILED = "Failed"
+
+# Number of robots a plate is tried on before it is reported failed.
+MAX_JOB_ATTEMPTS = 3
+
+BUSY_CHECK = "pgrep -f opentrons_execute > /dev/null && echo busy || echo idle"
+
+# Everything the robot needs for one plate.  total_steps is the step count of the simulated run log.
+FleetJob = namedtuple("FleetJob", ["job_id", "label", "tsv", "program", "labware_dir", "total_steps"])
+
+# Snapshot of a robot's state handed to on_change.
+RobotStatus = namedtuple("RobotStatus", ["name", "state", "job", "step", "total_steps", "message"])
+
+
+def load_registry(path=DEFAULT_REGISTRY):
+    """
+    Robots from the registry file.  Each entry has a name and may have key_filename, username and port.  Without a
+    registry the one robot the GUI has always used is returned.
+    :param path:
+    :return:
+    """
+    if not os.path.isfile(path):
+        return [{"name": DEFAULT_ROBOT}]
+
+    with open(path) as registry_file:
+        robots = json.load(registry_file)
+
+    return [robot if isinstance(robot, dict) else {"name": robot} for robot in robots]
+
+
+class _Robot:
+    def __init__(self, name, connection_options):
+        self.name = name
+        self.connection_options = connection_options
+        self.state = UNKNOWN
+        self.job = None
+        self.step = 0
+        self.message = ""
+        self.remote_run = None
+        # Transfers and runs made outside the queue that are using the robot.
+        self.reservations = 0
+
+    def status(self):
+        return RobotStatus(self.name, self.state, self.job.label if self.job else "", self.step,
+                           self.job.total_steps if self.job else 0, self.message)
+
+
+class FleetDispatcher:
+    def __init__(self, robots, pool, remote_dir, tsv_name, on_change=None, spool_dir=DEFAULT_SPOOL_DIR,
+                 discovery=None, on_job_done=None):
+        self.pool = pool
+        self.remote_dir = remote_dir
+        self.tsv_name = tsv_name
+        self.on_change = on_change
+        self.spool_dir = spool_dir
+        self.discovery = discovery
+        # Called with the job, the robot's name, its state and message when a job is finished with.  A job put back in
+        # the queue is not finished.
+        self.on_job_done = on_job_done
+        self.robots = OrderedDict()
+        for robot in robots:
+            options = {key: value for key, value in robot.items() if key != "name"}
+            self.robots[robot["name"]] = _Robot(robot["name"], options)
+        self.queue = deque()
+        self._job_ids = itertools.count(1)
+        # Failed starts of each queued job.
+        self._attempts = Counter()
+        self._lock = threading.RLock()
+        # Each robot can be checked and running at once.
+        self._executor = ThreadPoolExecutor(max_workers=max(2, 2 * len(self.robots)), thread_name_prefix="OT2Fleet")
+
+    def _connection(self, robot):
+        return self.pool.get(robot.name, **robot.connection_options)
+
+    def _changed(self, robot):
+        if self.on_change:
+            self.on_change(robot.status())
+
+    def unfinished(self):
+        """
+        Number of jobs queued or on a robot.
+        :return:
+        """
+        with self._lock:
+            return len(self.queue) + sum(1 for robot in self.robots.values() if robot.job is not None)
+
+    def statuses(self):
+        with self._lock:
+            return [robot.status() for robot in self.robots.values()]
+
+    def check_health(self):
+        """
+        Check every robot that is not working on a job, in parallel.  Returns the futures.
+        :return:
+        """
+        with self._lock:
+            robots = [robot for robot in self.robots.values()
+                      if robot.state not in (UPLOADING, RUNNING) and not robot.reservations]
+        return [self._executor.submit(self._check_robot, robot) for robot in robots]
+
+    def _check_robot(self, robot):
+        address = self.discovery.status(robot.name) if self.discovery else None
+        try:
+            if address is not None and address.online is False:
+                raise RobotConnectionError(address.message or "Unreachable")
+            exit_status, stdout, stderr = self._connection(robot).exec_command(BUSY_CHECK)
+            state, message = (BUSY, "Running a program started elsewhere") if "busy" in stdout else (IDLE, "")
+        except RobotConnectionError as error:
+            state, message = OFFLINE, str(error).splitlines()[0]
+
+        with self._lock:
+            if robot.state in (UPLOADING, RUNNING) or robot.reservations:
+                return robot.state
+            robot.state = state
+            robot.message = message
+        self._changed(robot)
+        self.dispatch()
+        return state
+
+    def submit(self, label, tsv, program, labware_dir=None, total_steps=0):
+        """
+        Queue a plate.  The TSV file and its run plan are copied so later edits to them do not change the queued job.
+        :param label:
+        :param tsv:
+        :param program:
+        :param labware_dir:
+        :param total_steps:
+        :return:
+        """
+        job_id = next(self._job_ids)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        spooled_tsv = os.path.join(self.spool_dir, "{}_{}".format(job_id, os.path.basename(tsv)))
+        shutil.copyfile(tsv, spooled_tsv)
+        if os.path.isfile(run_plan_path(tsv)):
+            shutil.copyfile(run_plan_path(tsv), run_plan_path(spooled_tsv))
+
+        job = FleetJob(job_id, label, spooled_tsv, program, labware_dir, total_steps)
+        with self._lock:
+            self.queue.append(job)
+        self.dispatch()
+        return job
+
+    def dispatch(self):
+        """
+        Give queued jobs to idle robots.
+        :return:
+        """
+        with self._lock:
+            started = []
+            for robot in self.robots.values():
+                if not self.queue:
+                    break
+                if robot.state == IDLE:
+                    robot.job = self.queue.popleft()
+                    robot.state = UPLOADING
+                    robot.step = 0
+                    robot.message = ""
+                    started.append((robot, robot.job))
+
+        for robot, job in started:
+            self._changed(robot)
+            self._executor.submit(self._run_job, robot, job)
+
+    def _run_job(self, robot, job):
+        connection = self._connection(robot)
+        run_started = False
+        try:
+            files = sync_files(job.tsv, self.tsv_name, job.program, job.labware_dir)
+            result = sync_to_robot(connection, self.remote_dir, files)
+            if result.mismatched:
+                raise RobotConnectionError("The robot's copy of {} does not match."
+                                           .format(", ".join(file.remote_name for file in result.mismatched)))
+
+            protocol = os.path.basename(run_protocol(job.program, job.tsv))
+            remote_run = RemoteRun(connection, execute_command(self.remote_dir, protocol))
+            with self._lock:
+                robot.remote_run = remote_run
+                robot.state = RUNNING
+            run_started = True
+            remote_run.start()
+            self._changed(robot)
+
+            progress = RunProgress(job.total_steps)
+
+            def lines_received(lines):
+                for line in lines:
+                    progress.feed(line)
+                robot.step = progress.step
+                robot.message = lines[-1].strip()
+                self._changed(robot)
+
+            exit_status = remote_run.wait(on_lines=lines_received)
+            if remote_run.cancelled:
+                state, message = IDLE, "Cancelled"
+            elif exit_status == 0:
+                state, message = IDLE, "Finished {}".format(job.label)
+            else:
+                state, message = FAILED, "{} stopped with exit status {}".format(job.label, exit_status)
+
+        except Exception as error:
+            state, message = FAILED, str(error).splitlines()[0] if str(error) else type(error).__name__
+
+        with self._lock:
+            # A plate that never started goes back to the front of the queue for the next robot, until it has failed to
+            # start too many times.  The robot it failed on is checked again rather than left failed.
+            requeued = False
+            if state == FAILED and not run_started:
+                self._attempts[job.job_id] += 1
+                if self._attempts[job.job_id] < MAX_JOB_ATTEMPTS:
+                    requeued = True
+                    state = UNKNOWN
+                    self.queue.appendleft(job)
+                else:
+                    message = "{}  Gave up after {} attempts.".format(message, MAX_JOB_ATTEMPTS)
+            if not requeued:
+                self._attempts.pop(job.job_id, None)
+            robot.state = state
+            robot.message = message
+            robot.job = None
+            robot.remote_run = None
+        if not requeued:
+            for path in (job.tsv, run_plan_path(job.tsv)):
+                with suppress(OSError):
+                    os.remove(path)
+            if self.on_job_done:
+                self.on_job_done(job, robot.name, state, message)
+        self._changed(robot)
+        if requeued:
+            self._executor.submit(self._check_robot, robot)
+        self.dispatch()
+
+    def reserve(self, robot_name, message):
+        """
+        Keep queued plates off a robot while it is used outside the queue.  Returns False if the robot is working on a
+        queued plate.  Robots that are not in the fleet are not managed here and can always be used.
+        :param robot_name:
+        :param message: Shown as the robot's status while it is reserved.
+        :return:
+        """
+        with self._lock:
+            robot = self.robots.get(robot_name)
+            if robot is None:
+                return True
+            if robot.job is not None:
+                return False
+            robot.reservations += 1
+            robot.state = BUSY
+            robot.message = message
+        self._changed(robot)
+        return True
+
+    def release(self, robot_name):
+        """
+        End a reservation.  The robot is checked again and given plates once nothing else is using it.
+        :param robot_name:
+        :return:
+        """
+        with self._lock:
+            robot = self.robots.get(robot_name)
+            if robot is None or not robot.reservations:
+                return None
+            robot.reservations -= 1
+            if robot.reservations:
+                return None
+            robot.state = UNKNOWN
+            robot.message = ""
+        return self._executor.submit(self._check_robot, robot)
+
+    def cancel(self, robot_name):
+        with self._lock:
+            remote_run = self.robots[robot_name].remote_run
+        if remote_run:
+            remote_run.cancel()
+
+    def reset(self, robot_name):
+        """
+        Make a failed robot available again once the problem has been dealt with.
+        :param robot_name:
+        :return:
+        """
+        with self._lock:
+            robot = self.robots[robot_name]
+            if robot.state == FAILED:
+                robot.state = UNKNOWN
+        return self._executor.submit(self._check_robot, robot)
+
+    def shutdown(self):
+        for robot_name in self.robots:
+            self.cancel(robot_name)
+        self._executor.shutdown(wait=False)
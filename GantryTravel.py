@@ -0,0 +1,278 @@
+"""
+Gantry travel of a run plan over the OT-2 deck.
+
+The deck is laid out from the slot origins and the labware in each slot, with the wells of a custom labware definition
+where there is one and the standard grid for the load name where there is not, as in the dry run.  The travel of a
+plan is the distance the pipette head moves from well to well: to the next tip, to each source and destination, back
+to the source for a blow out and to the trash.  The OT-2 moves X and Y together, so a move takes as long as its longer
+axis at the gantry speed, plus a fixed time to lift, lower and settle.  Both mounts are taken to be at the centre of the
+head.
+
+shortest_path orders a set of wells from a starting point with the nearest neighbour and then improves the order with
+2-opt until no reversal of a stretch of the path makes it shorter.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import heapq
+import math
+from collections import namedtuple
+
+from DryRun import SLOT_ORIGINS, TRASH_SLOT, Labware
+from RunPlan import PIPETTE_RANGES, ColumnTransfer, Dilute, Distribute, Mix, MultiDispense, Transfer
+
+__version__ = "1.0.0"
+
+# mm/s.  The default top speed of the OT-2 gantry.
+GANTRY_SPEED = 400.0
+# Seconds to lift out of one well, lower into the next and settle.
+MOVE_SECONDS = 0.8
+# Nearest wells tried for each well by shortest_path.
+NEIGHBOURS = 8
+# Footprint of a labware in a slot, in mm.
+SLOT_WIDTH = 127.76
+SLOT_DEPTH = 85.48
+# Distribute in Utilities.distribute_reagents keeps 1 uL back.
+DISTRIBUTE_DISPOSAL = 1.0
+
+# moves is the number of moves, millimetres the distance the head travels and seconds the time those moves take.
+Travel = namedtuple("Travel", ["moves", "millimetres", "seconds"])
+
+
+def distance(start, end):
+    return math.hypot(end[0] - start[0], end[1] - start[1])
+
+
+def move_seconds(start, end):
+    return max(abs(end[0] - start[0]), abs(end[1] - start[1])) / GANTRY_SPEED + MOVE_SECONDS
+
+
+def path_travel(points):
+    """
+    Travel along the points in order.  Staying in the same well is not a move.
+    :param points:
+    :return: Travel
+    """
+    moves = 0
+    millimetres = seconds = 0.0
+    for start, end in zip(points, points[1:]):
+        if start == end:
+            continue
+        moves += 1
+        millimetres += distance(start, end)
+        seconds += move_seconds(start, end)
+    return Travel(moves, round(millimetres, 1), round(seconds, 1))
+
+
+class DeckGeometry:
+    """
+    Where every well of the plan's labware is on the deck.
+    """
+    def __init__(self, labware, pipettes=None, definitions=None):
+        """
+        :param labware: Labware load name by slot, as in RunPlan.labware.
+        :param pipettes: Pipettes by mount, as in RunPlan.pipettes.  Tips are taken from their tip racks in order.
+        :param definitions: Custom labware definitions by load name.
+        """
+        definitions = definitions or {}
+        self._labware = {str(slot): Labware(load_name, int(slot), definition=definitions.get(load_name))
+                         for slot, load_name in labware.items()}
+        trash_x, trash_y = SLOT_ORIGINS[TRASH_SLOT]
+        self.trash = (trash_x + SLOT_WIDTH / 2, trash_y + SLOT_DEPTH / 2)
+        self._points = {}
+
+        # The wells the tips of each mount are picked up from, in the order they are used.
+        self._tips = {}
+        for mount, pipette in (pipettes or {}).items():
+            tips = []
+            for slot in pipette["tip_racks"]:
+                if str(slot) in self._labware:
+                    tips.extend(self._labware[str(slot)].wells())
+            first = next((position for position, well in enumerate(tips) if well.well_name == pipette["first_tip"]), 0)
+            self._tips[mount] = [(well.geometry.x, well.geometry.y) for well in tips[first:] + tips[:first]]
+
+    def point(self, site):
+        """
+        X and Y of the centre of a well.
+        :param site: RunPlan.Site or a (slot, well) pair.
+        :return:
+        """
+        site = (str(site[0]), site[1])
+        if site not in self._points:
+            slot, well_name = site
+            if slot in self._labware:
+                well = self._labware[slot][well_name]
+                self._points[site] = (well.geometry.x, well.geometry.y)
+            else:
+                origin_x, origin_y = SLOT_ORIGINS.get(int(slot), (0.0, 0.0))
+                self._points[site] = (origin_x + SLOT_WIDTH / 2, origin_y + SLOT_DEPTH / 2)
+        return self._points[site]
+
+    def tip(self, mount, index):
+        """
+        Where the mount picks up its tip number index, counting from 0.  Without a tip rack the tip is taken to be at
+        the trash, which adds no travel of its own.
+        :param mount:
+        :param index:
+        :return:
+        """
+        tips = self._tips.get(mount)
+        if not tips:
+            return self.trash
+        return tips[index % len(tips)]
+
+
+def plan_path(plan, geometry):
+    """
+    Every point the head visits while running the plan.
+    :param plan:
+    :param geometry:
+    :return:
+    """
+    points = []
+    has_tip = set()
+    tips_used = {}
+
+    def pick_up(mount):
+        if mount in has_tip:
+            points.append(geometry.trash)
+        points.append(geometry.tip(mount, tips_used.get(mount, 0)))
+        tips_used[mount] = tips_used.get(mount, 0) + 1
+        has_tip.add(mount)
+
+    def drop(mount):
+        if mount in has_tip:
+            points.append(geometry.trash)
+            has_tip.discard(mount)
+
+    for step in plan.steps:
+        if isinstance(step, Transfer):
+            if step.new_tip or step.mount not in has_tip:
+                pick_up(step.mount)
+            for loop in range(step.loops):
+                points.extend([geometry.point(step.source), geometry.point(step.destination)])
+
+        elif isinstance(step, ColumnTransfer):
+            # The head is placed by the first channel.
+            if step.new_tip or step.mount not in has_tip:
+                pick_up(step.mount)
+            for loop in range(step.loops):
+                points.extend([geometry.point(step.sources[0]), geometry.point(step.destinations[0])])
+
+        elif isinstance(step, MultiDispense):
+            if step.new_tip or step.mount not in has_tip:
+                pick_up(step.mount)
+            points.append(geometry.point(step.source))
+            points.extend(geometry.point(site) for site in step.destinations)
+            points.append(geometry.point(step.source))
+
+        elif isinstance(step, Distribute):
+            pick_up(step.mount)
+            maximum = PIPETTE_RANGES.get(plan.pipettes.get(step.mount, {}).get("name"), (1, 20, 1))[1]
+            per_aspirate = max(1, int((maximum - DISTRIBUTE_DISPOSAL) // step.volume))
+            for start in range(0, len(step.destinations), per_aspirate):
+                points.append(geometry.point(step.source))
+                points.extend(geometry.point(site) for site in step.destinations[start:start + per_aspirate])
+                points.append(geometry.point(step.source))
+            drop(step.mount)
+
+        elif isinstance(step, Dilute):
+            pick_up(step.diluent_mount)
+            points.extend([geometry.point(step.diluent_source), geometry.point(step.destination)])
+            drop(step.diluent_mount)
+            pick_up(step.sample_mount)
+            points.extend([geometry.point(step.source), geometry.point(step.destination)])
+
+        elif isinstance(step, Mix):
+            if step.mount not in has_tip:
+                pick_up(step.mount)
+            points.append(geometry.point(step.well))
+            drop(step.mount)
+
+    for mount in list(has_tip):
+        drop(mount)
+    return points
+
+
+def plan_travel(plan, geometry):
+    return path_travel(plan_path(plan, geometry))
+
+
+def shortest_path(start, points, end=None):
+    """
+    Order in which to visit the points, starting at start and, when it is given, finishing at end.  The nearest
+    neighbour order is improved with 2-opt: a stretch of the path is reversed whenever that makes the path shorter.
+    Only exchanges that join a point to one of its nearest neighbours are tried, which finds nearly all of the
+    improvements in a fraction of the time.
+    :param start:
+    :param points:
+    :param end:
+    :return: Indices into points.
+    """
+    count = len(points)
+    # Index count is the start and count + 1 the end.
+    nodes = list(points) + [start] + ([end] if end is not None else [])
+    xs = [node[0] for node in nodes]
+    ys = [node[1] for node in nodes]
+
+    def gap(first, second):
+        return math.hypot(xs[first] - xs[second], ys[first] - ys[second])
+
+    remaining = set(range(count))
+    route = [count]
+    while remaining:
+        nearest = min(remaining, key=lambda index: gap(route[-1], index))
+        remaining.remove(nearest)
+        route.append(nearest)
+    if end is not None:
+        route.append(count + 1)
+    if count < 3:
+        return route[1:count + 1]
+
+    neighbours = {index: heapq.nsmallest(NEIGHBOURS, (other for other in range(count) if other != index),
+                                         key=lambda other: gap(index, other)) for index in range(count + 1)}
+    position = {node: place for place, node in enumerate(route)}
+
+    def reverse(first, last):
+        route[first:last + 1] = reversed(route[first:last + 1])
+        for place in range(first, last + 1):
+            position[route[place]] = place
+
+    improved = True
+    while improved:
+        improved = False
+        for place in range(len(route) - 2):
+            a, b = route[place], route[place + 1]
+            ab = gap(a, b)
+            # Reversing route[place + 1:last + 1] joins a to route[last] and b to route[last + 1].
+            for c in neighbours[a]:
+                ac = gap(a, c)
+                if ac >= ab:
+                    break
+                last = position[c]
+                if last <= place + 1:
+                    continue
+                change = ac - ab
+                if last + 1 < len(route):
+                    change += gap(b, route[last + 1]) - gap(c, route[last + 1])
+                if change < -1e-9:
+                    reverse(place + 1, last)
+                    improved = True
+                    break
+            else:
+                for d in neighbours[b]:
+                    bd = gap(b, d)
+                    if bd >= ab:
+                        break
+                    last = position[d] - 1
+                    if last <= place + 1:
+                        continue
+                    change = bd - ab + gap(a, route[last]) - gap(route[last], d)
+                    if change < -1e-9:
+                        reverse(place + 1, last)
+                        improved = True
+                        break
+    return [node for node in route if node < count]
@@ -0,0 +1,560 @@
+"""
+Stand-in OT-2 SSH server for testing and timing the GUI's robot code without a robot.
+
+The server is built on paramiko's server interface and keeps its files under a local directory laid out like the
+robot, with the Jupyter notebook directory at var/lib/jupyter/notebooks.  It understands the commands the GUI sends:
+scp uploads, the tar upload used by the checksum sync, sha256sum, ls, mkdir, pgrep and echo, joined with &&, || and ;.
+opentrons_execute is faked by replaying a recorded run log, normally the one written by the simulation, one line every
+line_delay seconds.  An interrupt sent on the channel stops the replay just as Ctrl-C stops a run on the robot.
+
+The server counts connections, channels, commands and bytes received so transfer throughput, connection reuse and
+cancel latency can be measured.  Run the module to start a server, or with --benchmark to time the GUI's own
+transfer and run code against one.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import argparse
+import hashlib
+import os
+import posixpath
+import re
+import shlex
+import socket
+import tarfile
+import threading
+import time
+from collections import Counter
+
+import paramiko
+
+__version__ = "1.0.0"
+
+NOTEBOOK_DIR = "/var/lib/jupyter/notebooks/"
+# Seconds between replayed run log lines.
+LINE_DELAY = 0.05
+# Seconds a finished command waits for the client to close the channel.
+CLOSE_TIMEOUT = 10.0
+INTERRUPT = b"\x03"
+INTERRUPTED_STATUS = 130
+
+_redirect = re.compile(r"(?<!\S)(2?)>\s*/dev/null(?!\S)")
+_operators = ("&&", "||", ";")
+
+
+class MockOT2Error(Exception):
+    """
+    A command the stand-in robot cannot carry out.  status is the exit status it returns.
+    """
+
+    def __init__(self, msg, status=1, *args):
+        super(MockOT2Error, self).__init__(msg, *args)
+        self.status = status
+
+
+def parse_command(command):
+    """
+    Split a command line in to simple commands and the operators joining them.  Redirections to /dev/null are the only
+    redirections the GUI uses and become flags on the command.
+    :param command:
+    :return: List of (operator, argv, quiet_stdout, quiet_stderr).  The first operator is ";".
+    """
+    command = _redirect.sub(lambda match: " __NULL_ERR__ " if match.group(1) else " __NULL_OUT__ ", command)
+    lexer = shlex.shlex(command, posix=True, punctuation_chars="&|;")
+    lexer.whitespace_split = True
+
+    commands = []
+    operator = ";"
+    argv = []
+    for token in lexer:
+        if token in _operators:
+            commands.append((operator, argv))
+            operator, argv = token, []
+        else:
+            argv.append(token)
+    commands.append((operator, argv))
+
+    parsed = []
+    for operator, argv in commands:
+        if argv:
+            parsed.append((operator, [arg for arg in argv if not arg.startswith("__NULL_")], "__NULL_OUT__" in argv,
+                           "__NULL_ERR__" in argv))
+    return parsed
+
+
+class _ChannelReader:
+    """
+    File like wrapper so tarfile can read straight from the channel.
+    """
+    def __init__(self, channel, stats):
+        self.channel = channel
+        self.stats = stats
+
+    def read(self, size=-1):
+        data = self.channel.recv(size if size and size > 0 else 32768)
+        self.stats["bytes_received"] += len(data)
+        return data
+
+
+class _Session:
+    """
+    One exec request on one channel.
+    """
+    def __init__(self, server, channel, command, pty):
+        self.server = server
+        self.channel = channel
+        self.command = command
+        self.pty = pty
+        self.cwd = server.local_path("/root")
+
+    def write(self, text, quiet=False):
+        if not quiet and text:
+            self.channel.sendall(text.replace("\n", "\r\n").encode() if self.pty else text.encode())
+
+    def write_error(self, text, quiet=False):
+        if not quiet and text:
+            self.channel.sendall_stderr(text.encode())
+
+    def run(self):
+        status = 0
+        try:
+            for operator, argv, quiet_out, quiet_err in parse_command(self.command):
+                if (operator == "&&" and status != 0) or (operator == "||" and status == 0):
+                    continue
+                try:
+                    status = self.run_one(argv, quiet_out, quiet_err)
+                except MockOT2Error as error:
+                    self.write_error("{}\n".format(error), quiet_err)
+                    status = error.status
+        except (OSError, EOFError, paramiko.SSHException):
+            status = 255
+        finally:
+            try:
+                self.channel.send_exit_status(status)
+                self.channel.shutdown_write()
+                # Leave closing to the client, as sshd does.  A channel closed here can close before the client has
+                # seen its exec request accepted, and the request then fails on the client.
+                self.channel.settimeout(CLOSE_TIMEOUT)
+                while self.channel.recv(32768):
+                    pass
+            except (OSError, EOFError, paramiko.SSHException):
+                pass
+            self.channel.close()
+
+    def run_one(self, argv, quiet_out, quiet_err):
+        name = argv[0]
+        handler = getattr(self, "cmd_{}".format(name), None)
+        if handler is None:
+            raise MockOT2Error("sh: {}: not found".format(name), 127)
+        self.server.stats["command_{}".format(name)] += 1
+        return handler(argv[1:], quiet_out, quiet_err)
+
+    def path(self, remote_path):
+        if remote_path.startswith("/"):
+            return self.server.local_path(remote_path)
+        return self.server.local_path(posixpath.join(self.server.remote_path(self.cwd), remote_path))
+
+    def cmd_cd(self, args, quiet_out, quiet_err):
+        path = self.path(args[0] if args else "/root")
+        if not os.path.isdir(path):
+            raise MockOT2Error("sh: cd: can't cd to {}".format(args[0]), 2)
+        self.cwd = path
+        return 0
+
+    def cmd_true(self, args, quiet_out, quiet_err):
+        return 0
+
+    def cmd_echo(self, args, quiet_out, quiet_err):
+        self.write("{}\n".format(" ".join(args)), quiet_out)
+        return 0
+
+    def cmd_mkdir(self, args, quiet_out, quiet_err):
+        for arg in args:
+            if not arg.startswith("-"):
+                os.makedirs(self.path(arg), exist_ok=True)
+        return 0
+
+    def cmd_ls(self, args, quiet_out, quiet_err):
+        paths = [arg for arg in args if not arg.startswith("-")] or ["."]
+        status = 0
+        for path in paths:
+            local = self.path(path)
+            if os.path.isdir(local):
+                self.write("".join("{}\n".format(name) for name in sorted(os.listdir(local))), quiet_out)
+            elif os.path.exists(local):
+                self.write("{}\n".format(path), quiet_out)
+            else:
+                self.write_error("ls: {}: No such file or directory\n".format(path), quiet_err)
+                status = 1
+        return status
+
+    def cmd_sha256sum(self, args, quiet_out, quiet_err):
+        status = 0
+        for name in args:
+            local = self.path(name)
+            if not os.path.isfile(local):
+                self.write_error("sha256sum: {}: No such file or directory\n".format(name), quiet_err)
+                status = 1
+                continue
+            digest = hashlib.sha256()
+            with open(local, 'rb') as file:
+                for block in iter(lambda: file.read(1024 * 1024), b""):
+                    digest.update(block)
+            self.write("{}  {}\n".format(digest.hexdigest(), name), quiet_out)
+        return status
+
+    def cmd_pgrep(self, args, quiet_out, quiet_err):
+        pattern = args[-1] if args else ""
+        with self.server.lock:
+            pids = [pid for pid, command in self.server.processes.items() if pattern in command]
+        self.write("".join("{}\n".format(pid) for pid in pids), quiet_out)
+        return 0 if pids else 1
+
+    def cmd_tar(self, args, quiet_out, quiet_err):
+        if "-xf" not in args or args[args.index("-xf") + 1] != "-":
+            raise MockOT2Error("tar: only -xf - is supported", 2)
+        target = self.path(args[args.index("-C") + 1]) if "-C" in args else self.cwd
+
+        with tarfile.open(fileobj=_ChannelReader(self.channel, self.server.stats), mode="r|") as archive:
+            for member in archive:
+                local = os.path.normpath(os.path.join(target, member.name))
+                if not local.startswith(self.server.root) or not (member.isfile() or member.isdir()):
+                    raise MockOT2Error("tar: {}: refusing to extract".format(member.name), 2)
+                if member.isdir():
+                    os.makedirs(local, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(local), exist_ok=True)
+                with archive.extractfile(member) as source, open(local, 'wb') as destination:
+                    while True:
+                        block = source.read(1024 * 1024)
+                        if not block:
+                            break
+                        destination.write(block)
+                self.server.stats["files_received"] += 1
+        return 0
+
+    def cmd_scp(self, args, quiet_out, quiet_err):
+        """
+        The sink side of the scp protocol, which is all scp.SCPClient.put needs.
+        :param args:
+        :param quiet_out:
+        :param quiet_err:
+        :return:
+        """
+        if "-t" not in args:
+            raise MockOT2Error("scp: only uploads are supported", 1)
+        target = self.path(args[-1])
+        directories = [target]
+        channel = self.channel
+        buffer = b""
+
+        def read_line():
+            nonlocal buffer
+            while b"\n" not in buffer:
+                data = channel.recv(4096)
+                if not data:
+                    return None
+                buffer += data
+            line, _, buffer = buffer.partition(b"\n")
+            return line.decode()
+
+        def read_exact(size):
+            nonlocal buffer
+            while len(buffer) < size:
+                data = channel.recv(min(1024 * 1024, max(32768, size - len(buffer))))
+                if not data:
+                    raise EOFError
+                buffer += data
+                self.server.stats["bytes_received"] += len(data)
+            data, buffer = buffer[:size], buffer[size:]
+            return data
+
+        channel.sendall(b"\x00")
+        while True:
+            line = read_line()
+            if line is None:
+                return 0
+            kind = line[:1]
+            if kind == "C":
+                mode, size, name = line[1:].split(" ", 2)
+                destination = directories[-1]
+                if os.path.isdir(destination):
+                    destination = os.path.join(destination, name)
+                channel.sendall(b"\x00")
+                with open(destination, 'wb') as file:
+                    remaining = int(size)
+                    while remaining:
+                        block = read_exact(min(remaining, 1024 * 1024))
+                        file.write(block)
+                        remaining -= len(block)
+                read_exact(1)
+                self.server.stats["files_received"] += 1
+            elif kind == "D":
+                mode, size, name = line[1:].split(" ", 2)
+                directories.append(os.path.join(directories[-1], name))
+                os.makedirs(directories[-1], exist_ok=True)
+            elif kind == "E":
+                directories.pop()
+            elif kind != "T":
+                channel.sendall(b"\x01scp: unexpected message\n")
+                return 1
+            channel.sendall(b"\x00")
+
+    def cmd_opentrons_execute(self, args, quiet_out, quiet_err):
+        """
+        Replay the run log.  The program must have been uploaded first, as it must on the robot.
+        :param args:
+        :param quiet_out:
+        :param quiet_err:
+        :return:
+        """
+        if not args or not os.path.isfile(self.path(args[0])):
+            raise MockOT2Error("opentrons_execute: can't open file {}".format(args[0] if args else ""), 2)
+
+        with self.server.lock:
+            pid = self.server.next_pid
+            self.server.next_pid += 1
+            self.server.processes[pid] = " ".join(["opentrons_execute"] + args)
+        try:
+            for line in self.server.run_log_lines(args[0]):
+                self.write("{}\n".format(line), quiet_out)
+                deadline = time.monotonic() + self.server.line_delay
+                while True:
+                    if self.channel.recv_ready() and INTERRUPT in self.channel.recv(1024):
+                        self.server.stats["interrupts"] += 1
+                        self.write("^C\nKeyboardInterrupt\n", quiet_out)
+                        return INTERRUPTED_STATUS
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    time.sleep(min(remaining, 0.01))
+            return self.server.exit_status
+        finally:
+            with self.server.lock:
+                del self.server.processes[pid]
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, server):
+        self.server = server
+        self.ptys = set()
+
+    def get_allowed_auths(self, username):
+        return "publickey"
+
+    def check_auth_publickey(self, username, key):
+        if self.server.authorized_keys is None or key.get_base64() in self.server.authorized_keys:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        self.ptys.add(channel.get_id())
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        self.server.stats["channels"] += 1
+        session = _Session(self.server, channel, command.decode(errors="replace"), channel.get_id() in self.ptys)
+        threading.Thread(target=session.run, name="MockOT2Session", daemon=True).start()
+        return True
+
+
+class MockOT2Server:
+    """
+    Stand-in robot listening on host and port.  A port of 0 picks a free port, which is in address after start().
+    """
+    def __init__(self, root, host="127.0.0.1", port=0, run_log=None, line_delay=LINE_DELAY, exit_status=0,
+                 host_key=None, authorized_keys=None):
+        self.root = os.path.abspath(root)
+        self.host = host
+        self.port = port
+        self.run_log = run_log
+        self.line_delay = line_delay
+        self.exit_status = exit_status
+        self.host_key = host_key or paramiko.RSAKey.generate(2048)
+        # Base64 public keys.  None accepts any key.
+        self.authorized_keys = authorized_keys
+        self.stats = Counter()
+        self.processes = {}
+        self.next_pid = 1000
+        self.lock = threading.Lock()
+        self.address = None
+        self._socket = None
+        self._transports = []
+        self._stop = threading.Event()
+        os.makedirs(self.local_path(NOTEBOOK_DIR), exist_ok=True)
+        os.makedirs(self.local_path("/root"), exist_ok=True)
+
+    def local_path(self, remote_path):
+        return os.path.normpath(os.path.join(self.root, posixpath.normpath(remote_path).lstrip("/")))
+
+    def remote_path(self, local_path):
+        return "/" + os.path.relpath(local_path, self.root).replace(os.sep, "/").lstrip(".")
+
+    def run_log_lines(self, program):
+        """
+        The lines opentrons_execute prints.  Without a recorded run log a short stand-in run is printed.
+        :param program:
+        :return:
+        """
+        if self.run_log:
+            with open(self.run_log) as run_log:
+                for line in run_log:
+                    yield line.rstrip("\r\n")
+        else:
+            yield "Loading {}".format(posixpath.basename(program))
+            for step in range(1, 11):
+                yield "Step {} of 10".format(step)
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(16)
+        self._socket.settimeout(0.2)
+        self.address = self._socket.getsockname()
+        threading.Thread(target=self._accept, name="MockOT2Accept", daemon=True).start()
+        return self
+
+    def _accept(self):
+        while not self._stop.is_set():
+            try:
+                client, _ = self._socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.stats["connections"] += 1
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self.host_key)
+            try:
+                transport.start_server(server=_ServerInterface(self))
+            except (paramiko.SSHException, EOFError, OSError):
+                transport.close()
+                continue
+            self._transports.append(transport)
+            threading.Thread(target=self._serve, args=(transport,), name="MockOT2Transport", daemon=True).start()
+
+    @staticmethod
+    def _serve(transport):
+        # Channels are handled by the exec requests.  They are held here until they close because paramiko closes a
+        # channel nothing refers to.
+        channels = []
+        while transport.is_active():
+            channel = transport.accept(timeout=0.5)
+            channels = [open_channel for open_channel in channels if not open_channel.closed]
+            if channel is not None:
+                channels.append(channel)
+
+    def disconnect_all(self):
+        """
+        Drop every client connection, as a robot restart would.
+        :return:
+        """
+        for transport in self._transports:
+            transport.close()
+        self._transports = []
+
+    def stop(self):
+        self._stop.set()
+        self.disconnect_all()
+        if self._socket:
+            self._socket.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def benchmark(server, key_file, megabytes=8, runs=5):
+    """
+    Time the GUI's transfer and run code against a stand-in server.
+    :param server:
+    :param key_file:
+    :param megabytes: Size of the TSV file sent.
+    :param runs: Number of syncs and of runs cancelled.
+    :return:
+    """
+    import tempfile
+    from RobotConnection import RobotConnection
+    from RobotRun import RemoteRun, execute_command
+    from RobotSync import sync_files, sync_to_robot
+
+    connection = RobotConnection("127.0.0.1", key_filename=key_file, port=server.address[1])
+    connection.resolve = lambda: server.address[0]
+    work_dir = tempfile.mkdtemp()
+    tsv = os.path.join(work_dir, "Plate.tsv")
+    program = os.path.join(work_dir, "PCR.py")
+    with open(program, "w") as file:
+        file.write("def run(ctx):\n    pass\n")
+
+    for run in range(runs):
+        with open(tsv, "wb") as file:
+            file.write(os.urandom(megabytes * 1024 * 1024))
+        files = sync_files(tsv, "ProcedureFile.tsv", program)
+        start = time.perf_counter()
+        result = sync_to_robot(connection, NOTEBOOK_DIR, files)
+        elapsed = time.perf_counter() - start
+        print("Upload {}: {} bytes in {:.3f} s, {:.1f} MB/s".format(run + 1, result.bytes_sent, elapsed,
+                                                                  result.bytes_sent / elapsed / 1e6))
+
+    start = time.perf_counter()
+    result = sync_to_robot(connection, NOTEBOOK_DIR, files)
+    print("Sync with nothing changed: {} file(s) up to date in {:.3f} s".format(len(result.unchanged),
+                                                                              time.perf_counter() - start))
+
+    for run in range(runs):
+        remote_run = RemoteRun(connection, execute_command(NOTEBOOK_DIR, "PCR.py"))
+        remote_run.start()
+        time.sleep(server.line_delay * 3)
+        start = time.perf_counter()
+        remote_run.cancel()
+        status = remote_run.wait()
+        print("Cancel {}: exit status {} after {:.3f} s".format(run + 1, status, time.perf_counter() - start))
+
+    connection.close()
+    print("SSH connections made: {}, channels opened: {}".format(server.stats["connections"],
+                                                                 server.stats["channels"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in OT-2 SSH server")
+    parser.add_argument("root", help="Directory holding the stand-in robot's files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2222)
+    parser.add_argument("--run-log", help="Run log replayed by opentrons_execute")
+    parser.add_argument("--line-delay", type=float, default=LINE_DELAY,
+                        help="Seconds between run log lines.  0 replays as fast as possible")
+    parser.add_argument("--host-key", help="Private key file for the server.  A new key is made without one")
+    parser.add_argument("--benchmark", metavar="KEY_FILE",
+                        help="Time uploads, connection reuse and cancelling with this client key, then exit")
+    args = parser.parse_args()
+
+    host_key = paramiko.RSAKey.from_private_key_file(args.host_key) if args.host_key else None
+    server = MockOT2Server(args.root, args.host, args.port, args.run_log, args.line_delay, host_key=host_key)
+    server.start()
+    print("Stand-in OT-2 listening on {}:{}, files in {}".format(server.address[0], server.address[1], server.root))
+
+    if args.benchmark:
+        benchmark(server, args.benchmark)
+        server.stop()
+        return
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Check, simulate and run TSV sample sheets without the GUI.
+
+Each sheet is validated and simulated in a pool of worker processes with the same code the GUI uses, so a batch of
+sheets can be checked unattended, for example the night before they are run.  A result is printed as one line of JSON
+per sheet as soon as the sheet is finished and can also be written to a JSON file per sheet.  With --stage upload the
+one sheet given is copied to the robot, and with --stage run every sheet that passed is queued on the robots in the
+registry and run.  Sheets can be named one by one, as a directory of .tsv files or as a glob pattern, and --report
+writes one report for the whole batch with the time each sheet took.  The exit status is 0 when every sheet passed every
+stage asked for, 1 when any did not and 2 when the command line is wrong.
+
+    python OpentronsCLI.py --program ddPCR sheets/*.tsv
+    python OpentronsCLI.py --program "Generic PCR" --stage validate --jobs 8 --report batch.txt sheets
+    python OpentronsCLI.py --program ddPCR --stage run --results-dir results Plate1.tsv Plate2.tsv
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from SheetPipeline import CRASHED, NOT_RUN, PASSED, PROGRAM_FILES, RUN, RUN_FAILED, SIMULATE, STAGES, UPLOAD, \
+    UPLOAD_FAILED, VALIDATE, batch_report, find_sheets, labware_dir, process_sheet, program_path, warm_worker
+
+__version__ = "1.0.0"
+
+SERVER_PATH = "/var/lib/jupyter/notebooks/"
+SERVER_TSV_FILE = "ProcedureFile.tsv"
+# Seconds between health checks while waiting for the robots.
+HEALTH_CHECK_INTERVAL = 30
+
+
+def log(message):
+    # Messages for a person go to stderr so stdout is only JSON.
+    print(message, file=sys.stderr, flush=True)
+
+
+def write_result(result, results_dir=None):
+    print(json.dumps(result), flush=True)
+    if results_dir:
+        name = "{}.json".format(os.path.splitext(os.path.basename(result["tsv"]))[0])
+        with open(os.path.join(results_dir, name), 'w') as result_file:
+            json.dump(result, result_file, indent=2)
+
+
+def check_sheets(sheets, program, path_to_program, output_dir, stage, jobs):
+    """
+    Validate, and simulate unless stage is validate, every sheet in worker processes.  Results are yielded as the
+    sheets finish.
+    :param sheets:
+    :param program:
+    :param path_to_program:
+    :param output_dir:
+    :param stage:
+    :param jobs: Number of worker processes.
+    :return:
+    """
+    sheet_stage = VALIDATE if stage == VALIDATE else SIMULATE
+    with ProcessPoolExecutor(max_workers=jobs, initializer=warm_worker) as executor:
+        futures = {executor.submit(process_sheet, sheet, program, path_to_program, output_dir, sheet_stage): sheet
+                   for sheet in sheets}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as error:
+                # A worker process that died takes its sheet with it, but not the rest of the batch.
+                yield {"tsv": futures[future], "program": program, "protocol": path_to_program, "status": CRASHED,
+                       "diagnostics": [], "steps": None, "simulation_file": None,
+                       "message": "{}: {}".format(type(error).__name__, error), "seconds": {}, "worker": None}
+
+
+def upload_sheet(result, robot_name, connection_options):
+    """
+    Copy the sheet, the program and the custom labware to the robot.
+    :param result:
+    :param robot_name:
+    :param connection_options:
+    :return:
+    """
+    from RobotConnection import ConnectionPool, RobotConnectionError
+    from RobotSync import sync_files, sync_to_robot
+
+    start = time.perf_counter()
+    pool = ConnectionPool(**connection_options)
+    try:
+        files = sync_files(result["tsv"], SERVER_TSV_FILE, result["protocol"], labware_dir(result["protocol"]))
+        sync = sync_to_robot(pool.get(robot_name), SERVER_PATH, files)
+        result["uploaded"] = [file.remote_name for file in sync.uploaded]
+        result["bytes_sent"] = sync.bytes_sent
+        if sync.mismatched:
+            result["status"] = UPLOAD_FAILED
+            result["message"] = "The robot's copy of {} does not match"\
+                .format(", ".join(file.remote_name for file in sync.mismatched))
+    except RobotConnectionError as error:
+        result["status"] = UPLOAD_FAILED
+        result["message"] = str(error).splitlines()[0]
+    finally:
+        pool.close_all()
+    result["seconds"][UPLOAD] = round(time.perf_counter() - start, 4)
+
+
+def run_sheets(results, robots, connection_options):
+    """
+    Queue the sheets on the robots and wait for every run to finish.  Sheets still queued when no robot can take them
+    are marked not run.
+    :param results: Results of the sheets that passed the simulation.
+    :param robots: Registry entries.
+    :param connection_options:
+    :return:
+    """
+    from FleetDispatcher import BUSY, FAILED, IDLE, RUNNING, UPLOADING, FleetDispatcher
+    from RobotConnection import ConnectionPool
+
+    by_tsv = {result["tsv"]: result for result in results}
+    started = {}
+    last_states = {}
+    lock = threading.Lock()
+
+    def robot_changed(status):
+        if status.state == UPLOADING:
+            started.setdefault(status.job, time.perf_counter())
+        # Only changes of state are logged, not every step of a run.
+        if last_states.get(status.name) != (status.state, status.job):
+            last_states[status.name] = (status.state, status.job)
+            log("{}: {}{}{}".format(status.name, status.state, " {}".format(status.job) if status.job else "",
+                                    "  {}".format(status.message) if status.message else ""))
+
+    def job_done(job, robot_name, state, message):
+        with lock:
+            result = by_tsv[job.label]
+            result["robot"] = robot_name
+            result["run_message"] = message
+            result["seconds"][RUN] = round(time.perf_counter() - started.get(job.label, time.perf_counter()), 4)
+            if state == FAILED or message == "Cancelled":
+                result["status"] = RUN_FAILED
+                result["message"] = message
+
+    pool = ConnectionPool(**connection_options)
+    fleet = FleetDispatcher(robots, pool, SERVER_PATH, SERVER_TSV_FILE, on_change=robot_changed,
+                            on_job_done=job_done)
+    try:
+        for future in fleet.check_health():
+            future.result()
+        for result in results:
+            # The job is labelled with the sheet so its result can be found when it finishes.
+            fleet.submit(result["tsv"], result["tsv"], result["protocol"], labware_dir(result["protocol"]),
+                         result["steps"] or 0)
+
+        last_check = time.monotonic()
+        while fleet.unfinished():
+            time.sleep(0.5)
+            states = [status.state for status in fleet.statuses()]
+            if not any(state in (IDLE, BUSY, UPLOADING, RUNNING) for state in states):
+                log("No robot can take the remaining sheets.")
+                break
+            if time.monotonic() - last_check > HEALTH_CHECK_INTERVAL:
+                fleet.check_health()
+                last_check = time.monotonic()
+
+    except KeyboardInterrupt:
+        log("Cancelling the runs.")
+        for robot_name in fleet.robots:
+            fleet.cancel(robot_name)
+        raise
+
+    finally:
+        fleet.shutdown()
+        pool.close_all()
+        with lock:
+            for result in results:
+                if RUN not in result["seconds"]:
+                    result["status"] = NOT_RUN
+                    result["message"] = "The sheet was not run"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check, simulate and run Opentrons TSV sample sheets")
+    parser.add_argument("sheets", nargs="+", help="TSV sample sheets, directories of them or glob patterns")
+    parser.add_argument("--program", required=True, choices=sorted(PROGRAM_FILES))
+    parser.add_argument("--program-file", help="Protocol file.  The GUI's program file is used without one")
+    parser.add_argument("--stage", choices=STAGES, default=SIMULATE, help="Last stage to run.  Default %(default)s")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Worker processes.  Default %(default)s")
+    parser.add_argument("--output-dir", default=".", help="Directory for the simulation files")
+    parser.add_argument("--results-dir", help="Also write each result to SHEET.json in this directory")
+    parser.add_argument("--report", help="Write a report of the whole batch to this file")
+    parser.add_argument("--robot", action="append",
+                        help="Robot to upload to or run on.  May be repeated for run.  The registry is used "
+                             "without one")
+    parser.add_argument("--registry", help="Robot registry file for --stage run")
+    parser.add_argument("--key-file", help="SSH key for the robots")
+    args = parser.parse_args()
+
+    sheets, unmatched = find_sheets(args.sheets)
+    for pattern in unmatched:
+        log("No TSV files match {}".format(pattern))
+    if not sheets:
+        parser.error("No TSV files found")
+
+    if args.stage == UPLOAD and (len(sheets) != 1 or (args.robot and len(args.robot) != 1)):
+        parser.error("--stage upload takes one sheet and one robot.  Use --stage run to share sheets between robots.")
+
+    path_to_program = os.path.abspath(args.program_file) if args.program_file else program_path(args.program)
+    for directory in (args.output_dir, args.results_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    connection_options = {"key_filename": args.key_file} if args.key_file else {}
+    jobs = max(1, min(args.jobs or 1, len(sheets)))
+
+    results = []
+    start = time.perf_counter()
+    for result in check_sheets(sheets, args.program, path_to_program, os.path.abspath(args.output_dir), args.stage,
+                               jobs):
+        log("{}: {}{}".format(result["tsv"], result["status"], "  {}".format(result["message"])
+                              if result["message"] else ""))
+        results.append(result)
+        # Results are written as they arrive unless there are more stages to come.
+        if result["status"] != PASSED or args.stage in (VALIDATE, SIMULATE):
+            write_result(result, args.results_dir)
+
+    check_seconds = time.perf_counter() - start
+    log("{} of {} sheet(s) passed in {:.2f} s".format(sum(1 for result in results if result["status"] == PASSED),
+                                                      len(results), check_seconds))
+    if args.report:
+        # The report lists the sheets in the order they were given, not the order they finished.
+        order = {sheet: position for position, sheet in enumerate(sheets)}
+        with open(args.report, 'w') as report_file:
+            report_file.write(batch_report(sorted(results, key=lambda result: order.get(result["tsv"], 0)),
+                                           args.program, VALIDATE if args.stage == VALIDATE else SIMULATE, jobs,
+                                           check_seconds))
+
+    passed = [result for result in results if result["status"] == PASSED]
+    if args.stage == UPLOAD and passed:
+        from RobotConnection import DEFAULT_ROBOT
+
+        upload_sheet(passed[0], args.robot[0] if args.robot else DEFAULT_ROBOT, connection_options)
+        write_result(passed[0], args.results_dir)
+
+    elif args.stage == RUN and passed:
+        from FleetDispatcher import DEFAULT_REGISTRY, load_registry
+
+        robots = [{"name": name} for name in args.robot] if args.robot else \
+            load_registry(args.registry or DEFAULT_REGISTRY)
+        try:
+            run_sheets(passed, robots, connection_options)
+        finally:
+            for result in passed:
+                write_result(result, args.results_dir)
+
+    sys.exit(0 if all(result["status"] == PASSED for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
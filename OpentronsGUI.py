@@ -7,21 +7,27 @@ Lineberger Comprehensive Cancer Center
 450 West Drive
 Chapel Hill, NC  27599-7295
 """
-import datetime
-import io
+import importlib
 import shutil
 import sys
 import os
-import socket
-from TemplateErrorChecking import TemplateErrorChecking
-from opentrons.simulate import simulate, format_runlog
+import threading
+import time
+# Only modules that load quickly are imported here so the window is painted as soon as possible.  The template
+# checks, the dry run and the simulation cache, which bring in numpy, packaging and importlib.metadata, are imported
+# where they are used and warmed up on a background thread once the window is showing.
+from SimulationWorker import SimulationWorker
+from SheetPipeline import PROGRAM_FILES, labware_dir, program_path, simulate_sheet, validate_sheet
+from BackgroundJobs import BackgroundJob
+from RobotConnection import ConnectionPool, RobotConnectionError, DEFAULT_ROBOT
+from RobotSync import sync_files, sync_to_robot
+from RobotRun import RemoteRun, RunProgress, execute_command
+from RunPlan import run_protocol
+from FleetDispatcher import FleetDispatcher, load_registry
+from RobotDiscovery import RobotDiscovery
 from UI_MainWindow import Ui_MainWindow
 from PySide6 import QtWidgets, QtGui, QtCore
 from PySide6.QtWidgets import QApplication
-from paramiko import SSHClient, AutoAddPolicy
-from contextlib import redirect_stdout, suppress
-from scp import SCPClient
-import Tool_Box
 
 __version__ = "4.1.0"
 __author__ = "Dennis A. Simpson"
@@ -30,6 +36,24 @@ __license__ = "MIT"
 __email__ = "dennis@email.unc.edu"
 __status__ = "Development"
 
+# The output box keeps the most recent lines only.  The full run log is in the simulation file.
+MAX_OUTPUT_LINES = 20000
+# Milliseconds between checks of the robots in the fleet.
+HEALTH_CHECK_INTERVAL = 60000
+# Imported on a background thread after the first paint so the first button press does not wait for them.
+WARM_UP_MODULES = ["TemplateValidator", "DryRun", "SimulationCache", "paramiko", "scp"]
+# Set by the start up benchmark to the time.time() it launched the GUI.  The GUI prints the seconds to its first paint
+# and exits.
+STARTUP_PROBE = "OT2_GUI_STARTUP_PROBE"
+STARTUP_PROBE_MARK = "first paint"
+
+
+class FleetSignals(QtCore.QObject):
+    # The dispatcher reports from its own threads.  The signal brings each RobotStatus to the GUI thread.
+    robot_changed = QtCore.Signal(object)
+    # RobotAddress from the discovery thread when a robot is found or lost.
+    address_changed = QtCore.Signal(object)
+
 
 class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
     def __init__(self, *args, **kwargs):
@@ -45,7 +69,22 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.server_path = "/var/lib/jupyter/notebooks/"
         self.server_tsv_file = "ProcedureFile.tsv"
         self.temp_tsv_path = "C:{0}Users{0}{1}{0}Documents{0}TempTSV.tsv".format(os.sep, os.getlogin())
-        self.ssh_client = None
+        self.robot_name = DEFAULT_ROBOT
+        self.simulated_steps = 0
+        self.fleet_signals = FleetSignals()
+        self.fleet_signals.robot_changed.connect(self.robot_changed)
+        self.fleet_signals.address_changed.connect(self.address_changed)
+        # These are made by start_services once the window is showing.
+        self.discovery = None
+        self.connection_pool = None
+        self.simulation_worker = None
+        self.simulation_cache = None
+        self.fleet = None
+        self.health_timer = QtCore.QTimer(self)
+        self.robot_rows = {}
+        self.run_simulation_output.document().setMaximumBlockCount(MAX_OUTPUT_LINES)
+        self.thread_pool = QtCore.QThreadPool.globalInstance()
+        self.active_job = None
         self.tsv_file_select_btn.pressed.connect(self.select_file)
         self.closeGUI_btn.pressed.connect(self.exit_gui)
         self.simulate_run_btn.pressed.connect(self.simulate_run)
@@ -53,42 +92,149 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.select_program_combobx.currentTextChanged.connect(self.program_name)
         self.cancel_run_btn.pressed.connect(self.cancel_run)
         self.run_ot2.pressed.connect(self.run_program)
+        self.cancel_job_btn.pressed.connect(self.cancel_job)
+        self.queue_plate_btn.pressed.connect(self.queue_plate)
+        # The timer fires once the event loop is running, which is after the window has been painted.
+        QtCore.QTimer.singleShot(0, self.start_services)
+
+    def start_services(self):
+        """
+        Start the simulation worker, robot discovery and the fleet, then warm up the slow imports in the background.
+        :return:
+        """
+        if self.fleet is not None:
+            return
+
+        # Start the simulation worker now so opentrons is loaded by the time the first simulation is requested.
+        self.simulation_worker = SimulationWorker()
+        self.simulation_worker.start()
+        robots = load_registry()
+        # Robot addresses are looked up in the background so nothing waits on DNS when a button is pressed.
+        self.discovery = RobotDiscovery([self.robot_name] + [robot["name"] for robot in robots],
+                                        on_change=self.fleet_signals.address_changed.emit)
+        self.discovery.start()
+        # The SSH connection to the robot is made once and reused by every transfer.
+        self.connection_pool = ConnectionPool(discovery=self.discovery)
+        # Plates can be queued for any robot in the registry.  Each robot has a row in the status table.
+        self.fleet = FleetDispatcher(robots, self.connection_pool, self.server_path, self.server_tsv_file,
+                                     on_change=self.fleet_signals.robot_changed.emit, discovery=self.discovery)
+        for status in self.fleet.statuses():
+            self.robot_changed(status)
+        self.robot_status_table.resizeColumnsToContents()
+        self.health_timer.timeout.connect(self.fleet.check_health)
+        self.health_timer.start(HEALTH_CHECK_INTERVAL)
+        self.fleet.check_health()
+        threading.Thread(target=warm_up, name="OT2GuiWarmUp", daemon=True).start()
 
 
     def run_program(self):
-        self.warning_report("This Feature is Not Yet Implemented")
-        return
-
-        program_name = os.path.basename(self.path_to_program)
-        cmd = "opentrons_execute {0}{1} -L {0}custom_labware".format(self.server_path, program_name)
-        print(cmd)
-
-        self.ssh_client.get_transport()
-        self.ssh_client.invoke_shell()
-        stdin, stdout, stderr = self.ssh_client.exec_command(cmd)
-        print("After run")
-        stdout.channel.recv_exit_status()
-        stderr.channel.recv_exit_status()
-        response = stdout.readlines()
-        er = stderr.readlines()
-        for line in er:
-            print("error: ", line)
-        for line in response:
-            print("response line:  ", line)
+        """
+        Run the program on the robot.  The files must have been simulated and transferred first.
+        :return:
+        """
+        if self.critical_error:
+            return
+
+        if not self.path_to_program or not self.simulated_steps:
+            self.warning_report("Simulate the run and transfer the files to the robot first.")
+            return
+
+        if self.active_job:
+            self.warning_report("Wait for {} to finish first.".format(self.statusbar.currentMessage()))
+            return
+
+        if not self.robot_reachable():
+            return
+
+        self.start_robot_job(self.run_job, "Running on OT-2", self.run_finished,
+                             os.path.basename(run_protocol(self.path_to_program, self.path_to_tsv)),
+                             self.simulated_steps)
+
+    def run_job(self, job, program_name, total_steps):
+        """
+        Run opentrons_execute on the robot and stream its output to the GUI.  Runs in the thread pool.
+        :param job:
+        :param program_name:
+        :param total_steps: Number of steps in the simulated run log.
+        :return:
+        """
+        try:
+            connection = self.connect_to_ot2()
+        except RobotConnectionError as error:
+            return error
+
+        remote_run = RemoteRun(connection, execute_command(self.server_path, program_name))
+        job.on_cancel(remote_run.cancel)
+        job.check_cancelled()
+        remote_run.start()
+
+        progress = RunProgress(total_steps)
+        job.progress(0, total_steps)
+
+        def lines_received(lines):
+            for line in lines:
+                progress.feed(line)
+            job.output("{}\n".format("\n".join(lines)))
+            job.progress(progress.step, total_steps)
+
+        return remote_run.wait(on_lines=lines_received)
+
+    def run_finished(self, result):
+        if isinstance(result, RobotConnectionError):
+            self.error_report(str(result))
+        elif result == 0:
+            self.success_report("The run on the OT-2 finished.", "OT-2 Run")
+        else:
+            self.error_report("The run on the OT-2 stopped with exit status {}.  See the output window for the reason."
+                              .format(result))
 
     def cancel_run(self):
-        self.warning_report("This Feature is Not Yet Implemented")
-        return
+        # Cancelling the run job interrupts opentrons_execute on the robot.
+        self.cancel_job()
+
+    def queue_plate(self):
+        """
+        Queue the simulated plate for the next idle robot in the fleet.
+        :return:
+        """
+        if self.critical_error:
+            return
+
+        if not self.path_to_program or not self.simulated_steps:
+            self.warning_report("Simulate the run before queuing the plate.")
+            return
 
-        stdin, stdout, stderr = self.ssh_client.send("\x03")
-        stdout.channel.recv_exit_status()
-        response = stdout.readlines()
-        for line in response:
-            print(line)
+        labware_location = labware_dir(self.path_to_program)
+        label = "{} {}".format(self.selected_program, os.path.basename(self.path_to_tsv))
+        job = self.fleet.submit(label, self.path_to_tsv, self.path_to_program, labware_location,
+                                self.simulated_steps)
+        self.statusbar.showMessage("Queued {} as job {}".format(job.label, job.job_id))
+
+    def robot_changed(self, status):
+        """
+        Show a robot's state in the status table.
+        :param status: RobotStatus from the dispatcher.
+        :return:
+        """
+        row = self.robot_rows.get(status.name)
+        if row is None:
+            row = self.robot_rows[status.name] = self.robot_status_table.rowCount()
+            self.robot_status_table.insertRow(row)
+
+        if status.total_steps:
+            progress = "{}/{} {}".format(status.step, status.total_steps, status.message)
+        else:
+            progress = status.message
+        for column, text in enumerate([status.name, status.state, status.job, progress]):
+            self.robot_status_table.setItem(row, column, QtWidgets.QTableWidgetItem(text))
 
     def exit_gui(self):
-        with suppress(AttributeError):
-            self.ssh_client.close()
+        self.health_timer.stop()
+        if self.fleet is not None:
+            self.fleet.shutdown()
+            self.discovery.stop()
+            self.connection_pool.close_all()
+            self.simulation_worker.stop()
         sys.exit()
 
     def program_name(self, s):
@@ -98,6 +244,10 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         return QtCore.QObject.tr(text, **kwargs)
 
     def select_file(self):
+        # A new sheet has to be simulated before it can be queued.
+        self.queue_plate_btn.setEnabled(False)
+        self.simulated_steps = 0
+        self.path_to_program = None
         self.path_to_tsv, _ = \
             QtWidgets.QFileDialog.getOpenFileName(self, self.tr("File Select"),
                                                   self.tr("C:{0}Users{0}{1}{0}Documents{0}".
@@ -110,50 +260,133 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         else:
             self.warning_report("TSV File Not Selected.")
 
-    def connect_to_ot2(self):
+    def start_job(self, function, label, on_result, *args):
         """
-        Establish SSH connection to robot.
+        Run function(job, *args) in the thread pool.  The result is passed to on_result on the GUI thread.
+        :param function:
+        :param label:
+        :param on_result:
+        :param args:
         :return:
         """
-        robot_name = "OT2CEP20180915A20"
-        try:
-            host_ip = socket.gethostbyname(robot_name)
-        except socket.gaierror:
-            self.error_report("Unable to connect to Opentrons OT-2 {}\n Is robot on and connected to computer?"
-                              .format(robot_name))
+        # In case a button was pressed before the services had started.
+        self.start_services()
+        job = BackgroundJob(function, *args)
+        job.signals.progress.connect(self.job_progress)
+        job.signals.output.connect(self.append_output)
+        job.signals.result.connect(on_result)
+        job.signals.error.connect(self.job_error)
+        job.signals.cancelled.connect(lambda: self.job_cancelled(job))
+        job.signals.finished.connect(lambda: self.job_finished(job))
+
+        self.active_job = job
+        self.simulate_run_btn.setEnabled(False)
+        self.cancel_job_btn.setEnabled(True)
+        self.job_progress_bar.setFormat("{}  %p%".format(label))
+        self.job_progress(0, 0)
+        self.statusbar.showMessage(label)
+        self.thread_pool.start(job)
+
+        return job
+
+    def start_robot_job(self, function, label, on_result, *args):
+        """
+        start_job for a job that uses the robot.  The robot is reserved in the fleet until the job has finished, so no
+        queued plate is given to it meanwhile.
+        :param function:
+        :param label:
+        :param on_result:
+        :param args:
+        :return:
+        """
+        self.start_services()
+        if not self.fleet.reserve(self.robot_name, label):
+            self.warning_report("OT-2 {} is working on a queued plate.  Wait for it to finish first."
+                                .format(self.robot_name))
+            return None
+
+        job = self.start_job(function, label, on_result, *args)
+        job.signals.finished.connect(lambda: self.fleet.release(self.robot_name))
+        return job
+
+    def cancel_job(self):
+        if self.active_job:
+            self.statusbar.showMessage("Cancelling...")
+            self.active_job.cancel()
+
+    def job_progress(self, done, total):
+        # A total of 0 puts the progress bar in to busy mode.
+        self.job_progress_bar.setRange(0, total)
+        self.job_progress_bar.setValue(done)
+
+    def append_output(self, text):
+        self.run_simulation_output.moveCursor(QtGui.QTextCursor.MoveOperation.End)
+        self.run_simulation_output.insertPlainText(text)
+
+    def job_error(self, message):
+        print(message)
+        self.error_report("{} failed.  See the terminal window for the reason.".format(self.statusbar.currentMessage()))
+
+    def job_cancelled(self, job):
+        self.append_output("\n{} cancelled.\n".format(self.job_progress_bar.format().split("  ")[0]))
+        # Cancelling a simulation stops the worker.  Start a new one so the next simulation is fast.
+        if job.function == self.simulation_job:
+            self.simulation_worker.start()
+
+    def job_finished(self, job):
+        # The result handler may have started the next job already.
+        if self.active_job is not job:
             return
 
-        ssh_client = SSHClient()
-        ssh_client.load_system_host_keys()
-        ssh_client.set_missing_host_key_policy(AutoAddPolicy())
-        try:
-            ssh_client.connect(hostname=host_ip, username='root',
-                               key_filename='C:{0}Users{0}robotron{0}ot2_ssh_key'.format(os.sep))
-        except OSError:
-            self.error_report("SSH unable to establish connection to robot.  Secure Key error")
-            self.critical_error = True
-            raise SystemExit(1)
-
-        return ssh_client
+        self.active_job = None
+        self.simulate_run_btn.setEnabled(True)
+        self.cancel_job_btn.setEnabled(False)
+        self.job_progress_bar.setRange(0, 1)
+        self.job_progress_bar.setValue(0)
+        self.job_progress_bar.setFormat("%p%")
+        self.statusbar.clearMessage()
 
-    def transfer_tsv_file(self):
+    def robot_reachable(self):
         """
-        If everything checks out then transfer the files to the robot.
-        :rtype: object
+        False, after telling the user, if the last background check could not reach the robot.  A robot that has not
+        been checked yet is looked up by the job itself.
         :return:
         """
-        # Establish a connection to the robot.
-        self.ssh_client = self.connect_to_ot2()
+        self.start_services()
+        address = self.discovery.status(self.robot_name)
+        if address.online is False:
+            self.error_report("Opentrons OT-2 {} is not reachable.\n{}\nIs robot on and connected to computer?"
+                              .format(self.robot_name, address.message))
+            # Check again now so the next attempt sees a robot that has just been switched on.
+            self.discovery.check_all()
+            return False
+        return True
+
+    def address_changed(self, address):
+        if address.name == self.robot_name:
+            state = "online at {}".format(address.ip) if address.online else "offline"
+            self.statusbar.showMessage("OT-2 {} is {}".format(address.name, state), 10000)
+        if address.online:
+            # A robot that has come back can be given plates again.
+            self.fleet.check_health()
 
+    def connect_to_ot2(self):
         """
-        If communications with the OT-2 cannot be established then let the user know.  This might be an expected 
-        behavior.
+        Pooled SSH connection to the robot.  The connection is only made the first time, or again if it has died.  This
+        is run from the file transfer job so problems are raised rather than reported here.
+        :return:
         """
-        if not self.ssh_client:
-            self.warning_report("Communications with OT-2 not established.  If this was expected then you can safely "
-                                "ignore this message")
-            return
+        connection = self.connection_pool.get(self.robot_name)
+        connection.connect()
+
+        return connection
 
+    def transfer_tsv_file(self):
+        """
+        If everything checks out then transfer the files to the robot.
+        :rtype: object
+        :return:
+        """
         # If we have a critical error then don't do anything else.
         if self.critical_error:
             return
@@ -161,30 +394,65 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         if not self.path_to_tsv:
             self.select_file()
 
-        # Initialize scp and transfer the files to the robot.
-        scp = SCPClient(self.ssh_client.get_transport())
-        # TSV file transfer
-        scp.put(files=self.path_to_tsv, remote_path="{}{}".format(self.server_path, self.server_tsv_file),
-                preserve_times=True)
+        if not self.robot_reachable():
+            return
+
+        self.start_robot_job(self.transfer_job, "Transferring Files", self.transfer_finished, self.path_to_tsv,
+                             self.path_to_program)
 
-        # Confirm files have transferred.
-        cmd = "ls {}".format(self.server_path)
-        stdin, stdout, stderr = self.ssh_client.exec_command(cmd)
-        stdout.channel.recv_exit_status()
-        response = stdout.readlines()
-        transferred_files = []
+    def transfer_job(self, job, path_to_tsv, path_to_program):
+        """
+        Connect to the robot and copy the TSV file, the program and the custom labware, skipping any the robot already
+        has.  Runs in the thread pool.
+        :param job:
+        :param path_to_tsv:
+        :param path_to_program:
+        :return:
+        """
+        # Use the pooled connection to the robot, connecting if there is none yet.
+        try:
+            connection = self.connect_to_ot2()
+        except RobotConnectionError as error:
+            return error
+
+        labware_location = None
+        if path_to_program:
+            labware_location = labware_dir(path_to_program)
+        files = sync_files(path_to_tsv, self.server_tsv_file, path_to_program, labware_location)
+
+        # Closing the upload channel stops a transfer that is in progress and leaves the connection open for the next
+        # one.
+        result = sync_to_robot(connection, self.server_path, files, progress=job.progress,
+                               on_channel=lambda channel: job.on_cancel(channel.close))
+        job.check_cancelled()
+
+        if result.uploaded:
+            job.output("Sent {} file(s), {} bytes, to the robot.  {} file(s) were already up to date.\n"
+                       .format(len(result.uploaded), result.bytes_sent, len(result.unchanged)))
+        else:
+            job.output("All {} file(s) on the robot are up to date.\n".format(len(result.unchanged)))
 
-        for line in response:
-            transferred_files.append(line.strip("\n"))
+        return result
 
-        if self.server_tsv_file not in transferred_files:
-            self.error_report("TSV File Transfer Failed")
+    def transfer_finished(self, result):
+        """
+        If communications with the OT-2 cannot be established then let the user know.  This might be an expected
+        behavior.
+        """
+        if isinstance(result, RobotConnectionError):
+            self.error_report(str(result))
+            if result.critical:
+                self.critical_error = True
+            else:
+                self.warning_report("Communications with OT-2 not established.  If this was expected then you can "
+                                    "safely ignore this message")
+        elif result.mismatched:
+            self.error_report("File Transfer Failed.  The robot's copy of {} does not match."
+                              .format(", ".join(file.remote_name for file in result.mismatched)))
             self.critical_error = True
         else:
             self.success_report("All Files Transferred Successfully", "File Transfer")
 
-        scp.close()
-
     def simulate_run(self):
         """
         This will check the ProcedureTSV file for syntax errors.
@@ -199,68 +467,40 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             self.warning_report("Please Select Program for Simulation from dropdown list first.")
             return
 
-        # Redirect stdout and stderr allowing them to be displayed in the GUI
-        f = io.StringIO()
-
-        if self.path_to_tsv:
-            template_error_check = TemplateErrorChecking(self.path_to_tsv)
-        else:
+        if not self.path_to_tsv:
             self.warning_report("TSV File Not Selected.")
             return
 
-        '''
-        # Debugging code block
-        slot_error = template_error_check.slot_error_check()
-        pipette_error = template_error_check.pipette_error_check()
-        tip_box_error = template_error_check.tip_box_error_check()
-        error_msg = template_error_check.pcr_check(self.selected_program)
-        Tool_Box.debug_messenger(error_msg)
-        '''
-
-        with redirect_stdout(f):
-            # Initialize template error checking
-            value_error = template_error_check.parameter_checks()
-            if value_error:
-                self.error_report(value_error)
-                return
-
-            slot_error = template_error_check.slot_error_check()
-
-            if slot_error:
-                self.error_report(slot_error)
-                return
-
-            pipette_error = ""
-            if pipette_error:
-                self.error_report(pipette_error)
-                return
-
-            if self.selected_program == "Generic PCR" or self.selected_program == "ddPCR" or self.selected_program == "Illumina_Dual_Indexing":
-                error_msg = template_error_check.pcr_check(self.selected_program)
+        self.start_job(self.validation_job, "Validating TSV File", self.validation_finished, self.path_to_tsv,
+                       self.selected_program)
 
-            else:
-                error_msg = "Program {} is not yet implemented.\nConsult the code admin."
-
-            if error_msg:
-                self.error_report(error_msg)
-                return
+    @staticmethod
+    def validation_job(job, path_to_tsv, selected_program):
+        """
+        Runs in the thread pool.
+        :param job:
+        :param path_to_tsv:
+        :param selected_program:
+        :return:
+        """
+        # What the checks print is returned so it can be displayed in the GUI.
+        return validate_sheet(path_to_tsv, selected_program)
 
-        self.run_simulation_output.insertPlainText('{}'.format(f.getvalue()))
-        if self.selected_program == "Generic PCR":
-            self.path_to_program = "C:{0}Opentrons_Programs{0}PCR.py".format(os.sep)
+    def validation_finished(self, result):
+        validator, printed = result
+        if validator.diagnostics:
+            self.append_output("{}\n".format(validator.report()))
 
-        elif self.selected_program == "Illumina_Dual_Indexing":
-            self.path_to_program = "C:{0}Opentrons_Programs{0}PCR.py".format(os.sep)
+        if validator.errors:
+            self.error_report("{} problem(s) found in the TSV file.\n\n{}"
+                              .format(len(validator.errors), validator.report()))
+            return
 
-        elif self.selected_program == "ddPCR":
-            self.path_to_program = "C:{0}Opentrons_Programs{0}PCR.py".format(os.sep)
+        self.append_output('{}'.format(printed))
+        if self.selected_program in PROGRAM_FILES:
+            self.path_to_program = program_path(self.selected_program)
 
         self.simulate_program()
-        if not self.critical_error:
-            self.run_simulation_output.insertPlainText("\n")
-            self.success_report("Simulations were successful.", "Simulation Module")
-            self.transfer_tsv_file()
-        # os.remove(self.temp_tsv_path)
 
     def simulate_program(self):
         """
@@ -272,7 +512,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             return
 
         # Select program file if not located where we think it is.
-        if not os.path.isfile(self.path_to_program):
+        if not self.path_to_program or not os.path.isfile(self.path_to_program):
             self.path_to_program, _ = \
                 QtWidgets.QFileDialog.getOpenFileName(self, self.tr("Select Program File"),
                                                       self.tr("C:{0}Users{0}{1}{0}Documents{0}"
@@ -280,35 +520,62 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
 
         self.info_report('If you do not get a "Success" notice then the simulation failed.\nSee the terminal window '
                          'for the reason')
-        try:
-            protocol_file = open(self.path_to_program)
-
-        except FileNotFoundError:
+        if not os.path.isfile(self.path_to_program):
             self.critical_error = True
             self.error_report("Program file not found or not selected.")
             return
 
-        # Write the simulation steps to a file
-        labware_location = "{}{}custom_labware".format(os.path.dirname(self.path_to_program), os.sep)
-        run_log, __bundle__ = simulate(protocol_file, custom_labware_paths=[labware_location], propagate_logs=False)
-        simulation_date = datetime.datetime.today().strftime("%a %b %d %H:%M %Y")
-        outfile = open("C:{0}Users{0}{1}{0}Documents{0}{2}_Simulation.txt"
-                        .format(os.sep, os.getlogin(), self.selected_program), 'w', encoding="UTF-16")
-        step_number = 1
-        t = format_runlog(run_log).split("\n")
-        outstring = "Opentrons OT-2 Steps.\nDate:  {}\nProgram File: {}\nTSV File:  {}\n\nStep\tCommand\n"\
-                    .format(simulation_date, self.selected_program, self.path_to_tsv)
+        self.start_job(self.simulation_job, "Simulating", self.simulation_finished, self.path_to_program,
+                       self.path_to_tsv, self.selected_program)
+
+    def simulation_job(self, job, path_to_program, path_to_tsv, selected_program):
+        """
+        Runs the simulation in the warm worker process and writes the steps to a file.  Runs in the thread pool, so the
+        number of steps is returned for simulation_finished to keep on the GUI thread.
+        :param job:
+        :param path_to_program:
+        :param path_to_tsv:
+        :param selected_program:
+        :return:
+        """
+        from DryRun import DryRunError
+        from SimulationCache import SimulationCache
+
+        # Only one simulation runs at a time so the cache can be made here the first time it is needed.
+        if self.simulation_cache is None:
+            self.simulation_cache = SimulationCache()
 
-        for line in t:
-            outstring += "{}\t{}\n".format(step_number, line)
-            step_number += 1
-        outfile.write(outstring)
-        outfile.close()
+        # Killing the worker is the only way to stop a simulation that is running.
+        job.on_cancel(self.simulation_worker.cancel)
 
-        # Write the simulation steps to the GUI
-        self.run_simulation_output.insertPlainText(format_runlog(run_log))
+        def lines_received(lines, done, total):
+            job.output("{}\n".format("\n".join(lines)))
+            job.progress(done, total)
 
-        protocol_file.close()
+        output_path = "C:{0}Users{0}{1}{0}Documents{0}{2}_Simulation".format(os.sep, os.getlogin(), selected_program)
+        try:
+            return simulate_sheet(self.simulation_worker, self.simulation_cache, path_to_program, path_to_tsv,
+                                  selected_program, output_path, on_lines=lines_received,
+                                  on_steps=lambda steps: job.progress(0, steps), output=job.output,
+                                  check_cancelled=job.check_cancelled)
+        except DryRunError as error:
+            return error
+
+    def simulation_finished(self, result):
+        from DryRun import DryRunError
+
+        if isinstance(result, DryRunError):
+            self.append_output("Dry run failed: {}\n".format(result))
+            if result.result:
+                self.append_output("{}\n".format(result.result.summary()))
+            self.error_report("The dry run found a problem so the full simulation was not run.\n\n{}".format(result))
+        elif result and not self.critical_error:
+            self.simulated_steps = result
+            self.append_output("\n")
+            self.queue_plate_btn.setEnabled(True)
+            self.success_report("Simulations were successful.", "Simulation Module")
+            self.transfer_tsv_file()
+        # os.remove(self.temp_tsv_path)
 
     def info_report(self, message):
         QtWidgets.QMessageBox.information(self, "Take Heed", message)
@@ -323,6 +590,18 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         QtWidgets.QMessageBox.information(self, source, message)
 
 
+def warm_up():
+    """
+    Import the slow modules on a background thread.  A module that is missing is reported when it is used instead.
+    :return:
+    """
+    for module_name in WARM_UP_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            pass
+
+
 def center_window(central_widget):
     """
     These settings are a bit empirical.  They are designed to center the window on the screen and set the size to make
@@ -356,4 +635,11 @@ if __name__ == "__main__":
     window = MainWindow()
     center_window(window)
     window.show()
+    if os.environ.get(STARTUP_PROBE):
+        # Paint the window, report how long that took from the start of the process and leave before the services
+        # start.
+        app.processEvents()
+        print("{} {:.3f}".format(STARTUP_PROBE_MARK, time.time() - float(os.environ[STARTUP_PROBE])),
+              flush=True)
+        sys.exit(0)
     sys.exit(app.exec())
@@ -0,0 +1,550 @@
+"""
+Optimization passes over a compiled run plan.
+
+The plan made by validation moves every well's liquid on its own: one aspirate, one dispense and one blow-out for each
+well, a fresh tip for each block of water and a fresh tip for the diluent of each dilution.  Its wells are visited in
+the order of the sample sheet and plate layout, wherever they are on the deck.  Eight passes are run over it, in order.
+    split:   Each dilution is split into its diluent and its sample, so the diluent can join the other water.
+    columns: With an 8-channel pipette loaded, eight transfers in a row that fill a column, row for row from a column
+             of wells or from a reservoir, become one column transfer, as do the whole columns a reservoir
+             distributes to.
+    units:   Steps that share a tip, and a sample and the mix after it, are kept together as one unit.
+    order:   Units are reordered wherever no well is shared, so the same pipette and source are used back to back
+             and pipettes swap less often.
+    travel:  Transfers from one source on one tip go to their empty wells in the shortest route over the deck.
+    tips:    A tip that has only been in the source and in empty wells is kept for the next unit from the same source,
+             when that unit also only dispenses into empty wells.
+    merge:   Transfers from the same source on one tip are merged into multi-dispense steps, one aspirate for as many
+             wells as the pipette can hold.  Wells the plan fills itself, such as dilutions, hold just enough for
+             their wells and have no room for the disposal volume, so transfers from them are not merged.
+    route:   The wells of every multi-dispense and distribute step are put in the shortest route from their source and
+             back.
+Transfers that each take a fresh tip are left in their order: every one of them starts at the tip rack and ends at the
+trash, so reordering them changes nothing but which tip each one gets.
+A step is never moved past another step that uses one of its wells, and a tip is only kept where it cannot carry one
+liquid into another, so the optimized plan puts the same liquid in every well as the plan it came from.  The report
+gives the tips, aspirates, gantry travel and estimated time saved.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import math
+from collections import namedtuple
+
+from GantryTravel import DeckGeometry, plan_travel, shortest_path
+from RunPlan import COLUMN_CHANNELS, PIPETTE_RANGES, ColumnTransfer, Dilute, Distribute, Mix, MultiDispense, RunPlan, \
+    Site, Temperature, Transfer, column_sites, select_pipette
+
+__version__ = "1.0.0"
+
+# Estimated seconds for each robot action, from timing PCR setups on the OT-2.
+PICK_UP_SECONDS = 7.0
+DROP_SECONDS = 6.0
+ASPIRATE_SECONDS = 4.0
+DISPENSE_SECONDS = 3.0
+BLOW_OUT_SECONDS = 2.0
+TOUCH_TIP_SECONDS = 2.0
+MIX_CYCLE_SECONDS = 2.5
+# Distribute in Utilities.distribute_reagents keeps 1 uL back.
+DISTRIBUTE_DISPOSAL = 1.0
+
+# travel_mm is the distance the gantry moves.  seconds includes the time taken by those moves.
+PlanCost = namedtuple("PlanCost", ["steps", "tips", "aspirates", "dispenses", "pipette_swaps", "travel_mm",
+                                   "seconds"])
+OptimizationReport = namedtuple("OptimizationReport", ["before", "after"])
+
+
+def _sites(step):
+    """
+    Wells the step takes from and wells it puts liquid in or disturbs.
+    :param step:
+    :return:
+    """
+    if isinstance(step, Transfer):
+        return {step.source}, {step.destination}
+    if isinstance(step, ColumnTransfer):
+        return set(step.sources), set(step.destinations)
+    if isinstance(step, (Distribute, MultiDispense)):
+        return {step.source}, set(step.destinations)
+    if isinstance(step, Dilute):
+        return {step.diluent_source, step.source}, {step.destination}
+    if isinstance(step, Mix):
+        return {step.well}, {step.well}
+    return set(), set()
+
+
+def _source(step):
+    if isinstance(step, ColumnTransfer):
+        return tuple(step.sources)
+    return getattr(step, "source", None)
+
+
+def _mounts(step):
+    if isinstance(step, Dilute):
+        return [step.diluent_mount, step.sample_mount]
+    if isinstance(step, Temperature):
+        return []
+    return [step.mount]
+
+
+class _Unit:
+    """
+    Steps that have to run one after the other with nothing between them.
+    """
+    def __init__(self, index, step):
+        self.index = index
+        self.steps = []
+        self.reads = set()
+        self.writes = set()
+        self.add(step)
+
+    def add(self, step):
+        self.steps.append(step)
+        reads, writes = _sites(step)
+        self.reads |= reads
+        self.writes |= writes
+
+    @property
+    def mount(self):
+        mounts = _mounts(self.steps[-1])
+        return mounts[-1] if mounts else None
+
+    @property
+    def source(self):
+        return _source(self.steps[0])
+
+    def depends_on(self, other):
+        if isinstance(self.steps[0], Temperature) or isinstance(other.steps[0], Temperature):
+            return True
+        return bool(other.writes & (self.reads | self.writes) or other.reads & self.writes)
+
+
+def _keeps_tip(step):
+    return isinstance(step, (Transfer, ColumnTransfer, MultiDispense))
+
+
+def split_dilutions(plan, steps):
+    """
+    Replace each Dilute with a transfer of the diluent and a transfer of the sample.  The sample keeps its tip for the
+    Mix after it, as it did before.
+    :param plan:
+    :param steps:
+    :return:
+    """
+    pipettes = {mount: pipette["name"] for mount, pipette in plan.pipettes.items()}
+    split = []
+    for step in steps:
+        if not isinstance(step, Dilute):
+            split.append(step)
+            continue
+        for label, source, volume in (("{} diluent".format(step.label), step.diluent_source, step.diluent_volume),
+                                      (step.label, step.source, step.sample_volume)):
+            mount, loops, loop_volume = select_pipette(pipettes, volume)
+            split.append(Transfer(label, mount, source, step.destination, loop_volume, loops, True, None, False))
+    return split
+
+
+def _multichannel(plan, volume):
+    """
+    The mount of an 8-channel pipette that can move the volume, the loops it takes and the volume of each loop.
+    :param plan:
+    :param volume:
+    :return: None when there is no such pipette.
+    """
+    for mount, pipette in sorted(plan.pipettes.items()):
+        minimum, maximum, channels = PIPETTE_RANGES.get(pipette["name"], (1, 20, 1))
+        if channels == COLUMN_CHANNELS and volume >= minimum:
+            loops = math.ceil(volume / maximum - 1e-9)
+            if abs(round(volume / loops, 1) * loops - volume) < 1e-6:
+                return mount, loops, round(volume / loops, 1)
+    return None
+
+
+def _column_transfer(plan, steps, following):
+    """
+    One column transfer for eight transfers that fill a column row for row, with the same volume, mix and tip touch.
+    :param plan:
+    :param steps: Eight transfers.
+    :param following: The step after them, which must not need the tip they leave.
+    :return: ColumnTransfer or None.
+    """
+    first = steps[0]
+    if not all(isinstance(step, Transfer) for step in steps) or len(steps) != COLUMN_CHANNELS:
+        return None
+    if isinstance(following, Mix) and following.mount == steps[-1].mount:
+        return None
+    volume = first.volume * first.loops
+    if any(abs(step.volume * step.loops - volume) > 1e-6 or step.mix_volume != first.mix_volume or
+           step.touch != first.touch for step in steps):
+        return None
+    sources = column_sites(plan.labware, first.source)
+    destinations = column_sites(plan.labware, first.destination)
+    if sources != [step.source for step in steps] or destinations != [step.destination for step in steps]:
+        return None
+    multichannel = _multichannel(plan, volume)
+    if multichannel is None:
+        return None
+    mount, loops, loop_volume = multichannel
+    return ColumnTransfer(first.label, mount, sources, destinations, loop_volume, loops,
+                          any(step.new_tip for step in steps), first.mix_volume, first.touch)
+
+
+def _distributed_columns(plan, step):
+    """
+    Column transfers for the whole columns a distribute from a reservoir goes to, and a distribute for the rest.
+    :param plan:
+    :param step:
+    :return:
+    """
+    multichannel = _multichannel(plan, step.volume)
+    if multichannel is None or column_sites(plan.labware, step.source) != [step.source] * COLUMN_CHANNELS:
+        return [step]
+
+    mount, loops, loop_volume = multichannel
+    destinations = set(step.destinations)
+    columns = []
+    for site in step.destinations:
+        column = column_sites(plan.labware, Site(site.slot, "A{}".format(site.well[1:])))
+        if column and column not in columns and destinations.issuperset(column) and len(set(column)) == len(column):
+            columns.append(column)
+    if not columns:
+        return [step]
+
+    covered = {site for column in columns for site in column}
+    # Master mix is distributed with one tip, and so is each pipette's share of it here.
+    replaced = [ColumnTransfer(step.label, mount, [step.source] * COLUMN_CHANNELS, column, loop_volume, loops,
+                               position == 0, None, True) for position, column in enumerate(columns)]
+    rest = [site for site in step.destinations if site not in covered]
+    if rest:
+        replaced.append(step._replace(destinations=rest))
+    return replaced
+
+
+def column_transfers(plan, steps):
+    """
+    Hand whole columns to an 8-channel pipette.  A single channel pipette that loses the transfer that picked up its
+    tip takes a fresh one for the next transfer that would have used it, and the 8-channel pipette only keeps its tips
+    for the next column while it stays with the same source.
+    :param plan:
+    :param steps:
+    :return:
+    """
+    if not any(PIPETTE_RANGES.get(pipette["name"], (1, 20, 1))[2] == COLUMN_CHANNELS
+               for pipette in plan.pipettes.values()):
+        return list(steps)
+
+    replaced = []
+    # Single channel mounts whose tip was picked up by a transfer that is now a column transfer.
+    orphaned = set()
+    # For each 8-channel mount, the sources its tips have been in when the next column may keep them.
+    kept = {}
+    position = 0
+    while position < len(steps):
+        step = steps[position]
+        window = steps[position:position + COLUMN_CHANNELS]
+        following = steps[position + COLUMN_CHANNELS] if position + COLUMN_CHANNELS < len(steps) else None
+        column = _column_transfer(plan, window, following)
+        if column is not None:
+            if not column.new_tip and kept.get(column.mount) != column.sources:
+                column = column._replace(new_tip=True)
+            replaced.append(column)
+            kept[column.mount] = None if column.mix_volume else column.sources
+            orphaned.update(member.mount for member in window if member.new_tip)
+            position += COLUMN_CHANNELS
+            continue
+
+        for new_step in _distributed_columns(plan, step) if isinstance(step, Distribute) else [step]:
+            if isinstance(new_step, ColumnTransfer):
+                kept[new_step.mount] = None
+            for mount in _mounts(new_step):
+                if mount in orphaned and _keeps_tip(new_step) and not new_step.new_tip:
+                    new_step = new_step._replace(new_tip=True)
+                orphaned.discard(mount)
+                if mount in kept and not isinstance(new_step, ColumnTransfer):
+                    kept[mount] = None
+            replaced.append(new_step)
+        position += 1
+    return replaced
+
+
+def plan_units(steps):
+    """
+    Split the steps into units.  A step that goes on with the tip left on the pipette by the step before it joins that
+    step's unit.
+    :param steps:
+    :return:
+    """
+    units = []
+    for step in steps:
+        previous = units[-1].steps[-1] if units else None
+        chained = previous is not None and _keeps_tip(step) and not step.new_tip and _keeps_tip(previous) \
+            and previous.mount == step.mount
+        # A Mix uses the tip left by the sample before it.
+        mixed = isinstance(step, Mix) and (isinstance(previous, Dilute) and previous.sample_mount == step.mount or
+                                           _keeps_tip(previous) and previous.mount == step.mount)
+        if chained or mixed:
+            units[-1].add(step)
+        else:
+            units.append(_Unit(len(units), step))
+    return units
+
+
+def order_units(units):
+    """
+    List schedule the units.  Of the units whose wells are free, the next one is the first that uses the same pipette
+    and source as the one before, then the first on the same pipette, then the first in the original order.
+    :param units:
+    :return:
+    """
+    depends = {unit.index: [other.index for other in units[:unit.index] if unit.depends_on(other)] for unit in units}
+    done = set()
+    ordered = []
+    remaining = list(units)
+    while remaining:
+        ready = [unit for unit in remaining if all(index in done for index in depends[unit.index])]
+        last = ordered[-1] if ordered else None
+        choice = ready[0]
+        if last is not None:
+            same_source = [unit for unit in ready if unit.mount == last.mount and unit.source == last.source
+                           and unit.source is not None]
+            same_mount = [unit for unit in ready if unit.mount == last.mount]
+            choice = (same_source or same_mount or ready)[0]
+        ordered.append(choice)
+        done.add(choice.index)
+        remaining.remove(choice)
+    return ordered
+
+
+def reuse_tips(steps):
+    """
+    Keep the tip for a unit that starts with a fresh one when the tip on the pipette has only been in the same source
+    and in empty wells, and the new unit only dispenses into empty wells without touching the tip off.
+    :param steps:
+    :return:
+    """
+    filled = set()
+    # For each mount, the source the tip on it has been in while it is still clean.
+    clean_tip = {}
+    optimized = []
+    for step in steps:
+        reads, writes = _sites(step)
+        clean = _keeps_tip(step) and not writes & filled and not step.touch \
+            and not getattr(step, "mix_volume", None)
+        if clean and step.new_tip and clean_tip.get(step.mount) == _source(step):
+            step = step._replace(new_tip=False)
+
+        if clean and (step.new_tip or clean_tip.get(step.mount) == _source(step)):
+            clean_tip[step.mount] = _source(step)
+        else:
+            # Anything else leaves the tip dirty or drops it.
+            for mount in _mounts(step):
+                clean_tip.pop(mount, None)
+        filled |= writes
+        optimized.append(step)
+    return optimized
+
+
+def order_runs(steps, geometry):
+    """
+    Put each run of transfers from one source on one tip, into wells nothing else in the run uses, in the shortest
+    route from the source.  The first transfer of the new order takes the run's tip.
+    :param steps:
+    :param geometry:
+    :return:
+    """
+    ordered = []
+    run = []
+
+    def close_run():
+        if len(run) > 2:
+            order = shortest_path(geometry.point(run[0].source), [geometry.point(step.destination) for step in run])
+            new_tip = run[0].new_tip
+            run[:] = [run[index]._replace(new_tip=False) for index in order]
+            run[0] = run[0]._replace(new_tip=new_tip)
+        ordered.extend(run)
+        run.clear()
+
+    for step in steps:
+        movable = isinstance(step, Transfer) and not step.mix_volume
+        if movable and run:
+            first = run[0]
+            if step.new_tip or step.mount != first.mount or step.source != first.source or step.touch != first.touch \
+                    or step.destination in {member.destination for member in run} or step.destination == first.source:
+                close_run()
+        elif not movable:
+            close_run()
+
+        if movable:
+            run.append(step)
+        else:
+            ordered.append(step)
+    close_run()
+    return ordered
+
+
+def order_destinations(steps, geometry):
+    """
+    Visit the wells of each multi-dispense and distribute step in the shortest route from the source and back.
+    :param steps:
+    :param geometry:
+    :return:
+    """
+    ordered = []
+    for step in steps:
+        if isinstance(step, (MultiDispense, Distribute)) and len(step.destinations) > 2 \
+                and len(set(step.destinations)) == len(step.destinations):
+            source = geometry.point(step.source)
+            order = shortest_path(source, [geometry.point(site) for site in step.destinations],
+                                  source if isinstance(step, MultiDispense) else None)
+            step = step._replace(destinations=[step.destinations[index] for index in order])
+            if isinstance(step, MultiDispense):
+                step = step._replace(volumes=[step.volumes[index] for index in order])
+        ordered.append(step)
+    return ordered
+
+
+def _pipette_range(plan, mount):
+    return PIPETTE_RANGES.get(plan.pipettes.get(mount, {}).get("name"), (1, 20, 1))
+
+
+def _capacity(plan, mount):
+    """
+    uL a multi-dispense can deliver and the disposal volume it aspirates with them, which is the pipette's smallest
+    volume.
+    :param plan:
+    :param mount:
+    :return:
+    """
+    minimum, maximum, channels = _pipette_range(plan, mount)
+    return maximum - minimum, minimum
+
+
+def merge_transfers(plan, steps):
+    """
+    Merge runs of transfers from one source on one tip into multi-dispense steps that fit in the pipette.
+    :param plan:
+    :param steps:
+    :return:
+    """
+    merged = []
+    group = []
+    filled = set()
+
+    def close_group():
+        if len(group) == 1:
+            merged.append(group[0])
+        elif group:
+            first = group[0]
+            capacity, disposal = _capacity(plan, first.mount)
+            merged.append(MultiDispense(first.label, first.mount, first.source, [step.destination for step in group],
+                                        [step.volume for step in group], first.new_tip, disposal, first.touch))
+        group.clear()
+
+    for step in steps:
+        mergeable = isinstance(step, Transfer) and step.loops == 1 and not step.mix_volume \
+            and step.source not in filled
+        filled |= _sites(step)[1]
+        if mergeable and group:
+            first = group[0]
+            capacity, disposal = _capacity(plan, first.mount)
+            fits = sum(member.volume for member in group) + step.volume <= capacity
+            if step.new_tip or step.mount != first.mount or step.source != first.source or step.touch != first.touch \
+                    or not fits:
+                close_group()
+        elif not mergeable:
+            close_group()
+
+        if mergeable:
+            group.append(step)
+        else:
+            merged.append(step)
+    close_group()
+    return merged
+
+
+def optimize_plan(plan, definitions=None, shorten_travel=True):
+    """
+    Run every pass over the plan.
+    :param plan:
+    :param definitions: Custom labware definitions by load name, for the deck geometry.
+    :param shorten_travel: False leaves out the travel and route passes.
+    :return: The optimized RunPlan and an OptimizationReport.
+    """
+    geometry = DeckGeometry(plan.labware, plan.pipettes, definitions)
+    steps = split_dilutions(plan, plan.steps)
+    steps = column_transfers(plan, steps)
+    steps = [step for unit in order_units(plan_units(steps)) for step in unit.steps]
+    if shorten_travel:
+        steps = order_runs(steps, geometry)
+    steps = reuse_tips(steps)
+    steps = merge_transfers(plan, steps)
+    if shorten_travel:
+        steps = order_destinations(steps, geometry)
+    optimized = RunPlan(steps, plan.labware, plan.pipettes, plan.tsv_sha256, plan.template)
+
+    return optimized, OptimizationReport(plan_cost(plan, geometry), plan_cost(optimized, geometry))
+
+
+def plan_cost(plan, geometry=None):
+    """
+    Count the robot actions in the plan and estimate how long they and the moves between them take.
+    :param plan:
+    :param geometry: DeckGeometry.  One is made from the plan's labware without one.
+    :return: PlanCost
+    """
+    aspirates = dispenses = blow_outs = touches = mix_cycles = swaps = 0
+    last_mount = None
+    for step in plan.steps:
+        if isinstance(step, (Transfer, ColumnTransfer)):
+            aspirates += step.loops
+            dispenses += step.loops
+            blow_outs += 1 if step.mix_volume else step.loops
+            touches += 2 * step.loops if step.touch else 0
+            if step.mix_volume:
+                mix_cycles += 4
+                touches += 1
+        elif isinstance(step, MultiDispense):
+            aspirates += 1
+            dispenses += len(step.destinations)
+            blow_outs += 1
+            touches += len(step.destinations) if step.touch else 0
+        elif isinstance(step, Distribute):
+            per_aspirate = max(1, int((_pipette_range(plan, step.mount)[1] - DISTRIBUTE_DISPOSAL) // step.volume))
+            loads = math.ceil(len(step.destinations) / per_aspirate)
+            aspirates += loads
+            dispenses += len(step.destinations)
+            blow_outs += loads
+            touches += loads + len(step.destinations)
+        elif isinstance(step, Dilute):
+            aspirates += 2
+            dispenses += 2
+            blow_outs += 2
+        elif isinstance(step, Mix):
+            mix_cycles += step.repetitions
+            blow_outs += 1
+
+        mounts = _mounts(step)
+        if mounts:
+            if last_mount is not None and mounts[0] != last_mount:
+                swaps += 1
+            last_mount = mounts[-1]
+
+    tips = sum(plan.tips_required().values())
+    travel = plan_travel(plan, geometry or DeckGeometry(plan.labware, plan.pipettes))
+    seconds = travel.seconds + tips * (PICK_UP_SECONDS + DROP_SECONDS) + aspirates * ASPIRATE_SECONDS + \
+        dispenses * DISPENSE_SECONDS + blow_outs * BLOW_OUT_SECONDS + touches * TOUCH_TIP_SECONDS + \
+        mix_cycles * MIX_CYCLE_SECONDS
+    return PlanCost(len(plan.steps), tips, aspirates, dispenses, swaps, travel.millimetres, round(seconds, 1))
+
+
+def describe_report(report):
+    before, after = report
+    return "Optimized run plan: {} steps instead of {}.  Tips: {} instead of {}.  Aspirates: {} instead of {}.  " \
+           "Pipette swaps: {} instead of {}.  Gantry travel: {:.1f} m instead of {:.1f} m.  " \
+           "Estimated run time: {:.1f} min instead of {:.1f} min."\
+        .format(after.steps, before.steps, after.tips, before.tips, after.aspirates, before.aspirates,
+                after.pipette_swaps, before.pipette_swaps, after.travel_mm / 1000, before.travel_mm / 1000,
+                after.seconds / 60, before.seconds / 60)
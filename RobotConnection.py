@@ -0,0 +1,211 @@
+"""
+Persistent SSH connections to the OT-2 robots.
+
+The first request to a robot resolves its name, makes the SSH connection and authenticates.  The transport is then
+kept open with keepalives and shared by every later scp transfer, command and shell, each of which only opens a new
+channel on it.  A transport that has died, because the robot was restarted or the network dropped, is noticed when the
+next channel is asked for and the connection is made again without the caller having to do anything.  With a
+RobotDiscovery the address comes from its cache instead of a name lookup.  paramiko is only imported when the first
+connection is made so the GUI does not wait for it at start up.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import os
+import socket
+import threading
+
+__version__ = "1.0.0"
+
+DEFAULT_ROBOT = "OT2CEP20180915A20"
+DEFAULT_KEY_FILE = "C:{0}Users{0}robotron{0}ot2_ssh_key".format(os.sep)
+# Seconds between keepalive packets on an idle transport.
+KEEPALIVE_INTERVAL = 15
+CONNECT_TIMEOUT = 10
+
+
+class RobotConnectionError(Exception):
+    """
+    Problems connecting to the robot.  Critical errors stop the GUI from doing anything else.
+    """
+
+    def __init__(self, msg, critical=False, *args):
+        super(RobotConnectionError, self).__init__(msg, *args)
+        self.critical = critical
+
+
+class RobotConnection:
+    """
+    One authenticated SSH transport to a robot.
+    """
+    def __init__(self, robot_name, username="root", key_filename=DEFAULT_KEY_FILE, port=22,
+                 keepalive=KEEPALIVE_INTERVAL, timeout=CONNECT_TIMEOUT, discovery=None):
+        self.robot_name = robot_name
+        self.username = username
+        self.key_filename = key_filename
+        self.port = port
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.discovery = discovery
+        self.host_ip = None
+        self.connect_count = 0
+        self._client = None
+        self._lock = threading.RLock()
+
+    def resolve(self):
+        if self.discovery is not None:
+            return self.discovery.resolve(self.robot_name)
+
+        try:
+            return socket.gethostbyname(self.robot_name)
+        except socket.gaierror:
+            raise RobotConnectionError("Unable to connect to Opentrons OT-2 {}\n Is robot on and connected to computer?"
+                                       .format(self.robot_name))
+
+    def is_alive(self):
+        from paramiko import SSHException
+
+        transport = self._client.get_transport() if self._client else None
+        if transport is None or not transport.is_active():
+            return False
+
+        # A transport can look active until something is sent over it.
+        try:
+            transport.send_ignore()
+        except (SSHException, OSError, EOFError):
+            return False
+        return True
+
+    def connect(self):
+        """
+        Return the live transport, connecting first if there is none.
+        :return:
+        """
+        from paramiko import AutoAddPolicy, SSHClient, SSHException
+
+        with self._lock:
+            if self.is_alive():
+                return self._client.get_transport()
+
+            self._close_client()
+            self.host_ip = self.resolve()
+            client = SSHClient()
+            client.load_system_host_keys()
+            client.set_missing_host_key_policy(AutoAddPolicy())
+            try:
+                client.connect(hostname=self.host_ip, port=self.port, username=self.username,
+                               key_filename=self.key_filename, timeout=self.timeout, banner_timeout=self.timeout,
+                               auth_timeout=self.timeout)
+            except socket.timeout:
+                client.close()
+                self._forget_address()
+                raise RobotConnectionError("Timed out connecting to Opentrons OT-2 {}".format(self.robot_name))
+            except (SSHException, OSError):
+                client.close()
+                self._forget_address()
+                raise RobotConnectionError("SSH unable to establish connection to robot.  Secure Key error",
+                                           critical=True)
+
+            client.get_transport().set_keepalive(self.keepalive)
+            self._client = client
+            self.connect_count += 1
+            return client.get_transport()
+
+    def open_channel(self):
+        """
+        New session channel.  If the transport died since it was last checked the connection is made again once.
+        :return:
+        """
+        from paramiko import SSHException
+
+        try:
+            return self.connect().open_session(timeout=self.timeout)
+        except (SSHException, OSError, EOFError):
+            with self._lock:
+                self._close_client()
+            try:
+                return self.connect().open_session(timeout=self.timeout)
+            except (SSHException, OSError, EOFError) as error:
+                raise RobotConnectionError("Lost the connection to Opentrons OT-2 {}: {}"
+                                           .format(self.robot_name, error))
+
+    def exec_command(self, command):
+        """
+        Run a command and return its exit status, stdout and stderr.
+        :param command:
+        :return:
+        """
+        channel = self.open_channel()
+        try:
+            channel.exec_command(command)
+            stdout = channel.makefile("rb").read()
+            stderr = channel.makefile_stderr("rb").read()
+            return channel.recv_exit_status(), stdout.decode(errors="replace"), stderr.decode(errors="replace")
+        finally:
+            channel.close()
+
+    def shell(self):
+        channel = self.open_channel()
+        channel.get_pty()
+        channel.invoke_shell()
+        return channel
+
+    def scp(self, progress=None):
+        from scp import SCPClient
+
+        return SCPClient(self.connect(), progress=progress)
+
+    def _forget_address(self):
+        # The robot may have a new address, so look it up again next time.
+        if self.discovery is not None:
+            self.discovery.forget(self.robot_name)
+
+    def _close_client(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def close(self):
+        with self._lock:
+            self._close_client()
+
+
+class ConnectionPool:
+    """
+    One RobotConnection per robot name, shared by everything in the GUI.
+    """
+    def __init__(self, **connection_options):
+        self.connection_options = connection_options
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def get(self, robot_name=DEFAULT_ROBOT, **connection_options):
+        """
+        The connection for the robot.  connection_options, such as a key file for this robot, override the pool's
+        options when the connection is first made.
+        :param robot_name:
+        :param connection_options:
+        :return:
+        """
+        with self._lock:
+            connection = self._connections.get(robot_name)
+            if connection is None:
+                options = dict(self.connection_options, **connection_options)
+                connection = self._connections[robot_name] = RobotConnection(robot_name, **options)
+            return connection
+
+    def close(self, robot_name):
+        with self._lock:
+            connection = self._connections.pop(robot_name, None)
+        if connection:
+            connection.close()
+
+    def close_all(self):
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
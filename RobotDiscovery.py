@@ -0,0 +1,171 @@
+"""
+Find the robots on the network without holding up the GUI.
+
+Each robot's name is resolved and its SSH port probed on a worker thread, and both are given a strict timeout, so a
+robot that is switched off costs at most a few seconds of a background thread rather than a frozen window.  The last
+address found for each robot is kept for TTL seconds and the robots are checked again in the background before it runs
+out, so by the time the user transfers a file the robot's address and whether it is reachable are already known.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import socket
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from RobotConnection import RobotConnectionError
+
+__version__ = "1.0.0"
+
+# Seconds allowed for a name lookup and for the SSH port to accept a connection.
+DNS_TIMEOUT = 3.0
+PROBE_TIMEOUT = 2.0
+# Seconds an address is trusted before it is looked up again.
+ADDRESS_TTL = 300.0
+# Seconds between background checks.
+REFRESH_INTERVAL = 30.0
+
+# online is None until the robot has been checked.
+RobotAddress = namedtuple("RobotAddress", ["name", "ip", "online", "checked", "message"])
+
+
+class RobotDiscovery:
+    def __init__(self, robot_names=(), port=22, ttl=ADDRESS_TTL, dns_timeout=DNS_TIMEOUT,
+                 probe_timeout=PROBE_TIMEOUT, on_change=None):
+        self.robot_names = list(robot_names)
+        self.port = port
+        self.ttl = ttl
+        self.dns_timeout = dns_timeout
+        self.probe_timeout = probe_timeout
+        self.on_change = on_change
+        self._addresses = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=max(4, len(self.robot_names)),
+                                            thread_name_prefix="OT2Discovery")
+        # Lookups have their own workers so they never queue behind the checks waiting on them.  A lookup that never
+        # returns keeps its worker, so there is room for several at once.
+        self._lookups = ThreadPoolExecutor(max_workers=max(4, 2 * len(self.robot_names)),
+                                           thread_name_prefix="OT2Lookup")
+
+    def add(self, robot_name):
+        with self._lock:
+            if robot_name not in self.robot_names:
+                self.robot_names.append(robot_name)
+
+    def status(self, robot_name):
+        """
+        What is known about the robot right now.  Never waits on the network.
+        :param robot_name:
+        :return:
+        """
+        with self._lock:
+            return self._addresses.get(robot_name, RobotAddress(robot_name, None, None, 0, ""))
+
+    def _lookup(self, robot_name):
+        future = self._lookups.submit(socket.gethostbyname, robot_name)
+        try:
+            return future.result(timeout=self.dns_timeout)
+        except FutureTimeout:
+            raise RobotConnectionError("Looking up Opentrons OT-2 {} took longer than {} seconds"
+                                       .format(robot_name, self.dns_timeout))
+        except (socket.gaierror, UnicodeError):
+            raise RobotConnectionError("Unable to connect to Opentrons OT-2 {}\n Is robot on and connected to computer?"
+                                       .format(robot_name))
+
+    def _probe(self, ip):
+        try:
+            with socket.create_connection((ip, self.port), timeout=self.probe_timeout):
+                return True
+        except OSError:
+            return False
+
+    def check(self, robot_name):
+        """
+        Look the robot up and probe its SSH port.  The cached address is used while it is fresh.
+        :param robot_name:
+        :return:
+        """
+        cached = self.status(robot_name)
+        ip = cached.ip if cached.ip and time.monotonic() - cached.checked < self.ttl else None
+        checked = cached.checked
+        message = ""
+        try:
+            if ip is None:
+                ip = self._lookup(robot_name)
+                checked = time.monotonic()
+            online = self._probe(ip)
+            if not online:
+                message = "Nothing answered on port {} of {}".format(self.port, ip)
+        except RobotConnectionError as error:
+            # An address that can no longer be looked up is kept, but the robot is shown as offline.
+            ip, online, message = cached.ip, False, str(error).splitlines()[0]
+
+        address = RobotAddress(robot_name, ip, online, checked, message)
+        with self._lock:
+            self._addresses[robot_name] = address
+        if self.on_change and (address.ip, address.online) != (cached.ip, cached.online):
+            self.on_change(address)
+        return address
+
+    def check_all(self):
+        with self._lock:
+            robot_names = list(self.robot_names)
+        return [self._executor.submit(self.check, robot_name) for robot_name in robot_names]
+
+    def resolve(self, robot_name):
+        """
+        Address to connect to.  A fresh cached address is returned at once, otherwise the robot is checked with the
+        timeouts above.  Call from a worker thread, never the GUI thread.
+        :param robot_name:
+        :return:
+        """
+        cached = self.status(robot_name)
+        if cached.ip and cached.online and time.monotonic() - cached.checked < self.ttl:
+            return cached.ip
+
+        self.add(robot_name)
+        address = self.check(robot_name)
+        if not address.online:
+            raise RobotConnectionError("Unable to connect to Opentrons OT-2 {}\n{}".format(robot_name, address.message))
+        return address.ip
+
+    def forget(self, robot_name):
+        """
+        Drop the cached address, for when a connection to it has failed.
+        :param robot_name:
+        :return:
+        """
+        with self._lock:
+            cached = self._addresses.get(robot_name)
+            if cached:
+                self._addresses[robot_name] = cached._replace(checked=0)
+
+    def start(self, interval=REFRESH_INTERVAL):
+        """
+        Check every robot now and again every interval seconds on a background thread.
+        :param interval:
+        :return:
+        """
+        def refresh():
+            while not self._stop.is_set():
+                for future in self.check_all():
+                    try:
+                        future.result()
+                    except Exception:
+                        pass
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=refresh, name="OT2DiscoveryRefresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+        self._lookups.shutdown(wait=False)
@@ -0,0 +1,127 @@
+"""
+Run a program on the robot with opentrons_execute and stream what it prints back as it runs.
+
+The command runs on a channel of the pooled SSH connection with a pseudo terminal so an interrupt sent on the channel
+stops it the same way Ctrl-C would at the robot's terminal.  The output is read in small pieces with a short timeout,
+split in to lines and counted against the number of steps in the simulated run log to give the progress of the run.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import re
+import socket
+import threading
+
+__version__ = "1.0.0"
+
+# Seconds to wait for output before checking whether the run has finished.
+READ_TIMEOUT = 0.2
+# Seconds an interrupted run has to stop before the channel is closed.
+CANCEL_TIMEOUT = 1.0
+INTERRUPT = "\x03"
+
+_log_line = re.compile(r"^\s*(Logs from this command:|(DEBUG|INFO|WARNING|ERROR|CRITICAL) \()")
+
+
+def execute_command(server_path, program_name):
+    return "opentrons_execute {0}{1} -L {0}custom_labware".format(server_path, program_name)
+
+
+class RunProgress:
+    """
+    Counts the run log steps printed by opentrons_execute.  Log messages printed under a step are not steps.
+    """
+    def __init__(self, total_steps=0):
+        self.total_steps = total_steps
+        self.step = 0
+
+    def feed(self, line):
+        if line.strip() and not _log_line.match(line):
+            self.step += 1
+            if self.total_steps:
+                self.step = min(self.step, self.total_steps)
+        return self.step
+
+
+class RemoteRun:
+    def __init__(self, connection, command):
+        self.connection = connection
+        self.command = command
+        self.channel = None
+        self.cancelled = False
+        self._started = threading.Event()
+
+    def start(self):
+        self.channel = self.connection.open_channel()
+        self.channel.get_pty(width=200)
+        self.channel.exec_command(self.command)
+        self.channel.settimeout(READ_TIMEOUT)
+        self._started.set()
+        if self.cancelled:
+            self.cancel()
+
+    def wait(self, on_lines=None):
+        """
+        Read the output until the command exits and return its exit status.  on_lines is called with each group of
+        complete lines as they arrive.
+        :param on_lines:
+        :return:
+        """
+        if self.channel is None:
+            self.start()
+
+        channel = self.channel
+        pending = ""
+        while True:
+            try:
+                data = channel.recv(32768)
+            except socket.timeout:
+                if channel.exit_status_ready() and not channel.recv_ready():
+                    break
+                continue
+            except OSError:
+                break
+
+            if not data:
+                break
+
+            pending += data.decode(errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+            lines = pending.split("\n")
+            pending = lines.pop()
+            if lines and on_lines:
+                on_lines(lines)
+
+        if pending and on_lines:
+            on_lines([pending])
+
+        if channel.closed and not channel.exit_status_ready():
+            return None
+        return channel.recv_exit_status()
+
+    def cancel(self):
+        """
+        Send an interrupt and close the channel if the run has not stopped within CANCEL_TIMEOUT seconds.  Returns
+        right away so it can be called from the GUI thread.
+        :return:
+        """
+        self.cancelled = True
+        if not self._started.is_set():
+            return
+
+        channel = self.channel
+        try:
+            channel.send(INTERRUPT)
+        except OSError:
+            channel.close()
+            return
+
+        def close_if_running():
+            if not channel.exit_status_ready():
+                channel.close()
+
+        timer = threading.Timer(CANCEL_TIMEOUT, close_if_running)
+        timer.daemon = True
+        timer.start()
@@ -0,0 +1,168 @@
+"""
+Copy the TSV file, the protocol and the custom labware to the robot, sending only what has changed.
+
+The SHA-256 of every local file is compared with the digests of the robot's copies, which are read with a single
+sha256sum command.  Files that differ are sent together as one tar archive streamed over one channel and unpacked on
+the robot, and the digests are read again afterwards to confirm the robot has exactly what was sent.  When nothing has
+changed only the one sha256sum command goes over the network.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import hashlib
+import os
+import posixpath
+import shlex
+import tarfile
+from collections import namedtuple
+
+from RobotConnection import RobotConnectionError
+from RunPlan import MODULE_DIR, ROBOT_MODULES, robot_plan_name, run_plan_path, run_protocol
+
+__version__ = "1.0.0"
+
+SyncFile = namedtuple("SyncFile", ["local_path", "remote_name", "digest", "size"])
+SyncResult = namedtuple("SyncResult", ["uploaded", "unchanged", "bytes_sent", "mismatched"])
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sync_files(tsv_path, tsv_name, protocol_path=None, labware_dir=None):
+    """
+    The local files to keep on the robot and their names relative to the notebook directory.  The run plan made when
+    the TSV file was validated goes with it, named to match the TSV file on the robot.  The robot modules go with the
+    protocol so the robot runs the same code that was checked here.
+    :param tsv_path:
+    :param tsv_name:
+    :param protocol_path: The program's protocol.  The plan protocol is sent instead when the TSV file has a plan.
+    :param labware_dir:
+    :return:
+    """
+    files = [(tsv_path, tsv_name)]
+    if os.path.isfile(run_plan_path(tsv_path)):
+        files.append((run_plan_path(tsv_path), robot_plan_name(tsv_name)))
+    if protocol_path:
+        protocol_path = run_protocol(protocol_path, tsv_path)
+    if protocol_path and os.path.isfile(protocol_path):
+        files.append((protocol_path, os.path.basename(protocol_path)))
+        for module_name in ROBOT_MODULES:
+            path = os.path.join(MODULE_DIR, module_name)
+            if os.path.isfile(path):
+                files.append((path, module_name))
+    if labware_dir and os.path.isdir(labware_dir):
+        for file_name in sorted(os.listdir(labware_dir)):
+            path = os.path.join(labware_dir, file_name)
+            if file_name.lower().endswith(".json") and os.path.isfile(path):
+                files.append((path, posixpath.join("custom_labware", file_name)))
+
+    return [SyncFile(path, name, file_sha256(path), os.path.getsize(path)) for path, name in files]
+
+
+def remote_digests(connection, remote_dir, remote_names):
+    """
+    SHA-256 of the robot's copies in one command.  Files the robot does not have are left out.
+    :param connection:
+    :param remote_dir:
+    :param remote_names:
+    :return:
+    """
+    command = "cd {} && sha256sum {} 2>/dev/null; true"\
+        .format(shlex.quote(remote_dir), " ".join(shlex.quote(name) for name in remote_names))
+    exit_status, stdout, stderr = connection.exec_command(command)
+
+    digests = {}
+    for line in stdout.splitlines():
+        digest, _, name = line.partition("  ")
+        if name:
+            digests[name.strip()] = digest.strip()
+    return digests
+
+
+class _ChannelWriter:
+    """
+    File like wrapper so tarfile can stream straight into the channel.
+    """
+    def __init__(self, channel, progress=None, total=0):
+        self.channel = channel
+        self.progress = progress
+        self.total = total
+        self.bytes_sent = 0
+
+    def write(self, data):
+        self.channel.sendall(data)
+        self.bytes_sent += len(data)
+        if self.progress:
+            self.progress(self.bytes_sent, self.total)
+        return len(data)
+
+
+def upload_archive(connection, remote_dir, files, progress=None, on_channel=None):
+    """
+    Send the files as one tar archive that is unpacked on the robot as it arrives.  Returns the bytes sent.
+    :param connection:
+    :param remote_dir:
+    :param files:
+    :param progress: Called with bytes sent and the approximate total.
+    :param on_channel: Called with the channel before anything is sent so the caller can close it to cancel.
+    :return:
+    """
+    channel = connection.open_channel()
+    if on_channel:
+        on_channel(channel)
+    try:
+        channel.exec_command("mkdir -p {0} && tar -xf - -C {0}".format(shlex.quote(remote_dir)))
+        # Each file has a 512 byte header and is padded to a 512 byte block.
+        total = sum(512 + -(-file.size // 512) * 512 for file in files) + 1024
+        writer = _ChannelWriter(channel, progress, total)
+        with tarfile.open(fileobj=writer, mode="w|", format=tarfile.USTAR_FORMAT) as archive:
+            for file in files:
+                info = archive.gettarinfo(file.local_path, arcname=file.remote_name)
+                info.uid = info.gid = 0
+                info.uname = info.gname = "root"
+                info.mode = 0o644
+                with open(file.local_path, 'rb') as local_file:
+                    archive.addfile(info, local_file)
+        channel.shutdown_write()
+
+        exit_status = channel.recv_exit_status()
+        if exit_status != 0:
+            error = channel.recv_stderr(4096).decode(errors="replace")
+            raise RobotConnectionError("Unpacking the files on the robot failed: {}".format(error.strip()))
+    finally:
+        channel.close()
+
+    return writer.bytes_sent
+
+
+def sync_to_robot(connection, remote_dir, files, progress=None, on_channel=None):
+    """
+    Upload the files that differ from the robot's copies and confirm the robot's copies afterwards.
+    :param connection:
+    :param remote_dir:
+    :param files: List of SyncFile from sync_files.
+    :param progress:
+    :param on_channel:
+    :return:
+    """
+    names = [file.remote_name for file in files]
+    digests = remote_digests(connection, remote_dir, names)
+    changed = [file for file in files if digests.get(file.remote_name) != file.digest]
+    unchanged = [file for file in files if digests.get(file.remote_name) == file.digest]
+
+    bytes_sent = 0
+    mismatched = []
+    if changed:
+        bytes_sent = upload_archive(connection, remote_dir, changed, progress, on_channel)
+        digests = remote_digests(connection, remote_dir, [file.remote_name for file in changed])
+        mismatched = [file for file in changed if digests.get(file.remote_name) != file.digest]
+
+    return SyncResult(changed, unchanged, bytes_sent, mismatched)
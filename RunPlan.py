@@ -0,0 +1,510 @@
+"""
+Compiled run plan for a PCR setup.
+
+Validation already works out which well every reaction goes in, which samples need diluting and how much of each
+liquid goes where.  The run plan keeps that work as an ordered list of typed steps with the slots, wells, volumes and
+pipette mount resolved, and is saved as JSON next to the TSV file.  The robot program loads the plan instead of
+working everything out again from the TSV file on the robot's controller, so the plan that was checked is the plan
+that runs.  The plan holds the SHA-256 of the TSV file it was made from and is ignored if the file has changed.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import hashlib
+import json
+import math
+import os
+from collections import Counter, defaultdict, namedtuple
+
+from TemplateParser import named_tip_boxes
+
+__version__ = "1.0.0"
+
+# Bump this any time the steps change so an old plan is never run by a newer program.
+PLAN_VERSION = 3
+# Matches Utilities.RUN_PLAN_SUFFIX, which is repeated there so the robot does not need this module.
+RUN_PLAN_SUFFIX = ".plan.json"
+PLAN_DIR = os.path.join(os.path.expanduser("~"), ".opentrons_gui", "run_plans")
+
+# Robot program that runs a saved run plan.  It is kept with these modules and runs every TSV file that has a plan.
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+PLAN_PROTOCOL = os.path.join(MODULE_DIR, "RunPlanProtocol.py")
+# Modules in MODULE_DIR the robot programs import.
+ROBOT_MODULES = ["Utilities.py", "TemplateParser.py"]
+
+# A well on the deck.  slot is the deck slot as a string, the way the TSV file gives it.
+Site = namedtuple("Site", ["slot", "well"])
+
+# Liquid from one well to another.  loops is how many times the volume is moved, for pipettes that have to go twice.
+# A step with new_tip set drops any tip on the pipette and picks up a fresh one, otherwise the tip already on the
+# pipette is used.  Either way the tip is kept on for the steps after it.
+Transfer = namedtuple("Transfer", ["label", "mount", "source", "destination", "volume", "loops", "new_tip",
+                                   "mix_volume", "touch"])
+# The same volume from one well to many with a single tip.
+Distribute = namedtuple("Distribute", ["label", "mount", "source", "destinations", "volume"])
+# One aspirate dispensed into several wells, each with its own volume.  The disposal volume is aspirated as well and
+# blown back into the source.  Tips follow the rules of Transfer.
+MultiDispense = namedtuple("MultiDispense", ["label", "mount", "source", "destinations", "volumes", "new_tip",
+                                             "disposal_volume", "touch"])
+# A Transfer made by an 8-channel pipette, one column at a time.  sources and destinations are the wells of each
+# channel, the first channel first.  Every channel draws from the same well of a reservoir.  Each tip pick-up is a
+# column of tips.
+ColumnTransfer = namedtuple("ColumnTransfer", ["label", "mount", "sources", "destinations", "volume", "loops",
+                                               "new_tip", "mix_volume", "touch"])
+# Mixes with the tip already on the pipette, or a fresh one, and drops it.
+Mix = namedtuple("Mix", ["label", "mount", "well", "volume", "repetitions"])
+# Diluent then sample into an empty well.  The diluent tip is dropped and the sample tip is kept for the Mix after it.
+Dilute = namedtuple("Dilute", ["label", "diluent_mount", "sample_mount", "diluent_source", "source", "destination",
+                               "diluent_volume", "sample_volume"])
+Temperature = namedtuple("Temperature", ["label", "slot", "celsius"])
+
+STEP_KINDS = {Transfer: "transfer", ColumnTransfer: "column_transfer", Distribute: "distribute",
+              MultiDispense: "multi_dispense", Mix: "mix", Dilute: "dilute", Temperature: "temperature"}
+_STEP_TYPES = {kind: step_type for step_type, kind in STEP_KINDS.items()}
+# Fields that hold one Site or a list of them.
+_SITE_FIELDS = {"source", "destination", "diluent_source", "well"}
+_SITE_LIST_FIELDS = {"sources", "destinations"}
+
+# Smallest and largest volume in uL and the number of channels of the pipettes the plan can use.
+PIPETTE_RANGES = {
+    "p10_single": (1, 10, 1),
+    "p10_multi": (1, 10, 8),
+    "p20_single_gen2": (1, 20, 1),
+    "p20_multi_gen2": (1, 20, 8),
+    "p300_single_gen2": (20, 300, 1),
+    "p300_multi_gen2": (20, 300, 8),
+    "p1000_single_gen2": (100, 1000, 1),
+    }
+COLUMN_CHANNELS = 8
+
+MIX_REPETITIONS = 4
+
+
+class RunPlanError(Exception):
+    """
+    The template cannot be turned into a plan, or a saved plan cannot be read.
+    """
+
+    def __init__(self, msg, *args):
+        super(RunPlanError, self).__init__(msg, *args)
+
+
+def run_plan_path(tsv_path):
+    """
+    Where the plan for a TSV file is kept on this computer.  Plans go in PLAN_DIR, not beside the user's file, and
+    the name has a hash of the file's full path so sheets with the same name in different folders have their own plan.
+    :param tsv_path:
+    :return:
+    """
+    tsv_path = os.path.abspath(tsv_path)
+    path_hash = hashlib.sha256(tsv_path.encode("utf-8")).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(tsv_path))[0]
+    return os.path.join(PLAN_DIR, "{}_{}{}".format(stem, path_hash, RUN_PLAN_SUFFIX))
+
+
+def robot_plan_name(tsv_name):
+    """
+    Name of the plan on the robot, where Utilities.load_run_plan looks beside the TSV file.  ProcedureFile.tsv has
+    ProcedureFile.plan.json.
+    :param tsv_name:
+    :return:
+    """
+    return "{}{}".format(os.path.splitext(tsv_name)[0], RUN_PLAN_SUFFIX)
+
+
+def run_protocol(protocol_path, tsv_path):
+    """
+    The protocol that runs the TSV file.  A file with a run plan made from it as it is now is run by PLAN_PROTOCOL,
+    anything else by the program's own protocol.
+    :param protocol_path: The program's protocol.
+    :param tsv_path:
+    :return:
+    """
+    try:
+        plan = RunPlan.load(run_plan_path(tsv_path))
+    except RunPlanError:
+        return protocol_path
+    return PLAN_PROTOCOL if plan.matches(tsv_path) else protocol_path
+
+
+def tsv_digest(tsv_path):
+    with open(tsv_path, 'rb') as tsv_file:
+        return hashlib.sha256(tsv_file.read()).hexdigest()
+
+
+def column_sites(labware, site, channels=COLUMN_CHANNELS):
+    """
+    The wells the channels of a multichannel pipette reach with its first channel in the well at site.  Every channel
+    is in the same well of a reservoir, goes down the column of a 96 well labware and takes every other row of a 384
+    well plate.
+    :param labware: Labware load name by slot.
+    :param site:
+    :param channels:
+    :return: A Site for each channel, or None when the pipette does not fit the labware there.
+    """
+    load_name = labware.get(site.slot, "")
+    row, column = site.well[0], site.well[1:]
+    if "reservoir" in load_name:
+        return [site] * channels
+    if "384" in load_name and row in "AB":
+        return [Site(site.slot, "{}{}".format(chr(ord(row) + 2 * channel), column)) for channel in range(channels)]
+    if ("96" in load_name or "8_well" in load_name or "ddpcr_plate" in load_name) and row == "A":
+        return [Site(site.slot, "{}{}".format(chr(ord("A") + channel), column)) for channel in range(channels)]
+    return None
+
+
+def step_to_dict(step):
+    values = {"kind": STEP_KINDS[type(step)]}
+    for name, value in step._asdict().items():
+        if name in _SITE_FIELDS and value is not None:
+            value = list(value)
+        elif name in _SITE_LIST_FIELDS:
+            value = [list(site) for site in value]
+        values[name] = value
+    return values
+
+
+def step_from_dict(values):
+    values = dict(values)
+    try:
+        step_type = _STEP_TYPES[values.pop("kind")]
+    except KeyError as error:
+        raise RunPlanError("Unknown run plan step {}".format(error))
+
+    for name in _SITE_FIELDS.intersection(values):
+        if values[name] is not None:
+            values[name] = Site(*values[name])
+    for name in _SITE_LIST_FIELDS.intersection(values):
+        values[name] = [Site(*site) for site in values[name]]
+    try:
+        return step_type(**values)
+    except TypeError as error:
+        raise RunPlanError("Run plan step {} is not valid: {}".format(STEP_KINDS[step_type], error))
+
+
+class RunPlan:
+    def __init__(self, steps=(), labware=None, pipettes=None, tsv_sha256="", template=""):
+        """
+        :param steps: Steps in the order they are run.
+        :param labware: Labware load name by slot.
+        :param pipettes: For each mount the pipette name, its tip box slots and its first tip.
+        :param tsv_sha256: SHA-256 of the TSV file the plan was made from.
+        :param template: Template name from the TSV file.
+        """
+        self.steps = list(steps)
+        self.labware = dict(labware or {})
+        self.pipettes = dict(pipettes or {})
+        self.tsv_sha256 = tsv_sha256
+        self.template = template
+
+    def to_dict(self):
+        return {"version": PLAN_VERSION, "template": self.template, "tsv_sha256": self.tsv_sha256,
+                "labware": self.labware, "pipettes": self.pipettes,
+                "steps": [step_to_dict(step) for step in self.steps]}
+
+    @classmethod
+    def from_dict(cls, values):
+        if values.get("version") != PLAN_VERSION:
+            raise RunPlanError("Run plan version {} is not supported.  Validate the TSV file again."
+                               .format(values.get("version")))
+        return cls([step_from_dict(step) for step in values["steps"]], values["labware"], values["pipettes"],
+                   values["tsv_sha256"], values.get("template", ""))
+
+    def save(self, path):
+        # Written to a temporary file first so a reader never sees half a plan.
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = "{}.tmp".format(path)
+        with open(temp_path, 'w') as plan_file:
+            json.dump(self.to_dict(), plan_file, indent=1)
+        os.replace(temp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as plan_file:
+                return cls.from_dict(json.load(plan_file))
+        except (OSError, ValueError, KeyError) as error:
+            raise RunPlanError("Unable to read run plan {}: {}".format(path, error))
+
+    def matches(self, tsv_path):
+        """
+        True when the plan was made from this TSV file as it is now.
+        :param tsv_path:
+        :return:
+        """
+        return self.tsv_sha256 == tsv_digest(tsv_path)
+
+    def channels(self, mount):
+        return PIPETTE_RANGES.get(self.pipettes.get(mount, {}).get("name"), (1, 20, 1))[2]
+
+    def tips_required(self):
+        """
+        Tip pick-ups for each mount, following the tip rules of the steps.  A multichannel pipette picks up a column of
+        tips at a time.
+        :return:
+        """
+        tips = Counter()
+        has_tip = set()
+        for step in self.steps:
+            if isinstance(step, (Transfer, ColumnTransfer, MultiDispense)):
+                if step.new_tip or step.mount not in has_tip:
+                    tips[step.mount] += 1
+                has_tip.add(step.mount)
+            elif isinstance(step, Distribute):
+                tips[step.mount] += 1
+                has_tip.discard(step.mount)
+            elif isinstance(step, Mix):
+                if step.mount not in has_tip:
+                    tips[step.mount] += 1
+                has_tip.discard(step.mount)
+            elif isinstance(step, Dilute):
+                tips[step.diluent_mount] += 1
+                tips[step.sample_mount] += 1
+                has_tip.discard(step.diluent_mount)
+                has_tip.add(step.sample_mount)
+        return dict(tips)
+
+    def liquid_required(self):
+        """
+        Total uL taken from each well.
+        :return:
+        """
+        drawn = defaultdict(float)
+        for step in self.steps:
+            if isinstance(step, Transfer):
+                drawn[step.source] += step.volume * step.loops
+            elif isinstance(step, ColumnTransfer):
+                for site in step.sources:
+                    drawn[site] += step.volume * step.loops
+            elif isinstance(step, Distribute):
+                drawn[step.source] += step.volume * len(step.destinations)
+            elif isinstance(step, MultiDispense):
+                # The disposal volume goes back into the source.
+                drawn[step.source] += sum(step.volumes)
+            elif isinstance(step, Dilute):
+                drawn[step.diluent_source] += step.diluent_volume
+                drawn[step.source] += step.sample_volume
+        return dict(drawn)
+
+    def liquid_added(self):
+        """
+        Total uL put into each well.
+        :return:
+        """
+        added = defaultdict(float)
+        for step in self.steps:
+            if isinstance(step, Transfer):
+                added[step.destination] += step.volume * step.loops
+            elif isinstance(step, ColumnTransfer):
+                for site in step.destinations:
+                    added[site] += step.volume * step.loops
+            elif isinstance(step, Distribute):
+                for site in step.destinations:
+                    added[site] += step.volume
+            elif isinstance(step, MultiDispense):
+                for site, volume in zip(step.destinations, step.volumes):
+                    added[site] += volume
+            elif isinstance(step, Dilute):
+                added[step.destination] += step.diluent_volume + step.sample_volume
+        return dict(added)
+
+    def summary(self):
+        kinds = Counter(STEP_KINDS[type(step)] for step in self.steps)
+        tips = ", ".join("{} {}{}".format(count, "columns " if self.channels(mount) > 1 else "", mount)
+                         for mount, count in sorted(self.tips_required().items()))
+        return "Run plan: {} steps ({}).  Tips: {}."\
+            .format(len(self.steps), ", ".join("{} {}".format(count, kind) for kind, count in sorted(kinds.items())),
+                    tips or "none")
+
+
+def select_pipette(pipettes, volume):
+    """
+    Mount and number of loops for a volume moved to one well, following the rules of Utilities.pipette_selection but
+    by pipette name so it can be decided before the pipettes are loaded.
+    :param pipettes: Pipette name by mount.
+    :param volume:
+    :return: mount, loops and the volume moved in each loop.
+    """
+    def mount_of(name):
+        return next((mount for mount, pipette in sorted(pipettes.items()) if pipette == name), None)
+
+    if volume > 20 and mount_of("p300_single_gen2"):
+        return mount_of("p300_single_gen2"), 1, round(volume, 1)
+    if volume <= 20 and mount_of("p20_single_gen2"):
+        return mount_of("p20_single_gen2"), 1, round(volume, 1)
+    if volume < 10 and mount_of("p10_single"):
+        return mount_of("p10_single"), 1, round(volume, 1)
+    if 10 <= volume <= 20 and mount_of("p10_single"):
+        return mount_of("p10_single"), 2, round(volume * 0.5, 1)
+
+    # A single channel pipette too small for the volume moves it in more than one loop.  A multichannel pipette is
+    # never used for one well because its other channels would go into the wells below it.
+    for mount, name in sorted(pipettes.items()):
+        minimum, maximum, channels = PIPETTE_RANGES.get(name, (1, 20, 8))
+        if channels == 1 and volume > maximum:
+            loops = math.ceil(volume / maximum - 1e-9)
+            return mount, loops, round(volume / loops, 1)
+
+    raise RunPlanError("No single channel pipette loaded can move {} uL to one well.  Pipettes: {}"
+                       .format(volume, ", ".join("{} {}".format(mount, name) for mount, name in
+                                                 sorted(pipettes.items()))))
+
+
+def _dilution_volumes(sample_vol, diluent_vol, diluted_sample_vol, well_count):
+    """
+    Scale a dilution so it makes enough diluted sample for every well plus one spare, in the way the template error
+    checking does.  A dilution too small for its wells is scaled up so the last wells are not left short.
+    :param sample_vol:
+    :param diluent_vol:
+    :param diluted_sample_vol:
+    :param well_count:
+    :return: uL of sample and of diluent.
+    """
+    needed = diluted_sample_vol * (well_count + 1)
+    on_hand = sample_vol + diluent_vol
+    factor = needed / on_hand
+    if factor <= 1 and sample_vol * factor < 10:
+        factor = 2.0
+    return round(sample_vol * factor, 1), round(diluent_vol * factor, 1)
+
+
+def compile_pcr_plan(args, sample_dictionary, slot_dict, processed, max_template_vol, tsv_sha256=""):
+    """
+    Build the plan for a ddPCR, Generic PCR or qPCR template from the results of
+    TemplateErrorChecking.sample_processing.
+    :param args: Options from the TSV file.
+    :param sample_dictionary: Sample lines from the TSV file.
+    :param slot_dict: Labware load name by slot.
+    :param processed: sample_data_dict, water_well_dict, target_well_dict and used_wells from sample_processing.
+    :param max_template_vol:
+    :param tsv_sha256:
+    :return: RunPlan
+    """
+    from Utilities import plate_layout
+
+    sample_data_dict, water_well_dict, target_well_dict, used_wells = processed
+    pipettes = {"left": args.LeftPipette, "right": args.RightPipette}
+    plate_slot = args.PCR_PlateSlot
+    reagent_slot = args.ReagentSlot
+    water = Site(reagent_slot, args.WaterResWell.upper())
+    pcr_volume = float(args.PCR_Volume)
+    mix_volume = float(args.MasterMixPerRxn)
+    steps = []
+
+    if getattr(args, "UseTemperatureModule", "") and getattr(args, "Temperature", ""):
+        steps.append(Temperature("Cool PCR plate", plate_slot, float(args.Temperature)))
+
+    # Dilutions go down the columns of the dilution labware in sample order.
+    dilution_wells = iter(plate_layout(slot_dict[args.DilutionPlateSlot])[0]) \
+        if getattr(args, "DilutionPlateSlot", "") in slot_dict else iter(())
+    sources = {}
+    for sample_key, (sample_vol, diluent_vol, diluted_sample_vol, sample_wells) in sample_data_dict.items():
+        sample_slot, sample_well, sample_name = sample_dictionary[sample_key][:3]
+        source = Site(sample_slot, sample_well)
+        if not diluted_sample_vol:
+            sources[sample_key] = (source, sample_vol)
+            continue
+
+        try:
+            destination = Site(args.DilutionPlateSlot, next(dilution_wells))
+        except StopIteration:
+            raise RunPlanError("There are more dilutions than wells in Slot {}".format(args.DilutionPlateSlot))
+        sample_vol, diluent_vol = _dilution_volumes(sample_vol, diluent_vol, diluted_sample_vol, len(sample_wells))
+        diluent_mount, diluent_loops, diluent_vol = select_pipette(pipettes, diluent_vol)
+        sample_mount, sample_loops, sample_vol = select_pipette(pipettes, sample_vol)
+        steps.append(Dilute("Dilute {}".format(sample_name), diluent_mount, sample_mount, water, source, destination,
+                            round(diluent_vol * diluent_loops, 1), round(sample_vol * sample_loops, 1)))
+        largest_mix = PIPETTE_RANGES.get(pipettes[sample_mount], (1, 20, 1))[1]
+        steps.append(Mix("Mix {} dilution".format(sample_name), sample_mount, destination,
+                         round(min((diluent_vol * diluent_loops + sample_vol * sample_loops) * 0.65, largest_mix), 1),
+                         MIX_REPETITIONS))
+        sources[sample_key] = (destination, diluted_sample_vol)
+
+    # Reaction water with one tip for each pipette it needs.
+    water_mounts = set()
+    for well, volume in water_well_dict.items():
+        if volume > 0:
+            mount, loops, volume = select_pipette(pipettes, volume)
+            steps.append(Transfer("Water", mount, water, Site(plate_slot, well), volume, loops,
+                                  mount not in water_mounts, None, False))
+            water_mounts.add(mount)
+
+    # Master mix for each target, its wells then the target's no template control.
+    control_wells = [well for well in used_wells if not any(well in wells for wells in target_well_dict.values())]
+    for i, (target, target_wells) in enumerate(target_well_dict.items()):
+        target_info = getattr(args, "Target_{}".format(target))
+        destinations = [Site(plate_slot, well) for well in target_wells]
+        if i < len(control_wells):
+            destinations.append(Site(plate_slot, control_wells[i]))
+        mount = select_pipette(pipettes, mix_volume)[0]
+        steps.append(Distribute("Target {}".format(target_info[1]), mount, Site(reagent_slot, target_info[0].upper()),
+                                destinations, mix_volume))
+
+    # Each sample, or its dilution, into its wells with one tip per sample.
+    for sample_key, (sample_vol, diluent_vol, diluted_sample_vol, sample_wells) in sample_data_dict.items():
+        source, volume = sources[sample_key]
+        mount, loops, volume = select_pipette(pipettes, volume)
+        for i, well in enumerate(sample_wells):
+            steps.append(Transfer(sample_dictionary[sample_key][2], mount, source, Site(plate_slot, well), volume,
+                                  loops, i == 0, None, True))
+
+    # The rest of the last column is filled with water so every column is balanced.
+    layout = plate_layout(slot_dict[plate_slot])[0]
+    if used_wells:
+        last_well = used_wells[-1]
+        column = last_well[1:]
+        filler = [well for well in layout[layout.index(last_well) + 1:] if well[1:] == column]
+        if filler:
+            mount, loops, volume = select_pipette(pipettes, pcr_volume)
+            for i, well in enumerate(filler):
+                steps.append(Transfer("Fill column", mount, water, Site(plate_slot, well), volume, loops, i == 0,
+                                      None, False))
+
+    labware = {slot: slot_dict[slot] for slot in sorted(slot_dict, key=int)}
+    tip_boxes = tip_box_slots(args, labware, pipettes)
+    pipette_info = {mount: {"name": pipette, "tip_racks": tip_boxes[mount],
+                            "first_tip": getattr(args, "{}PipetteFirstTip".format(mount.capitalize()), "A1").upper()}
+                    for mount, pipette in pipettes.items()}
+
+    return RunPlan(steps, labware, pipette_info, tsv_sha256, args.Template.strip())
+
+
+def tip_box_slots(args, labware, pipettes):
+    """
+    Tip box slots for each mount, the way Utilities.labware_parsing loads them.  The LeftPipetteTipBoxes and
+    RightPipetteTipBoxes options name a mount's slots, separated by commas.  Otherwise a mount takes the boxes of its
+    tip size, and a box that fits both pipettes goes to the left one.
+    :param args:
+    :param labware: Labware load name by slot.
+    :param pipettes: Pipette name by mount.
+    :return:
+    """
+    named = named_tip_boxes(args)
+    boxes = {}
+    taken = {slot for slots in named.values() for slot in slots}
+    for mount in ("left", "right"):
+        if mount in named:
+            boxes[mount] = named[mount]
+            continue
+        boxes[mount] = [slot for slot, name in labware.items()
+                        if "tiprack" in name and _fits(name, pipettes[mount]) and slot not in taken]
+        taken.update(boxes[mount])
+    return boxes
+
+
+def _fits(tip_box, pipette):
+    """
+    True when the tip box is the size for the pipette.
+    :param tip_box:
+    :param pipette:
+    :return:
+    """
+    for size, names in (("20ul", ("p20", "p10")), ("10ul", ("p10",)), ("300ul", ("p300",)), ("200ul", ("p300",)),
+                        ("1000ul", ("p1000",))):
+        if tip_box.endswith(size) and pipette.startswith(names):
+            return True
+    return False
@@ -0,0 +1,44 @@
+"""
+OT-2 protocol that runs the run plan saved when the TSV file was validated.
+
+Every sheet with a run plan made from it as it is now is simulated, dry run, copied to the robot and run with this
+protocol instead of the program's own file, so the plan that was checked is the plan that runs.  Utilities.py and
+TemplateParser.py are copied to the robot's notebook directory along with it.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import os
+import sys
+
+# opentrons_execute does not put the protocol's directory on the import path, so the notebook directory the robot
+# modules are copied to is added.
+ROBOT_DIR = "{0}var{0}lib{0}jupyter{0}notebooks".format(os.sep)
+if os.path.isdir(ROBOT_DIR) and ROBOT_DIR not in sys.path:
+    sys.path.insert(0, ROBOT_DIR)
+
+import Utilities
+
+__version__ = "1.0.0"
+
+metadata = {"protocolName": "Run Plan", "author": "Dennis Simpson <dennis@email.unc.edu>",
+            "description": "Runs the run plan made when the TSV file was validated"}
+requirements = {"robotType": "OT-2", "apiLevel": "2.15"}
+
+
+class RunPlanMissingError(Exception):
+    """
+    The TSV file has no run plan, or the plan was made from a different version of the file.
+    """
+
+    def __init__(self, msg, *args):
+        super(RunPlanMissingError, self).__init__(msg, *args)
+
+
+def run(ctx):
+    if not Utilities.run_saved_plan(ctx):
+        raise RunPlanMissingError("There is no run plan for {}.  Validate the TSV file again and transfer it to the "
+                                  "robot.".format(Utilities.procedure_file_path()))
@@ -0,0 +1,208 @@
+"""
+Structured records of the simulated steps.
+
+Every run log step becomes a record with the step number, nesting level, command type, pipette, volume and the
+labware, slot and well of the source and destination.  The records are written as JSON Lines and as a compressed NumPy
+file with one array per field.  String fields are dictionary encoded in the NumPy file; the codes are stored as
+<field>_codes and the values as <field>_values.  load_columns() decodes them again.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import json
+import math
+import os
+import re
+from contextlib import suppress
+
+import numpy as np
+
+__version__ = "1.0.0"
+
+# Run log text prefix and the command type it is recorded as.  Commands that are not listed are recorded as comments.
+COMMAND_TYPES = [
+    ("Picking up tip", "pick_up_tip"),
+    ("Aspirating", "aspirate"),
+    ("Dispensing", "dispense"),
+    ("Blowing out", "blow_out"),
+    ("Dropping tip", "drop_tip"),
+    ("Returning tip", "return_tip"),
+    ("Transferring", "transfer"),
+    ("Distributing", "distribute"),
+    ("Consolidating", "consolidate"),
+    ("Mixing", "mix"),
+    ("Touching tip", "touch_tip"),
+    ("Air gap", "air_gap"),
+    ("Moving to", "move_to"),
+    ("Delaying", "delay"),
+    ("Pausing", "pause"),
+    ("Resuming", "resume"),
+    ("Homing", "home"),
+    ]
+
+# These commands use the location in the text as the destination.  All others use it as the source.
+DESTINATION_COMMANDS = {"dispense", "blow_out", "drop_tip", "return_tip"}
+
+STRING_FIELDS = ["command", "pipette", "mount", "source_labware", "source_well", "destination_labware",
+                 "destination_well"]
+NUMBER_FIELDS = [("step", np.int32), ("level", np.int8), ("volume", np.float32), ("source_slot", np.int8),
+                 ("destination_slot", np.int8)]
+
+_location = re.compile(r"([A-P]\d{1,2}) of (.+?) on slot (\d+)")
+_volume = re.compile(r"(\d+(?:\.\d+)?) ?u[lL]")
+
+
+def command_type(text):
+    for prefix, name in COMMAND_TYPES:
+        if text.startswith(prefix):
+            return name
+    return "comment"
+
+
+def step_record(step, command):
+    """
+    Build the record for one run log entry.
+    :param step: Step number, starting at 1.
+    :param command: Run log entry from opentrons.simulate.
+    :return:
+    """
+    payload = command["payload"]
+    text = payload.get("text", "")
+    record = {"step": step, "level": command["level"], "command": command_type(text), "pipette": "", "mount": "",
+              "volume": None, "source_labware": "", "source_slot": None, "source_well": "",
+              "destination_labware": "", "destination_slot": None, "destination_well": "", "text": text}
+
+    instrument = payload.get("instrument")
+    if instrument is not None:
+        record["pipette"] = str(getattr(instrument, "name", ""))
+        record["mount"] = str(getattr(instrument, "mount", ""))
+
+    volume = payload.get("volume")
+    if isinstance(volume, (int, float)):
+        record["volume"] = float(volume)
+    else:
+        match = _volume.search(text)
+        if match:
+            record["volume"] = float(match.group(1))
+
+    locations = _location.findall(text)
+    if locations:
+        if len(locations) > 1:
+            ends = [("source", locations[0]), ("destination", locations[1])]
+        elif record["command"] in DESTINATION_COMMANDS:
+            ends = [("destination", locations[0])]
+        else:
+            ends = [("source", locations[0])]
+
+        for end, (well, labware, slot) in ends:
+            record["{}_well".format(end)] = well
+            record["{}_labware".format(end)] = labware
+            record["{}_slot".format(end)] = int(slot)
+
+    return record
+
+
+class RecordWriter:
+    """
+    Writes the JSON Lines file as the records arrive and keeps the columns for the NumPy file, which is written by
+    close().  Used as a context manager the files are closed when the block ends, or removed if it raised.
+    """
+    def __init__(self, jsonl_path, columns_path):
+        self.jsonl_path = jsonl_path
+        self.columns_path = columns_path
+        self.jsonl_file = open(jsonl_path, 'w', encoding="UTF-8", buffering=1024 * 1024)
+        self.numbers = {field: [] for field, dtype in NUMBER_FIELDS}
+        self.codes = {field: [] for field in STRING_FIELDS}
+        self.values = {field: {} for field in STRING_FIELDS}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, record):
+        self.jsonl_file.write(json.dumps(record, ensure_ascii=False))
+        self.jsonl_file.write("\n")
+
+        for field, dtype in NUMBER_FIELDS:
+            value = record[field]
+            if value is None:
+                value = math.nan if field == "volume" else -1
+            self.numbers[field].append(value)
+
+        for field in STRING_FIELDS:
+            values = self.values[field]
+            value = record[field]
+            code = values.get(value)
+            if code is None:
+                code = values[value] = len(values)
+            self.codes[field].append(code)
+
+    def close(self):
+        self.jsonl_file.close()
+
+        columns = {}
+        for field, dtype in NUMBER_FIELDS:
+            columns[field] = np.array(self.numbers[field], dtype=dtype)
+        for field in STRING_FIELDS:
+            values = self.values[field]
+            columns["{}_codes".format(field)] = np.array(self.codes[field], dtype=_code_type(len(values)))
+            columns["{}_values".format(field)] = np.array(list(values), dtype=str)
+
+        # Written through a file object so NumPy does not add .npz to the name.
+        with open(self.columns_path, 'wb') as columns_file:
+            np.savez_compressed(columns_file, **columns)
+
+    def discard(self):
+        """
+        Close the JSON Lines file and remove it, for records that stopped part way.  No NumPy file is written.
+        :return:
+        """
+        self.jsonl_file.close()
+        for path in (self.jsonl_path, self.columns_path):
+            with suppress(OSError):
+                os.remove(path)
+
+
+def _code_type(value_count):
+    if value_count <= np.iinfo(np.uint8).max:
+        return np.uint8
+    if value_count <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.uint32
+
+
+def load_columns(columns_path, decode=True):
+    """
+    Load the NumPy file.  String fields are decoded back to arrays of strings unless decode is False, in which case the
+    codes and values are returned as stored.
+    :param columns_path:
+    :param decode:
+    :return:
+    """
+    with np.load(columns_path) as data:
+        columns = {name: data[name] for name in data.files}
+
+    if decode:
+        for field in STRING_FIELDS:
+            columns[field] = columns.pop("{}_values".format(field))[columns.pop("{}_codes".format(field))]
+
+    return columns
+
+
+def read_records(jsonl_path):
+    """
+    Yield the records in a JSON Lines file.
+    :param jsonl_path:
+    :return:
+    """
+    with open(jsonl_path, encoding="UTF-8") as jsonl_file:
+        for line in jsonl_file:
+            yield json.loads(line)
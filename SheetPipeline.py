@@ -0,0 +1,363 @@
+"""
+The steps from a TSV sample sheet to a run log, without the GUI.
+
+validate_sheet runs every template check and simulate_sheet runs the dry run and the full simulation, reusing a cached
+run log when nothing has changed.  The GUI calls them from its background jobs and the command line pipeline calls them
+from its worker processes, so a sheet is checked the same way whichever one is used.  process_sheet does both for one
+sheet and returns a JSON ready summary.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import datetime
+import glob
+import importlib
+import io
+import os
+import shutil
+import time
+import traceback
+
+from SimulationWorker import SimulationError, SimulationReport, SimulationWorker
+
+__version__ = "1.0.0"
+
+PROGRAM_DIR = "C:{0}Opentrons_Programs{0}".format(os.sep)
+# Every supported program is run by the same protocol file.
+PROGRAM_FILES = {"ddPCR": "PCR.py", "Generic PCR": "PCR.py", "Illumina_Dual_Indexing": "PCR.py", "qPCR": "PCR.py"}
+# Programs that only run from a run plan.  PCR.py has no steps of its own for them.
+PLAN_ONLY_PROGRAMS = ["qPCR"]
+
+# Stages in the order they are run.
+VALIDATE = "validate"
+SIMULATE = "simulate"
+UPLOAD = "upload"
+RUN = "run"
+STAGES = [VALIDATE, SIMULATE, UPLOAD, RUN]
+
+# Outcome of a sheet.
+PASSED = "passed"
+INVALID = "invalid"
+DRY_RUN_FAILED = "dry_run_failed"
+SIMULATION_FAILED = "simulation_failed"
+UPLOAD_FAILED = "upload_failed"
+RUN_FAILED = "run_failed"
+NOT_RUN = "not_run"
+CRASHED = "error"
+
+
+def program_path(program, program_dir=PROGRAM_DIR):
+    """
+    Protocol file for a program, or None for a program that is not supported.
+    :param program:
+    :param program_dir:
+    :return:
+    """
+    if program not in PROGRAM_FILES:
+        return None
+    return os.path.join(program_dir, PROGRAM_FILES[program])
+
+
+def labware_dir(protocol_path):
+    return "{}{}custom_labware".format(os.path.dirname(protocol_path), os.sep)
+
+
+def find_sheets(patterns):
+    """
+    Expand directories and glob patterns into a sorted list of TSV files.  A directory stands for every .tsv file in
+    it.  Files named outright are kept even when they do not exist so they are reported with the rest of the batch.
+    :param patterns:
+    :return: The sheets and the patterns that matched nothing.
+    """
+    sheets = []
+    unmatched = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found = glob.glob(os.path.join(pattern, "*.tsv"))
+        elif glob.has_magic(pattern):
+            found = [path for path in glob.glob(pattern) if os.path.isfile(path)]
+        else:
+            found = [pattern]
+        if not found:
+            unmatched.append(pattern)
+        sheets.extend(os.path.abspath(path) for path in found)
+
+    return sorted(set(sheets)), unmatched
+
+
+def validate_sheet(path_to_tsv, program):
+    """
+    Run every template check in one pass so all of the problems can be reported together.  The run plan made by a
+    sheet that passes is saved next to it, where the robot program and the simulation look for it.
+    :param path_to_tsv:
+    :param program:
+    :return: The TemplateValidator and anything the checks printed.
+    """
+    from PlanOptimizer import describe_report
+    from RunPlan import run_plan_path
+    from TemplateValidator import TemplateValidator
+
+    # The checks print to their own stream.  Redirecting sys.stdout would also take the output of every other thread.
+    printed = io.StringIO()
+    validator = TemplateValidator(path_to_tsv, program, stdout=printed)
+    validator.validate()
+    if validator.plan and not validator.errors:
+        try:
+            validator.plan.save(run_plan_path(path_to_tsv))
+            print(validator.plan.summary(), file=printed)
+            print(describe_report(validator.plan_report), file=printed)
+        except OSError as error:
+            print("The run plan could not be saved: {}".format(error), file=printed)
+
+    return validator, printed.getvalue()
+
+
+def simulate_sheet(worker, cache, path_to_program, path_to_tsv, program, output_path, on_lines=None, on_steps=None,
+                   output=None, check_cancelled=None):
+    """
+    Dry run then simulate the program with the TSV file and write the numbered steps to output_path.txt, with the
+    structured records beside it.  A sheet with a run plan is run by the plan protocol, as it will be on the robot.  A
+    run log cached from an identical simulation is used instead when there is one.  Raises DryRunError when the dry
+    run finds a problem and SimulationError when the simulation fails.
+    :param worker: SimulationWorker
+    :param cache: SimulationCache
+    :param path_to_program:
+    :param path_to_tsv:
+    :param program:
+    :param output_path: Path of the report without its extension.
+    :param on_lines: Called with each group of run log lines.
+    :param on_steps: Called with the number of steps once it is known.
+    :param output: Called with messages for the user.
+    :param check_cancelled: Called between pieces of work.  Raises to stop.
+    :return: Number of steps.
+    """
+    from DryRun import DryRunError, dry_run
+    from RunPlan import PLAN_PROTOCOL, run_protocol
+    from SimulationCache import simulation_key
+
+    output = output or (lambda text: None)
+    check_cancelled = check_cancelled or (lambda: None)
+    labware_location = labware_dir(path_to_program)
+    protocol = run_protocol(path_to_program, path_to_tsv)
+    if program in PLAN_ONLY_PROGRAMS and protocol != PLAN_PROTOCOL:
+        raise SimulationError("{} sheets are run from their run plan and {} has none.  Validate the TSV file again."
+                              .format(program, os.path.basename(path_to_tsv)))
+    if protocol != path_to_program:
+        output("Running the validated run plan with {}.\n".format(os.path.basename(protocol)))
+
+    # The numbered steps are written to the simulation file as they arrive so the whole run log is never held in
+    # memory.
+    simulation_date = datetime.datetime.today().strftime("%a %b %d %H:%M %Y")
+    header = "Opentrons OT-2 Steps.\nDate:  {}\nProgram File: {}\nTSV File:  {}\n\nStep\tCommand\n"\
+        .format(simulation_date, program, path_to_tsv)
+    report = SimulationReport("{}.txt".format(output_path), header)
+
+    # Structured records of the steps for analysis.
+    records = {"jsonl": report.attach("{}.jsonl".format(output_path)),
+               "npz": report.attach("{}.npz".format(output_path))}
+    step_count = [0]
+
+    def lines_received(lines):
+        report.write_lines(lines)
+        if on_lines:
+            on_lines(lines, report.line_count, max(step_count[0], report.line_count))
+
+    def steps_received(steps):
+        step_count[0] = steps
+        if on_steps:
+            on_steps(steps)
+
+    try:
+        # Nothing that can change the outcome has changed since the last simulation so reuse its run log.
+        cache_key = simulation_key(protocol, path_to_tsv, labware_location)
+        cached = cache.get(cache_key)
+        if cached:
+            steps_received(cached.metadata.get("steps", 0))
+            for chunk in cached.iter_chunks():
+                check_cancelled()
+                lines_received(chunk)
+            for name, path in records.items():
+                if cached.attachment(name):
+                    shutil.copyfile(cached.attachment(name), path)
+            output("Simulation results loaded from cache.\n")
+
+        else:
+            # The dry run catches tip and volume mistakes in milliseconds, before the full simulation starts.
+            try:
+                output("{}\n".format(dry_run(protocol, path_to_tsv, labware_location).summary()))
+            except DryRunError:
+                raise
+            except Exception as error:
+                output("Dry run could not finish ({}: {}).  Running the full simulation.\n"
+                       .format(type(error).__name__, error))
+            check_cancelled()
+
+            cache_writer = cache.writer(cache_key)
+
+            def lines_simulated(lines):
+                cache_writer.write_lines(lines)
+                lines_received(lines)
+
+            try:
+                simulation_metadata = worker.simulate(protocol, path_to_tsv, labware_location,
+                                                      on_lines=lines_simulated, on_steps=steps_received,
+                                                      records=(records["jsonl"], records["npz"]))
+            except SimulationError:
+                cache_writer.discard()
+                check_cancelled()
+                raise
+            for name, path in records.items():
+                cache_writer.attach(name, path)
+            cache_writer.commit(simulation_metadata)
+
+    except Exception:
+        report.discard()
+        raise
+
+    report.commit()
+    return step_count[0]
+
+
+# Each worker process keeps one simulation worker and cache for all of the sheets it is given.
+_process_worker = None
+_process_cache = None
+
+
+def warm_worker():
+    """
+    Initializer for worker processes.  The checks are imported before the first sheet arrives so the import is not
+    counted in that sheet's time.
+    :return:
+    """
+    for module_name in ["TemplateValidator", "DryRun"]:
+        importlib.import_module(module_name)
+
+
+def _process_services():
+    global _process_worker, _process_cache
+    from SimulationCache import SimulationCache
+
+    if _process_worker is None:
+        _process_worker = SimulationWorker()
+        _process_cache = SimulationCache()
+    return _process_worker, _process_cache
+
+
+def process_sheet(path_to_tsv, program, path_to_program, output_dir, stage=SIMULATE):
+    """
+    Validate and, unless stage is VALIDATE, simulate one sheet.  Meant to be run in a worker process.  Nothing is
+    raised; every problem is in the result.
+    :param path_to_tsv:
+    :param program:
+    :param path_to_program:
+    :param output_dir:
+    :param stage:
+    :return: dict that can be written as JSON.
+    """
+    from DryRun import DryRunError
+    from RunPlan import run_plan_path
+
+    result = {"tsv": path_to_tsv, "program": program, "protocol": path_to_program, "status": PASSED,
+              "diagnostics": [], "steps": None, "simulation_file": None, "message": "", "seconds": {},
+              "worker": os.getpid()}
+    try:
+        start = time.perf_counter()
+        validator, printed = validate_sheet(path_to_tsv, program)
+        result["seconds"][VALIDATE] = round(time.perf_counter() - start, 4)
+        result["diagnostics"] = [diagnostic._asdict() for diagnostic in validator.diagnostics]
+        if validator.errors:
+            result["status"] = INVALID
+            result["message"] = "{} problem(s) found in the TSV file".format(len(validator.errors))
+            return result
+        if validator.plan:
+            result["run_plan"] = run_plan_path(path_to_tsv)
+
+        if stage == VALIDATE:
+            return result
+
+        if not path_to_program or not os.path.isfile(path_to_program):
+            result["status"] = SIMULATION_FAILED
+            result["message"] = "Program file {} not found".format(path_to_program)
+            return result
+
+        start = time.perf_counter()
+        sheet_name = os.path.splitext(os.path.basename(path_to_tsv))[0]
+        output_path = os.path.join(output_dir, "{}_Simulation".format(sheet_name))
+        messages = []
+        worker, cache = _process_services()
+        try:
+            result["steps"] = simulate_sheet(worker, cache, path_to_program, path_to_tsv, program, output_path,
+                                             output=messages.append)
+            result["simulation_file"] = "{}.txt".format(output_path)
+        except DryRunError as error:
+            result["status"] = DRY_RUN_FAILED
+            result["message"] = str(error)
+            if error.result:
+                messages.append(error.result.summary())
+        except SimulationError as error:
+            result["status"] = SIMULATION_FAILED
+            result["message"] = str(error).strip().splitlines()[-1] if str(error).strip() else "Simulation failed"
+        result["seconds"][SIMULATE] = round(time.perf_counter() - start, 4)
+        result["output"] = "".join(message if message.endswith("\n") else message + "\n" for message in messages)
+
+    except Exception as error:
+        # One bad sheet must not stop the others.
+        result["status"] = CRASHED
+        result["message"] = "{}: {}".format(type(error).__name__, error)
+        result["traceback"] = traceback.format_exc()
+
+    return result
+
+
+def batch_report(results, program, stage, jobs, wall_seconds):
+    """
+    One report for a whole batch: a summary, a line per sheet with how long each stage took, then every problem found
+    grouped by sheet.
+    :param results: Results from process_sheet.
+    :param program:
+    :param stage: Last stage run.
+    :param jobs: Number of worker processes.
+    :param wall_seconds: Seconds the whole batch took.
+    :return: The report as text.
+    """
+    from TemplateValidator import Diagnostic, format_diagnostic
+
+    passed = sum(1 for result in results if result["status"] == PASSED)
+    # The time the sheets would have taken one after another.  Against the wall time it shows how well the batch
+    # spread over the workers.
+    sheet_seconds = sum(sum(result["seconds"].values()) for result in results)
+    speed_up = sheet_seconds / wall_seconds if wall_seconds else 0
+    workers_used = len({result.get("worker") for result in results} - {None})
+
+    lines = ["Opentrons OT-2 Batch Validation.",
+             "Date:  {}".format(datetime.datetime.today().strftime("%a %b %d %H:%M %Y")),
+             "Program:  {}".format(program),
+             "Last Stage:  {}".format(stage),
+             "Sheets:  {}\tPassed:  {}\tFailed:  {}".format(len(results), passed, len(results) - passed),
+             "Workers:  {}\tWorker Processes Used:  {}".format(jobs, workers_used),
+             "Wall Time:  {:.2f} s\tSheet Time:  {:.2f} s\tSpeed Up:  {:.1f}x".format(wall_seconds, sheet_seconds,
+                                                                                     speed_up),
+             "",
+             "\t".join(["Sheet", "Status", "Validate s", "Simulate s", "Total s", "Steps", "Message"])]
+
+    for result in results:
+        seconds = result["seconds"]
+        lines.append("\t".join([os.path.basename(result["tsv"]), result["status"],
+                                "{:.3f}".format(seconds[VALIDATE]) if VALIDATE in seconds else "",
+                                "{:.3f}".format(seconds[SIMULATE]) if SIMULATE in seconds else "",
+                                "{:.3f}".format(sum(seconds.values())),
+                                str(result["steps"]) if result["steps"] is not None else "",
+                                result["message"].replace("\n", "  ")]))
+
+    for result in results:
+        problems = [format_diagnostic(Diagnostic(**diagnostic)) for diagnostic in result["diagnostics"]]
+        if result["status"] != PASSED and not problems:
+            problems = [result["message"]]
+        if problems:
+            lines.extend(["", result["tsv"]])
+            lines.extend("\t{}".format(problem) for problem in problems)
+
+    return "\n".join(lines) + "\n"
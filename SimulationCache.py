@@ -0,0 +1,277 @@
+"""
+On disk cache of simulation results.
+
+The key is the SHA-256 of everything that can change the outcome of a simulation: the protocol source and the modules
+it can import from its directory, the robot modules, the TSV file and the run plan saved for it, every custom
+labware definition and the installed opentrons version.  Each entry is the formatted run log, one line per
+run log line, a small JSON file with the metadata from the simulation worker and any files attached to it, such as
+the structured step records.  When the cache grows past its size
+limit the entries that were used least recently are removed.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from RunPlan import MODULE_DIR, ROBOT_MODULES, run_plan_path
+
+__version__ = "1.0.0"
+
+# Bump this any time the format of the entries changes so old entries are never used.
+CACHE_VERSION = "2"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".opentrons_gui", "simulation_cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# A temporary file this old was left by a simulation that never finished.
+STALE_TMP_SECONDS = 24 * 60 * 60
+
+
+def opentrons_version():
+    """
+    Version of the installed opentrons package.  Read from the package metadata so opentrons is not imported.
+    :return:
+    """
+    # importlib.metadata is slow to import, so it is left until a simulation needs it.
+    from importlib import metadata
+
+    try:
+        return metadata.version("opentrons")
+    except metadata.PackageNotFoundError:
+        return "not installed"
+
+
+def _hash_file(digest, path):
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+
+
+def simulation_key(protocol, tsv, labware_dir=None):
+    """
+    Content hash for a simulation.
+    :param protocol:
+    :param tsv:
+    :param labware_dir:
+    :return:
+    """
+    digest = hashlib.sha256()
+    digest.update("{}\0{}\0".format(CACHE_VERSION, opentrons_version()).encode())
+
+    for label, path in (("protocol", protocol), ("tsv", tsv)):
+        digest.update("{}\0".format(label).encode())
+        _hash_file(digest, path)
+
+    if os.path.isfile(run_plan_path(tsv)):
+        digest.update(b"run plan\0")
+        _hash_file(digest, run_plan_path(tsv))
+
+    # The protocol imports Utilities.py and the rest from its own directory, or from here when they are not there.
+    modules = [os.path.join(MODULE_DIR, module_name) for module_name in ROBOT_MODULES]
+    protocol_dir = os.path.dirname(os.path.abspath(protocol))
+    modules.extend(os.path.join(protocol_dir, file_name) for file_name in sorted(os.listdir(protocol_dir))
+                   if file_name.endswith(".py"))
+    for path in modules:
+        if os.path.isfile(path):
+            digest.update("module\0{}\0".format(os.path.basename(path)).encode())
+            _hash_file(digest, path)
+
+    if labware_dir and os.path.isdir(labware_dir):
+        for file_name in sorted(os.listdir(labware_dir)):
+            path = os.path.join(labware_dir, file_name)
+            if file_name.lower().endswith(".json") and os.path.isfile(path):
+                digest.update("labware\0{}\0".format(file_name).encode())
+                _hash_file(digest, path)
+
+    return digest.hexdigest()
+
+
+class CachedSimulation:
+    """
+    A cache hit.  The run log is read from disk when it is asked for.
+    """
+    def __init__(self, key, metadata, log_path):
+        self.key = key
+        self.metadata = metadata
+        self.log_path = log_path
+
+    def iter_chunks(self, chunk_size=500):
+        """
+        Yield the run log lines in lists of chunk_size.
+        :param chunk_size:
+        :return:
+        """
+        chunk = []
+        with open(self.log_path, encoding="UTF-8", newline="\n") as log_file:
+            for line in log_file:
+                chunk.append(line[:-1])
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def attachment(self, name):
+        """
+        Path of the file attached to the entry as name, or None.
+        :param name:
+        :return:
+        """
+        path = "{}.{}".format(os.path.splitext(self.log_path)[0], name)
+        if os.path.isfile(path):
+            return path
+        return None
+
+    def runlog(self):
+        lines = []
+        for chunk in self.iter_chunks():
+            lines.extend(chunk)
+        return lines
+
+
+class SimulationCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return "{}.log".format(base), "{}.json".format(base)
+
+    def get(self, key):
+        """
+        Return the CachedSimulation for key or None.
+        :param key:
+        :return:
+        """
+        log_path, metadata_path = self._paths(key)
+        try:
+            with open(metadata_path, encoding="UTF-8") as metadata_file:
+                entry_metadata = json.load(metadata_file)
+            # Mark the entry as recently used for eviction.
+            os.utime(metadata_path)
+            os.utime(log_path)
+        except (OSError, ValueError):
+            return None
+
+        return CachedSimulation(key, entry_metadata, log_path)
+
+    def put(self, key, lines, entry_metadata):
+        """
+        Store the run log lines and the metadata.  lines can be any iterable so a long run log does not need to be held
+        in memory.  The metadata file is written last so a partial entry is never seen as a hit.
+        :param key:
+        :param lines:
+        :param entry_metadata:
+        :return:
+        """
+        writer = self.writer(key)
+        try:
+            writer.write_lines(lines)
+        except Exception:
+            writer.discard()
+            raise
+        writer.commit(entry_metadata)
+
+    def writer(self, key, entry_metadata=None):
+        return CacheWriter(self, key, entry_metadata)
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is under max_bytes.  The temporary files of entries
+        still being written are not counted.  They are only removed once they are too old to belong to a simulation.
+        :return:
+        """
+        entries = {}
+        total = 0
+        stale_time = time.time() - STALE_TMP_SECONDS
+        with os.scandir(self.cache_dir) as files:
+            for entry in files:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if entry.name.endswith(".tmp"):
+                    if stat.st_mtime < stale_time:
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+                    continue
+                key = entry.name.split(".")[0]
+                size, mtime, paths = entries.get(key, (0, 0, []))
+                paths.append(entry.path)
+                entries[key] = (size + stat.st_size, max(mtime, stat.st_mtime), paths)
+                total += stat.st_size
+
+        for key, (size, mtime, paths) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+    def clear(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for file_name in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, file_name))
+            except OSError:
+                pass
+
+
+class CacheWriter:
+    """
+    Collects the run log lines for a new entry as they arrive.  The lines go to a temporary file so nothing is held in
+    memory.  Nothing is stored unless commit() is called.
+    """
+    def __init__(self, cache, key, entry_metadata=None):
+        self.cache = cache
+        self.key = key
+        self.metadata = entry_metadata
+        os.makedirs(cache.cache_dir, exist_ok=True)
+        self.log_path, self.metadata_path = cache._paths(key)
+        self.tmp_log = "{}.{}.tmp".format(self.log_path, os.getpid())
+        self.log_file = open(self.tmp_log, 'w', encoding="UTF-8", newline="\n")
+
+    def write_lines(self, lines):
+        for line in lines:
+            self.log_file.write(line)
+            self.log_file.write("\n")
+
+    def attach(self, name, path):
+        """
+        Copy a file in to the entry.  It is returned by CachedSimulation.attachment(name).
+        :param name:
+        :param path:
+        :return:
+        """
+        shutil.copyfile(path, "{}.{}".format(os.path.splitext(self.log_path)[0], name))
+
+    def commit(self, entry_metadata=None):
+        if entry_metadata is not None:
+            self.metadata = entry_metadata
+        self.log_file.close()
+        os.replace(self.tmp_log, self.log_path)
+
+        tmp_metadata = "{}.{}.tmp".format(self.metadata_path, os.getpid())
+        with open(tmp_metadata, 'w', encoding="UTF-8") as metadata_file:
+            json.dump(self.metadata or {}, metadata_file)
+        os.replace(tmp_metadata, self.metadata_path)
+
+        self.cache.evict()
+
+    def discard(self):
+        self.log_file.close()
+        try:
+            os.remove(self.tmp_log)
+        except OSError:
+            pass
@@ -0,0 +1,273 @@
+"""
+Long lived process that runs the Opentrons simulations for the GUI.
+
+Importing opentrons and loading the labware and pipette definitions is the slowest part of a simulation.  The worker
+does this once when it starts and then waits for simulation jobs on a pipe, so only the first simulation in a session
+pays for it.  The run log is formatted one step at a time and streamed back in chunks so the GUI can write and display
+it as it arrives.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import io
+import multiprocessing
+import os
+import time
+import traceback
+from contextlib import nullcontext, suppress
+
+__version__ = "1.0.0"
+
+# Number of run log lines sent back in each message.
+CHUNK_SIZE = 500
+
+WARMUP_PROTOCOL = '''
+requirements = {"robotType": "OT-2", "apiLevel": "2.15"}
+
+
+def run(ctx):
+    tips_20 = ctx.load_labware("opentrons_96_tiprack_20ul", "1")
+    tips_300 = ctx.load_labware("opentrons_96_tiprack_300ul", "2")
+    plate = ctx.load_labware("biorad_96_wellplate_200ul_pcr", "3")
+    left = ctx.load_instrument("p300_single_gen2", "left", tip_racks=[tips_300])
+    right = ctx.load_instrument("p20_single_gen2", "right", tip_racks=[tips_20])
+    right.transfer(5, plate["A1"], plate["B1"])
+    left.transfer(50, plate["A1"], plate["B1"])
+'''
+
+
+class SimulationError(Exception):
+    """
+    The simulation raised an error.  The message is the traceback from the worker.
+    """
+
+    def __init__(self, msg, *args):
+        super(SimulationError, self).__init__(msg, *args)
+
+
+def format_step(command):
+    """
+    Format a single run log entry the same way opentrons.simulate.format_runlog does.
+    :param command:
+    :return:
+    """
+    indent = "\t" * command["level"]
+    lines = [indent + command["payload"].get("text", "")]
+    if command["logs"]:
+        lines.append(indent + "Logs from this command:")
+        for log in command["logs"]:
+            lines.append(indent + "{} ({}): {}".format(log.levelname, log.module, log.msg % log.args))
+
+    return lines
+
+
+def _cache_custom_labware(entrypoint_util, *importers):
+    """
+    Keep the custom labware definitions in memory.  They are read again only when a file in the directory changes.
+    Modules such as opentrons.simulate import labware_from_paths by name, so their copy of the name is replaced too.
+    :param entrypoint_util:
+    :param importers: Modules that imported labware_from_paths from entrypoint_util.
+    :return:
+    """
+    labware_from_paths = entrypoint_util.labware_from_paths
+    labware_cache = {}
+
+    def cached_labware_from_paths(paths):
+        key = []
+        for path in paths:
+            with os.scandir(path) as entries:
+                key.extend(sorted((entry.path, entry.stat().st_mtime_ns) for entry in entries if entry.is_file()))
+        key = tuple(key)
+        if key not in labware_cache:
+            labware_cache.clear()
+            labware_cache[key] = labware_from_paths(paths)
+        return labware_cache[key]
+
+    for module in (entrypoint_util,) + importers:
+        if getattr(module, "labware_from_paths", None) is labware_from_paths:
+            module.labware_from_paths = cached_labware_from_paths
+
+
+def _worker_main(connection):
+    """
+    Entry point of the worker process.
+    :param connection:
+    :return:
+    """
+    from opentrons import simulate
+    from opentrons.util import entrypoint_util
+    from RunlogExport import RecordWriter, step_record
+
+    _cache_custom_labware(entrypoint_util, simulate)
+
+    # Load the common labware and pipette definitions before the first job arrives.
+    with suppress(Exception):
+        simulate.simulate(io.StringIO(WARMUP_PROTOCOL), file_name="warmup.py", propagate_logs=False)
+
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            break
+
+        if job is None:
+            break
+
+        start_time = time.perf_counter()
+        try:
+            os.environ["OT2_PROCEDURE_TSV"] = job["tsv"]
+            os.environ["OT2_RUN_PLAN"] = job["run_plan"]
+            labware_paths = [job["labware_dir"]] if job["labware_dir"] and os.path.isdir(job["labware_dir"]) else []
+            with open(job["protocol"]) as protocol_file:
+                run_log, bundle = simulate.simulate(protocol_file, file_name=os.path.basename(job["protocol"]),
+                                                    custom_labware_paths=labware_paths, propagate_logs=False)
+
+            connection.send(("steps", len(run_log)))
+            # The records are closed when they are all written and removed if anything fails part way.
+            with RecordWriter(*job["records"]) if job.get("records") else nullcontext() as record_writer:
+                chunk = []
+                for step, command in enumerate(run_log, start=1):
+                    chunk.extend(format_step(command))
+                    if record_writer:
+                        record_writer.write(step_record(step, command))
+                    if len(chunk) >= CHUNK_SIZE:
+                        connection.send(("lines", chunk))
+                        chunk = []
+                if chunk:
+                    connection.send(("lines", chunk))
+
+            metadata = {"steps": len(run_log), "bundle": bundle is not None,
+                        "seconds": round(time.perf_counter() - start_time, 3)}
+            connection.send(("done", metadata))
+
+        except Exception:
+            connection.send(("error", traceback.format_exc()))
+
+
+class SimulationReport:
+    """
+    Numbered text file of the simulation steps.  Lines are written as they arrive through a buffered writer to a
+    temporary file that replaces the report when the simulation finishes, so a failed simulation leaves the last
+    report in place.  Other files written for the same simulation can be attached and are handled the same way.
+    """
+    def __init__(self, path, header, buffer_size=1024 * 1024):
+        self.path = path
+        self.tmp_path = "{}.tmp".format(path)
+        self.attachments = []
+        self.line_count = 0
+        self.outfile = open(self.tmp_path, 'w', encoding="UTF-16", buffering=buffer_size)
+        self.outfile.write(header)
+
+    def write_lines(self, lines):
+        self.outfile.writelines(["{}\t{}\n".format(step_number, line)
+                                 for step_number, line in enumerate(lines, start=self.line_count + 1)])
+        self.line_count += len(lines)
+
+    def attach(self, path):
+        """
+        Return the temporary path to write the attached file to.
+        :param path:
+        :return:
+        """
+        tmp_path = "{}.tmp".format(path)
+        self.attachments.append((tmp_path, path))
+        return tmp_path
+
+    def commit(self):
+        self.outfile.close()
+        for tmp_path, path in [(self.tmp_path, self.path)] + self.attachments:
+            if os.path.isfile(tmp_path):
+                os.replace(tmp_path, path)
+
+    def discard(self):
+        self.outfile.close()
+        for tmp_path, path in [(self.tmp_path, self.path)] + self.attachments:
+            with suppress(OSError):
+                os.remove(tmp_path)
+
+
+class SimulationWorker:
+    """
+    Client side of the simulation worker.  The process is started on first use, or by calling start() early so it is
+    warm by the time the first simulation is requested.
+    """
+    def __init__(self):
+        self.process = None
+        self.connection = None
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        if self.is_alive():
+            return
+
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_main, args=(child_connection,), daemon=True,
+                                               name="OT2SimulationWorker")
+        self.process.start()
+        child_connection.close()
+
+    def stop(self):
+        if not self.is_alive():
+            return
+
+        try:
+            self.connection.send(None)
+            self.process.join(timeout=2)
+        except (BrokenPipeError, OSError):
+            pass
+
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+        self.connection = None
+
+    def cancel(self):
+        """
+        Stop the simulation that is running.  The process is killed, which makes simulate() raise SimulationError in
+        the thread waiting on it.  A new worker is started on the next request.
+        :return:
+        """
+        process = self.process
+        if process is not None and process.is_alive():
+            process.terminate()
+
+    def simulate(self, protocol, tsv, labware_dir=None, on_lines=None, on_steps=None, records=None):
+        """
+        Run a simulation and return the metadata for it.  The number of steps is passed to on_steps when the
+        simulation finishes and the run log lines are passed to on_lines as they arrive.
+        :param protocol:
+        :param tsv:
+        :param labware_dir:
+        :param on_lines:
+        :param on_steps:
+        :param records: Optional (JSON Lines path, NumPy path) for the structured step records.
+        :return:
+        """
+        from RunPlan import run_plan_path
+
+        self.start()
+        self.connection.send({"protocol": protocol, "tsv": tsv, "run_plan": run_plan_path(tsv),
+                              "labware_dir": labware_dir, "records": records})
+
+        while True:
+            try:
+                message_type, payload = self.connection.recv()
+            except (EOFError, OSError):
+                self.process = None
+                raise SimulationError("The simulation worker stopped unexpectedly.")
+
+            if message_type == "steps":
+                if on_steps:
+                    on_steps(payload)
+            elif message_type == "lines":
+                if on_lines:
+                    on_lines(payload)
+            elif message_type == "done":
+                return payload
+            elif message_type == "error":
+                raise SimulationError(payload)
@@ -0,0 +1,162 @@
+"""
+Check the GUI still starts quickly.
+
+Two things are measured, each in a fresh Python process.  The import of OpentronsGUI is timed with python -X importtime,
+which also shows which modules it pulled in; none of the slow modules the GUI leaves until after the window is showing
+may appear there.  Then the GUI itself is started with the start up probe set, which makes it paint its window, print
+the seconds since launch and exit.  The script exits with status 1 when either time is over its budget or a slow
+module is imported at start up, so it can be run after every change.
+
+    python StartupBenchmark.py
+    python StartupBenchmark.py --import-budget 0.4 --paint-budget 2
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+__version__ = "1.0.0"
+
+# Seconds.  The GUI is started many times a day, so both are kept tight.
+IMPORT_BUDGET = 0.75
+FIRST_PAINT_BUDGET = 2.5
+# Modules OpentronsGUI must not import before its window is showing.
+DEFERRED_MODULES = ["opentrons", "paramiko", "scp", "numpy", "packaging", "pkg_resources", "importlib.metadata"]
+GUI_MODULE = "OpentronsGUI"
+# These match OpentronsGUI.STARTUP_PROBE and STARTUP_PROBE_MARK.  They are repeated so this script does not have to
+# import the GUI it is timing.
+STARTUP_PROBE = "OT2_GUI_STARTUP_PROBE"
+STARTUP_PROBE_MARK = "first paint"
+TIMEOUT = 120
+
+ImportTime = namedtuple("ImportTime", ["module", "self_seconds", "cumulative_seconds", "depth"])
+
+
+class StartupError(Exception):
+    """
+    The GUI or its import could not be started.
+    """
+
+    def __init__(self, msg, *args):
+        super(StartupError, self).__init__(msg, *args)
+
+
+def _gui_dir():
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def import_times(module=GUI_MODULE):
+    """
+    Time every import made by importing the module in a new process.
+    :param module:
+    :return: List of ImportTime in the order python reports them, the module itself last.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import {}".format(module)], cwd=_gui_dir(),
+                             capture_output=True, text=True, timeout=TIMEOUT)
+    if process.returncode != 0:
+        raise StartupError("Importing {} failed:\n{}".format(module, process.stderr.strip().splitlines()[-1]))
+
+    times = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append(ImportTime(name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return times
+
+
+def first_paint_time(script="{}.py".format(GUI_MODULE)):
+    """
+    Seconds from launching the GUI until its window has been painted.
+    :param script:
+    :return:
+    """
+    env = dict(os.environ, **{STARTUP_PROBE: repr(time.time())})
+    process = subprocess.run([sys.executable, script], cwd=_gui_dir(), env=env, capture_output=True, text=True,
+                             timeout=TIMEOUT)
+    for line in process.stdout.splitlines():
+        if line.startswith(STARTUP_PROBE_MARK):
+            return float(line[len(STARTUP_PROBE_MARK):])
+
+    error_lines = process.stderr.strip().splitlines()
+    raise StartupError("{} did not report its first paint: {}".format(script, error_lines[-1] if error_lines else
+                                                                       "exit status {}".format(process.returncode)))
+
+
+def deferred_imports(times, deferred=DEFERRED_MODULES):
+    """
+    The slow modules that were imported, with the module that first imported each.
+    :param times:
+    :param deferred:
+    :return:
+    """
+    found = {}
+    for name in deferred:
+        positions = [position for position, entry in enumerate(times)
+                     if entry.module == name or entry.module.startswith(name + ".")]
+        if not positions:
+            continue
+        # The shallowest entry is the one imported from outside the package.  python -X importtime reports each
+        # module after everything it imported, so its parent is the next shallower entry.
+        position = min(positions, key=lambda position: times[position].depth)
+        depth = times[position].depth
+        found[name] = next((later.module for later in times[position + 1:] if later.depth < depth), "")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the start up of the Opentrons GUI")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET,
+                        help="Seconds allowed to import {}".format(GUI_MODULE))
+    parser.add_argument("--paint-budget", type=float, default=FIRST_PAINT_BUDGET,
+                        help="Seconds allowed from launch to the first paint of the window")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    parser.add_argument("--skip-paint", action="store_true",
+                        help="Only time the import, for machines without a display")
+    args = parser.parse_args()
+
+    failures = []
+    try:
+        times = import_times()
+    except StartupError as error:
+        print(error)
+        sys.exit(2)
+
+    import_seconds = times[-1].cumulative_seconds
+    print("Import of {}: {:.3f} s (budget {:.3f} s)".format(GUI_MODULE, import_seconds, args.import_budget))
+    for entry in sorted(times[:-1], key=lambda entry: entry.self_seconds, reverse=True)[:args.top]:
+        print("    {:8.1f} ms  {}".format(entry.self_seconds * 1000, entry.module))
+    if import_seconds > args.import_budget:
+        failures.append("The import took {:.3f} s".format(import_seconds))
+
+    for name, parent in deferred_imports(times).items():
+        failures.append("{} is imported at start up{}".format(name, " by {}".format(parent) if parent else ""))
+
+    if not args.skip_paint:
+        try:
+            paint_seconds = first_paint_time()
+        except StartupError as error:
+            print(error)
+            sys.exit(2)
+        print("First paint: {:.3f} s (budget {:.3f} s)".format(paint_seconds, args.paint_budget))
+        if paint_seconds > args.paint_budget:
+            failures.append("The first paint took {:.3f} s".format(paint_seconds))
+
+    for failure in failures:
+        print("FAIL: {}".format(failure))
+    if failures:
+        sys.exit(1)
+    print("Start up is within budget.")
+
+
+if __name__ == "__main__":
+    main()
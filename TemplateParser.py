@@ -0,0 +1,277 @@
+"""
+Single parser for the procedure TSV files shared by the GUI, the template error checking and the robot side code.
+
+Parsed templates are cached using the SHA-256 of the file contents and the parser version as the key so repeated
+validate/simulate cycles on an unchanged file do not tokenize and rebuild the sample and option data again.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import csv
+import hashlib
+import io
+from collections import OrderedDict, defaultdict, namedtuple
+from types import SimpleNamespace
+
+__version__ = "1.0.0"
+
+# Bump this any time the parsing rules change so old cache entries are never used.
+PARSER_VERSION = "4"
+
+HEADER_PROBLEM = "The first line must be the template name and version, such as \"#Generic PCR<tab>3.0.1\"."
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class TemplateCache:
+    """
+    Least recently used cache of parsed templates.
+    """
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+
+_template_cache = TemplateCache()
+
+
+def cache_info():
+    """
+    Hit/miss counters for the template cache.
+    :return:
+    """
+    return _template_cache.info()
+
+
+def cache_clear():
+    _template_cache.clear()
+
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_rows(data):
+    """
+    Tokenize the file contents.  The bytes are decoded the same way open() does so the results match the old parsers.
+    :param data:
+    :return:
+    """
+    return list(csv.reader(io.TextIOWrapper(io.BytesIO(data)), delimiter='\t'))
+
+
+def _parse_robot(rows):
+    """
+    Parsing rules used by the robot programs.  Sample lines are kept whole.
+    :param rows:
+    :return:
+    """
+    line_num = 0
+    options_dictionary = defaultdict(str)
+    sample_dictionary = defaultdict(list)
+    for line in rows:
+        if line_num == 0 and line:
+            options_dictionary["Version"] = line[1] if len(line) > 1 else ""
+            options_dictionary["Template"] = line[0].strip("#")
+        line_num += 1
+
+        # Skip any lines that are blank or comments.
+        if line and bool(line[0]) and "#" not in line[0]:
+            if "--" in line[0]:
+                key = line[0].strip('--')
+
+                if "Target_" in key:
+                    key_value = (line[1], line[2], line[3])
+                else:
+                    key_value = line[1]
+
+                options_dictionary[key] = key_value
+
+            else:
+                sample_key = line[0], line[1]
+                sample_dictionary[sample_key] = line
+
+    return sample_dictionary, options_dictionary
+
+
+def _parse_validator(rows):
+    """
+    Parsing rules used by the template error checking.  End of line comments are removed and the first 7 columns of
+    the sample lines are kept.  The TSV line number of every option and sample is kept for error reporting, and each
+    problem found is kept with the line it is on.
+    :param rows:
+    :return:
+    """
+    line_num = 0
+    options_dictionary = defaultdict(str)
+    sample_dictionary = defaultdict(list)
+    line_numbers = {}
+    problems = []
+    for line in rows:
+        if line_num == 0:
+            line_numbers["Version"] = line_numbers["Template"] = 1
+            if len(line) < 2 or not line[0].startswith("#"):
+                problems.append((1, HEADER_PROBLEM))
+                line_num += 1
+                continue
+            options_dictionary["Version"] = line[1]
+            options_dictionary["Template"] = line[0].strip("#")
+        line_num += 1
+        col_count = len(line)
+        tmp_line = []
+        sample_key = ""
+        if col_count > 0 and "#" not in line[0] and len(line[0].split("#")[0]) > 0:
+            # Skip any lines that are blank or comments.
+            for i in range(7):
+                try:
+                    line[i] = line[i].split("#")[0]  # Strip out end of line comments.
+                except IndexError:
+                    continue
+
+                if i == 0 and "--" in line[0]:
+                    key = line[0].strip('--')
+                    key_value = line[1] if col_count > 1 else ""
+                    if "Target_" in key or "PositiveControl_" in key:
+                        try:
+                            key_value = (line[1], line[2], line[3])
+                            if not line[2].isupper() and line[3]:
+                                problems.append(
+                                    (line_num, "Well for {} is not upper case.  Wells must be upper case."
+                                     .format(line[0])))
+                        except IndexError:
+                            pass
+
+                    options_dictionary[key] = key_value
+                    line_numbers[key] = line_num
+                elif "--" not in line[0]:
+                    try:
+                        sample_slot = int(line[0])
+                    except ValueError:
+                        problems.append((line_num, "\"{}\" is not an option or a sample slot.".format(line[0])))
+                        break
+
+                    if sample_slot < 12:
+                        sample_key = line[0], (line[1] if col_count > 1 else "")
+                        tmp_line.append(line[i])
+            if sample_key in sample_dictionary:
+                # The line would replace the sample before it.
+                problems.append((line_num, "Slot {}, Well {} is already used by the sample on line {}."
+                                 .format(sample_key[0], sample_key[1], line_numbers[sample_key])))
+            elif sample_key:
+                sample_dictionary[sample_key] = tmp_line
+                line_numbers[sample_key] = line_num
+
+    if line_num == 0:
+        problems.append((1, HEADER_PROBLEM))
+
+    return sample_dictionary, options_dictionary, problems, line_numbers
+
+
+_parsers = {"robot": _parse_robot, "validator": _parse_validator}
+
+
+def _cached_parse(input_file, flavor):
+    with open(input_file, 'rb') as template:
+        data = template.read()
+
+    key = (file_digest(data), PARSER_VERSION, flavor)
+    parsed = _template_cache.get(key)
+    if parsed is None:
+        parsed = _parsers[flavor](_read_rows(data))
+        _template_cache.put(key, parsed)
+
+    return parsed
+
+
+def _copy_samples(sample_dictionary):
+    # Callers get their own containers so nothing they do can change what is held in the cache.
+    return defaultdict(list, {key: list(value) for key, value in sample_dictionary.items()})
+
+
+def parse_sample_template(input_file):
+    """
+    Parse the TSV file and return data objects for the robot programs.
+    :param input_file:
+    :return:
+    """
+    sample_dictionary, options_dictionary = _cached_parse(input_file, "robot")
+
+    return _copy_samples(sample_dictionary), SimpleNamespace(**options_dictionary)
+
+
+def parse_template_for_checking(input_file):
+    """
+    Parse the TSV file and return the data objects used by the template error checking along with any messages.
+    :param input_file:
+    :return:
+    """
+    sample_dictionary, options_dictionary, problems, line_numbers = _cached_parse(input_file, "validator")
+    msg = "".join("{}\n".format(message) for line_num, message in problems)
+
+    return _copy_samples(sample_dictionary), SimpleNamespace(**options_dictionary), msg
+
+
+def template_line_numbers(input_file):
+    """
+    TSV line numbers for the options and samples of the file, keyed by option name or sample key.
+    :param input_file:
+    :return:
+    """
+    line_numbers = _cached_parse(input_file, "validator")[3]
+
+    return dict(line_numbers)
+
+
+def template_problems(input_file):
+    """
+    Problems found while parsing the file as (TSV line number, message) pairs.
+    :param input_file:
+    :return:
+    """
+    return list(_cached_parse(input_file, "validator")[2])
+
+
+def named_tip_boxes(args):
+    """
+    Tip box slots named for a pipette with --LeftPipetteTipBoxes or --RightPipetteTipBoxes, a comma separated list.
+    Those boxes are only used by that pipette.
+    :param args: Options from parse_sample_template or parse_template_for_checking.
+    :return: Slots by mount, "left" or "right", for the mounts that name their tip boxes.
+    """
+    named = {}
+    for mount in ("left", "right"):
+        slots = getattr(args, "{}PipetteTipBoxes".format(mount.capitalize()), "") or ""
+        if slots.strip():
+            named[mount] = [slot.strip() for slot in slots.split(",") if slot.strip()]
+
+    return named
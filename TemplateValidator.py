@@ -0,0 +1,585 @@
+"""
+Validation engine that runs every template check in a single pass and collects all of the problems found instead of
+stopping at the first one.  Each problem is reported as a Diagnostic with the TSV line and column it came from.
+
+Dennis A Simpson
+University of North Carolina at Chapel Hill
+450 West Drive
+Chapel Hill, NC 27599
+"""
+from collections import namedtuple
+
+from packaging.version import Version, InvalidVersion
+from PlanOptimizer import optimize_plan
+from RunPlan import PIPETTE_RANGES, RunPlanError, Site, compile_pcr_plan, tsv_digest
+from TemplateErrorChecking import TemplateErrorChecking
+from TemplateParser import template_line_numbers, template_problems
+from TipPlanner import TipPlanError, tip_index
+from Utilities import calculate_volumes_batch, dilution_slot_msg, plate_layout
+from VolumeLedger import template_volumes
+
+__version__ = "1.0.0"
+__author__ = "Dennis A. Simpson"
+__copyright__ = "Copyright 2025, University of North Carolina at Chapel Hill"
+__license__ = "MIT"
+__email__ = "dennis@email.unc.edu"
+__status__ = "Development"
+
+ERROR = "ERROR"
+WARNING = "WARNING"
+
+Diagnostic = namedtuple("Diagnostic", ["severity", "line", "column", "sample", "message"])
+
+# 1 based TSV columns of the sample table.
+SAMPLE_COLUMNS = {"Slot": 1, "Well": 2, "Name": 3, "Concentration": 4, "Targets": 5, "Replicates": 6, "Template": 7}
+ILLUMINA_SAMPLE_COLUMNS = {"Slot": 1, "Well": 2, "Index": 3, "Name": 4, "Concentration": 5, "Destination": 6}
+
+ILLUMINA = "Illumina_Dual_Indexing"
+ILLUMINA_VERSION = "v2.0.1"
+# Each indexing reaction gets 2 uL of each index primer.
+INDEX_PRIMER_VOL = 4
+
+SUPPORTED_PROGRAMS = ["ddPCR", "Generic PCR", "Illumina_Dual_Indexing", "qPCR"]
+# qPCR reactions are packed into a 384 well plate.
+QPCR_PLATE_WELLS = 384
+
+
+def format_diagnostic(diagnostic):
+    location = []
+    if diagnostic.line:
+        location.append("Line {}".format(diagnostic.line))
+    if diagnostic.column:
+        location.append("Column {}".format(diagnostic.column))
+    if diagnostic.sample:
+        location.append("Sample {}".format(diagnostic.sample))
+
+    if location:
+        return "{}: {}: {}".format(diagnostic.severity, ", ".join(location), diagnostic.message)
+    return "{}: {}".format(diagnostic.severity, diagnostic.message)
+
+
+class TemplateValidator:
+    def __init__(self, input_file, program, stdout=None, checker=None):
+        self.input_file = input_file
+        self.program = program
+        # Anything the checks print goes to stdout, or sys.stdout without one.
+        self.checker = checker or TemplateErrorChecking(input_file, stdout)
+        self.args = self.checker.args
+        self.sample_dictionary = self.checker.sample_dictionary
+        self.line_numbers = template_line_numbers(input_file)
+        self.diagnostics = []
+        # The run plan is made once every check has passed.  Illumina dual indexing templates do not have one yet.
+        self.plan = None
+        self.plan_report = None
+        self._processed = None
+        self._illumina_water = 0
+
+    def add(self, message, option=None, sample_key=None, column=None, severity=ERROR, line=None):
+        """
+        Record a problem.  The line number comes from the option name or sample key it belongs to, unless it is given.
+        :param message:
+        :param option:
+        :param sample_key:
+        :param column:
+        :param severity:
+        :param line:
+        :return:
+        """
+        sample = None
+        if option:
+            line = self.line_numbers.get(option)
+            if line and column is None:
+                column = 2
+        elif sample_key:
+            line = self.line_numbers.get(sample_key)
+            sample = "{} {}".format(sample_key[0], sample_key[1])
+
+        self.diagnostics.append(Diagnostic(severity, line, column, sample, message.strip().replace("\n", "  ")))
+
+    def option(self, name):
+        return getattr(self.args, name, "")
+
+    @property
+    def illumina(self):
+        return self.option("Template").strip() == ILLUMINA
+
+    @property
+    def errors(self):
+        return [d for d in self.diagnostics if d.severity == ERROR]
+
+    def report(self):
+        diagnostics = sorted(self.diagnostics, key=lambda d: d.line or 0)
+        return "\n".join(format_diagnostic(d) for d in diagnostics)
+
+    def validate(self):
+        """
+        Run every check and return the list of diagnostics.
+        :return:
+        """
+        self.diagnostics = []
+        self.plan = None
+        self.plan_report = None
+
+        if self.program not in SUPPORTED_PROGRAMS:
+            self.add("Program {} is not yet implemented.\nConsult the code admin.".format(self.program))
+            return self.diagnostics
+
+        for line, message in template_problems(self.input_file):
+            self.add(message, line=line)
+
+        self.parameter_checks()
+        self.version_check()
+        self.slot_checks()
+        self.target_checks()
+        sample_errors = self.sample_checks()
+
+        # The plate level totals are only meaningful once every sample line is good.
+        if not self.errors and not sample_errors:
+            self.volume_checks()
+
+        if not self.errors and self._processed and not self.illumina:
+            self.run_plan_checks()
+
+        return self.diagnostics
+
+    def parameter_checks(self):
+        required = ["PCR_Volume", "WaterResVol", "WaterResWell", "ReagentSlot", "PCR_PlateSlot", "BottomOffset",
+                    "LeftPipetteFirstTip", "RightPipetteFirstTip", "User"]
+        numbers = ["PCR_Volume", "MasterMixPerRxn", "WaterResVol"]
+        if self.illumina:
+            required += ["TotalReagentVolume", "DNA_in_Reaction", "PCR_ReagentWell", "IndexPrimerSlot"]
+            numbers += ["TotalReagentVolume", "DNA_in_Reaction"]
+
+        for name in required:
+            if not self.option(name):
+                self.add("--{} is not defined.".format(name), option=name)
+
+        for name in ["WaterResWell", "LeftPipetteFirstTip", "RightPipetteFirstTip"]:
+            if self.option(name) and not self.option(name).isupper():
+                self.add("--{} is not uppercase.".format(name), option=name)
+
+        for name in ["LeftPipetteFirstTip", "RightPipetteFirstTip"]:
+            mount = name[:-len("PipetteFirstTip")]
+            try:
+                tip_index(self.option(name) or "A1")
+            except TipPlanError:
+                self.add("Starting tip definition {} for {} Pipette is not valid".format(self.option(name), mount),
+                         option=name)
+                continue
+
+            # A multichannel pipette picks up a whole column.  Starting part way down one would leave channels empty.
+            pipette = self.option("{}Pipette".format(mount))
+            if PIPETTE_RANGES.get(pipette, (0, 0, 1))[2] > 1 and self.option(name).strip().upper()[:1] not in ("", "A"):
+                self.add("Starting tip {} for the {} Pipette is not in row A.  The {} picks up a column of tips at a "
+                         "time.".format(self.option(name), mount, pipette), option=name)
+
+        for name in numbers:
+            try:
+                float(self.option(name))
+            except ValueError:
+                self.add("--{} value \"{}\" is not a number.".format(name, self.option(name)), option=name)
+
+        if self.option("UseTemperatureModule"):
+            try:
+                if not 5 <= float(self.option("Temperature")) <= 99:
+                    self.add("--Temperature must be between 5 and 99.", option="Temperature")
+            except ValueError:
+                self.add("--Temperature is not defined.", option="UseTemperatureModule")
+        elif self.option("Temperature"):
+            self.add("--UseTemperatureModule is not defined but a --Temperature is provided.", option="Temperature")
+
+    def version_check(self):
+        template = self.option("Template")
+        if "ddPCR" in template or "Generic PCR" in template or "qPCR" in template:
+            try:
+                too_old = Version(self.option("Version")) < Version("3.0.1")
+            except InvalidVersion:
+                too_old = True
+
+            if too_old:
+                self.add("{} Parameter Template Version is {}.  Template Version Must Be >= 3.0.1"
+                         .format(self.program, self.option("Version")), option="Version", column=2)
+
+        elif self.illumina and self.option("Version") != ILLUMINA_VERSION:
+            self.add("{} template must be {}, you are using {}".format(self.program, ILLUMINA_VERSION,
+                                                                       self.option("Version")),
+                     option="Version", column=2)
+
+    def slot_checks(self):
+        slot_dict = {}
+        for i in range(11):
+            name = "Slot{}".format(i + 1)
+            labware = self.option(name)
+            if not labware:
+                continue
+
+            if labware not in self.checker.labware_slot_definitions:
+                self.add("Slot {}, labware definition \"{}\" is not valid.  Check spelling.".format(i + 1, labware),
+                         option=name)
+                continue
+
+            if str(i + 1) == self.option("ReagentSlot") and labware in self.checker.tip_boxes:
+                self.add("--ReagentSlot contains a tip box.", option=name)
+            elif str(i + 1) == self.option("PCR_PlateSlot") and labware in self.checker.tip_boxes:
+                self.add("--PCR_PlateSlot contains a tip box.", option=name)
+            else:
+                slot_dict[str(i + 1)] = labware
+
+        self.checker.slot_dict = slot_dict
+        self.checker.tip_box_error_check()
+
+        slot_names = ["PCR_PlateSlot", "ReagentSlot"]
+        if self.illumina:
+            slot_names.append("IndexPrimerSlot")
+        for name in slot_names:
+            if self.option(name) and self.option(name) not in slot_dict:
+                self.add("--{} {} has no labware defined".format(name, self.option(name)), option=name)
+
+        if self.illumina:
+            self.illumina_slot_checks(slot_dict)
+
+        plate_slot = self.option("PCR_PlateSlot")
+        if "qPCR" in (self.program, self.option("Template").strip()) and plate_slot in slot_dict \
+                and len(plate_layout(slot_dict[plate_slot])[0]) != QPCR_PLATE_WELLS:
+            self.add("qPCR reactions go in a {} well plate but Slot {} holds {}."
+                     .format(QPCR_PLATE_WELLS, plate_slot, slot_dict[plate_slot]), option="PCR_PlateSlot")
+
+    def illumina_slot_checks(self, slot_dict):
+        """
+        The index primers can not be in a tip box and the water well has to be in the reagent labware.
+        :param slot_dict:
+        :return:
+        """
+        index_slot = self.option("IndexPrimerSlot")
+        if index_slot in slot_dict:
+            msg = self.checker.slot_usage_error_check(slot_dict[index_slot], type_check="Index Primers")
+            if msg:
+                self.add(msg, option="IndexPrimerSlot")
+
+        reagent_labware = slot_dict.get(self.option("ReagentSlot"))
+        if reagent_labware and self.option("WaterResWell") and \
+                self.option("WaterResWell").upper() not in self.checker.well_label_dict.get(reagent_labware, []):
+            self.add("The water well definition is not possible for {}".format(reagent_labware),
+                     option="WaterResWell")
+
+    def target_checks(self):
+        if self.illumina:
+            return
+
+        no_target_count = 0
+        for i in range(10):
+            name = "Target_{}".format(i + 1)
+            target = self.option(name)
+            if not target or all('' == s or s.isspace() for s in target):
+                no_target_count += 1
+                continue
+
+            if not target[0]:
+                self.add("{} Well definition is missing".format(name), option=name, column=2)
+            elif target[0] == self.option("WaterResWell").upper():
+                self.add("{} Target Well definition is the same as the --WaterResWell".format(name), option=name,
+                         column=2)
+            if not target[1]:
+                self.add("{} Target Name definition is missing".format(name), option=name, column=3)
+            if not target[2]:
+                self.add("{} Target Volume definition is missing".format(name), option=name, column=4)
+
+        if no_target_count == 10:
+            self.add("No targets defined")
+
+    def sample_checks(self):
+        """
+        Check every sample line.  Returns the number of samples with errors.
+        :return:
+        """
+        if len(self.sample_dictionary) == 0:
+            self.add("No samples defined in parameter template or sample slot is missing.")
+            return 1
+
+        # Illumina dual indexing sample lines have their own columns.
+        if self.illumina:
+            return self.illumina_sample_checks()
+
+        slot_dict = self.checker.slot_dict
+        template_in_rxn = self.option("DNA_in_Reaction")
+        try:
+            self.checker.max_template_vol = \
+                round(float(self.option("PCR_Volume")) - float(self.option("MasterMixPerRxn")), ndigits=1)
+        except ValueError:
+            # Already reported by the parameter checks.
+            return len(self.sample_dictionary)
+
+        bad_samples = 0
+        solvable = []
+        wells_required = 0
+        target_names = set()
+        for sample_key in self.sample_dictionary:
+            sample = self.sample_dictionary[sample_key]
+            sample_slot, sample_well, sample_name = sample[0], sample[1], sample[2]
+            error_count = len(self.diagnostics)
+
+            def sample_error(message, column):
+                self.add(message, sample_key=sample_key, column=SAMPLE_COLUMNS[column])
+
+            if not sample_name:
+                sample_error("No Sample Name defined for sample in Slot {}, Well {}"
+                             .format(sample_slot, sample_well), "Name")
+            if not sample_well:
+                sample_error("Sample Well not defined for sample {}".format(sample_name), "Well")
+            elif not sample_well.isupper():
+                sample_error("Well {} for sample {} is not upper case.  Sample wells must be upper case."
+                             .format(sample_well, sample_name), "Well")
+
+            if sample_slot not in slot_dict:
+                sample_error("Slot {} for sample {} has no labware defined".format(sample_slot, sample_name), "Slot")
+            else:
+                msg = self.checker.slot_usage_error_check(slot_dict[sample_slot], type_check=sample_name)
+                if msg:
+                    sample_error(msg, "Slot")
+
+            targets = sample[4].split(",") if len(sample) > 4 else [""]
+            if all('' == s or s.isspace() for s in targets):
+                sample_error("Targets not defined for sample {}".format(sample_name), "Targets")
+            target_names.update(targets)
+
+            replicates = 1
+            try:
+                replicates = int(sample[5])
+            except (ValueError, IndexError):
+                sample_error("Replica count not defined for sample {}".format(sample_name), "Replicates")
+
+            sample_concentration = None
+            try:
+                sample_concentration = float(sample[3])
+                if sample_concentration <= 0:
+                    sample_error("Concentration must be greater than 0 for sample {}".format(sample_name),
+                                 "Concentration")
+            except (ValueError, IndexError):
+                sample_error("Concentration not defined for sample {}".format(sample_name), "Concentration")
+
+            # Generic PCR allows different amounts of template for each sample.
+            template = None
+            try:
+                template = float(template_in_rxn) if template_in_rxn else float(sample[6])
+            except (ValueError, IndexError):
+                sample_error("Amount of template in reaction not defined for sample {}".format(sample_name),
+                             "Template")
+
+            if len(self.diagnostics) == error_count:
+                msg = self.checker.sample_concentration_check(template, sample_concentration, sample_name)
+                if msg:
+                    sample_error(msg, "Concentration")
+                else:
+                    solvable.append((sample_key, sample_name, sample_concentration, template))
+
+            wells_required += len(targets) * replicates
+            if len(self.diagnostics) != error_count:
+                bad_samples += 1
+
+        # Dilutions for every sample that made it this far are solved together.
+        if solvable:
+            volumes = calculate_volumes_batch(self.checker.max_template_vol, [s[2] for s in solvable],
+                                              [s[3] for s in solvable])
+            dilution_msg = dilution_slot_msg(self.args, slot_dict)
+            for i, (sample_key, sample_name, sample_concentration, template) in enumerate(solvable):
+                if volumes.too_concentrated[i]:
+                    msg = "{} is too concentrated for Douglass to dilute.".format(sample_name)
+                elif volumes.diluted_sample_vol[i] and dilution_msg:
+                    msg = dilution_msg
+                else:
+                    continue
+
+                self.add(msg, sample_key=sample_key, column=SAMPLE_COLUMNS["Concentration"])
+                bad_samples += 1
+
+        # No template control wells
+        wells_required += len(target_names)
+        return bad_samples + self.plate_capacity_check(wells_required)
+
+    def illumina_sample_checks(self):
+        """
+        Check every Illumina dual indexing sample line.  The columns are slot, source well, index, name, concentration
+        and destination well.  Returns the number of samples with errors.
+        :return:
+        """
+        slot_dict = self.checker.slot_dict
+        try:
+            self.checker.max_template_vol = \
+                round(float(self.option("PCR_Volume")) - float(self.option("MasterMixPerRxn")), ndigits=1)
+            template = float(self.option("DNA_in_Reaction"))
+            half_reaction = float(self.option("PCR_Volume")) * 0.5
+        except ValueError:
+            # Already reported by the parameter checks.
+            return len(self.sample_dictionary)
+
+        bad_samples = 0
+        index_dict = {}
+        water_required = 0
+        for sample_key in self.sample_dictionary:
+            sample = self.sample_dictionary[sample_key]
+            sample_slot, source_well, index, sample_name, concentration, dest_well = \
+                (sample + [""] * len(ILLUMINA_SAMPLE_COLUMNS))[:len(ILLUMINA_SAMPLE_COLUMNS)]
+            error_count = len(self.diagnostics)
+
+            def sample_error(message, column):
+                self.add(message, sample_key=sample_key, column=ILLUMINA_SAMPLE_COLUMNS[column])
+
+            if not sample_name:
+                sample_error("Sample Name is not defined for sample in Slot {}, Well {}"
+                             .format(sample_slot, source_well), "Name")
+            if not source_well:
+                sample_error("Sample Source Well is not defined for sample {}".format(sample_name), "Well")
+            elif not source_well.isupper():
+                sample_error("Well {} for sample {} is not upper case.  Sample wells must be upper case."
+                             .format(source_well, sample_name), "Well")
+            if not dest_well:
+                sample_error("Destination Well is not defined for sample {}".format(sample_name), "Destination")
+
+            if not index:
+                sample_error("Sample Index is not defined for sample {}".format(sample_name), "Index")
+            elif index in index_dict:
+                sample_error("Sample index {} used for samples {} and {}".format(index, index_dict[index], sample_name),
+                             "Index")
+            else:
+                index_dict[index] = sample_name
+
+            if sample_slot not in slot_dict:
+                sample_error("Slot {} for sample {} has no labware defined".format(sample_slot, sample_name), "Slot")
+            else:
+                msg = self.checker.slot_usage_error_check(slot_dict[sample_slot], type_check=sample_name)
+                if msg:
+                    sample_error(msg, "Slot")
+
+            sample_concentration = None
+            try:
+                sample_concentration = float(concentration)
+                if sample_concentration <= 0:
+                    sample_error("Concentration must be greater than 0 for sample {}".format(sample_name),
+                                 "Concentration")
+            except ValueError:
+                sample_error("Concentration not defined for sample {}".format(sample_name), "Concentration")
+
+            if len(self.diagnostics) == error_count:
+                msg = self.checker.sample_concentration_check(template, sample_concentration, sample_name)
+                sample_vol = round(template / sample_concentration, ndigits=1)
+                if msg:
+                    sample_error(msg, "Concentration")
+                elif sample_vol <= 2.0 and not self.option("DilutionPlateSlot"):
+                    sample_error("Sample {} requires dilution but no --DilutionPlateSlot given.".format(sample_name),
+                                 "Concentration")
+                else:
+                    water_required += half_reaction - sample_vol - INDEX_PRIMER_VOL
+
+            if len(self.diagnostics) != error_count:
+                bad_samples += 1
+
+        self._illumina_water = round(water_required, ndigits=1)
+        return bad_samples + self.plate_capacity_check(len(self.sample_dictionary))
+
+    def plate_capacity_check(self, wells_required):
+        """
+        The reactions have to fit on the PCR plate.  Returns 1 when they do not.
+        :param wells_required:
+        :return:
+        """
+        slot_dict = self.checker.slot_dict
+        plate_slot = self.option("PCR_PlateSlot")
+        if plate_slot in slot_dict:
+            available_wells = len(plate_layout(slot_dict[plate_slot])[0])
+            if wells_required > available_wells:
+                self.add("Samples need {} wells but the PCR plate in Slot {} only has {}."
+                         .format(wells_required, plate_slot, available_wells), option="PCR_PlateSlot")
+                return 1
+        return 0
+
+    def volume_checks(self):
+        """
+        Reagent and water totals for the whole plate.  Tips are checked against the run plan.
+        :return:
+        """
+        checker = self.checker
+        msg = checker.slot_usage_error_check(checker.slot_dict[self.option("ReagentSlot")], type_check="Reagent")
+        if msg:
+            self.add(msg, option="ReagentSlot")
+
+        if self.illumina:
+            self.illumina_volume_checks()
+            return
+
+        self._processed = checker.sample_processing()
+        sample_data_dict, water_well_dict, target_well_dict, used_wells = self._processed
+
+        water_aspirated = sum(water_well_dict.values())
+        target_well_count = 0
+        reagent_aspirated = float(self.option("MasterMixPerRxn"))
+
+        for target in target_well_dict:
+            option = "Target_{}".format(target)
+            target_info = self.option(option)
+            if not target_info:
+                self.add("Target {} is used by samples but is not defined".format(target))
+                continue
+            reagent_well_vol = float(target_info[2])
+            reagent_name = "Target {}".format(target_info[1])
+
+            target_well_list = target_well_dict[target]
+            reagent_used = reagent_aspirated * 1.20 + reagent_aspirated * len(target_well_list)
+            target_well_count += len(target_well_list)
+
+            if reagent_used >= reagent_well_vol:
+                self.add("Program requires minimum of {} uL of {}.  You have {} uL."
+                         .format(reagent_used, reagent_name, reagent_well_vol), option=option, column=4)
+
+        water_aspirated = checker.dispense_samples(sample_data_dict, water_aspirated)
+
+        if target_well_count == 0:
+            self.add("Number of wells containing targets is 0.  Check TSV file for errors in sample table.")
+            return
+
+        water_aspirated = checker.empty_well_vol(plate_layout(checker.slot_dict[self.option("PCR_PlateSlot")]),
+                                                 len(used_wells), water_aspirated)
+
+        if float(self.option("WaterResVol")) <= water_aspirated:
+            self.add("Program requires minimum of {} uL water.  You have {} uL."
+                     .format(round(water_aspirated, 0), self.option("WaterResVol")), option="WaterResVol")
+
+    def illumina_volume_checks(self):
+        """
+        Water and PCR mix totals for an Illumina dual indexing plate.  Each reaction takes half its volume in PCR mix.
+        :return:
+        """
+        if float(self.option("WaterResVol")) < self._illumina_water:
+            self.add("Program requires minimum of {} uL water.  You have {} uL."
+                     .format(self._illumina_water, self.option("WaterResVol")), option="WaterResVol")
+
+        pcr_mix_required = float(self.option("PCR_Volume")) * 0.5 * len(self.sample_dictionary)
+        if pcr_mix_required > float(self.option("TotalReagentVolume")):
+            self.add("Program requires {} uL of PCR mix.  You have {} uL"
+                     .format(pcr_mix_required, self.option("TotalReagentVolume")), option="TotalReagentVolume")
+
+    def run_plan_checks(self):
+        """
+        Make and optimize the run plan, then check the tips and liquids it uses.  These are the exact steps the robot
+        will run.
+        :return:
+        """
+        try:
+            plan = compile_pcr_plan(self.args, self.sample_dictionary, self.checker.slot_dict, self._processed,
+                                    self.checker.max_template_vol, tsv_digest(self.input_file))
+            self.plan, self.plan_report = optimize_plan(plan)
+        except RunPlanError as error:
+            self.add(str(error))
+            return
+
+        for mount, tips in sorted(self.plan.tips_required().items()):
+            msg = self.checker.available_tips({mount: tips}, {mount: self.plan.channels(mount)})
+            if msg:
+                self.add(msg, option="{}PipetteFirstTip".format(mount.capitalize()))
+
+        available = {Site(slot, well): volume for slot, well, volume in template_volumes(self.args)}
+        added = self.plan.liquid_added()
+        for site, drawn in sorted(self.plan.liquid_required().items()):
+            on_hand = available.get(site, added.get(site))
+            if on_hand is not None and drawn > on_hand + 1e-6:
+                self.add("The run takes {} uL from Slot {} Well {} but it only holds {} uL."
+                         .format(round(drawn, 1), site.slot, site.well, round(on_hand, 1)))
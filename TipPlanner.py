@@ -0,0 +1,105 @@
+"""
+Exact tip plan for each pipette.
+
+Tips are used in the order the robot uses them: down each column of the first tip box starting at the first tip given
+in the TSV file, then on through each following box from A1.  The number of pick-ups the boxes can supply is worked
+out directly from the first tip, so it does not search the tip box layout.  The pick-ups themselves are counted by the
+run plan, or by the dry run, which runs the program and records every tip it picks up.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+from collections import namedtuple
+
+__version__ = "1.0.0"
+
+TIP_BOX_ROWS = 8
+TIP_BOX_COLUMNS = 12
+TIPS_PER_BOX = TIP_BOX_ROWS * TIP_BOX_COLUMNS
+
+# number is the 1 based pick-up count for the pipette.  slot and well are None when there is no tip left for it.
+TipPickup = namedtuple("TipPickup", ["number", "mount", "slot", "well"])
+
+
+class TipPlanError(Exception):
+    """
+    The first tip is not a well in a tip box.
+    """
+
+    def __init__(self, msg, *args):
+        super(TipPlanError, self).__init__(msg, *args)
+
+
+def tip_index(well_name):
+    """
+    Position of the tip in the order the robot uses them.  A1 is 0, B1 is 1 and H12 is 95.
+    :param well_name:
+    :return:
+    """
+    well_name = well_name.strip().upper()
+    try:
+        row = ord(well_name[0]) - ord("A")
+        column = int(well_name[1:]) - 1
+    except (IndexError, ValueError):
+        raise TipPlanError("{} is not a tip box well.".format(well_name))
+
+    if not 0 <= row < TIP_BOX_ROWS or not 0 <= column < TIP_BOX_COLUMNS:
+        raise TipPlanError("{} is not a tip box well.".format(well_name))
+
+    return column * TIP_BOX_ROWS + row
+
+
+class TipPlan:
+    """
+    Tips available to one pipette.  Multichannel pipettes pick up a whole column at a time.
+    """
+    def __init__(self, mount, tip_box_slots, first_tip="A1", channels=1):
+        self.mount = mount
+        self.tip_box_slots = list(tip_box_slots)
+        self.channels = channels
+        self.first_index = tip_index(first_tip or "A1")
+        if channels > 1:
+            # A partly used column cannot be picked up by a multichannel pipette.
+            self.first_index = -(-self.first_index // TIP_BOX_ROWS) * TIP_BOX_ROWS
+
+    @property
+    def tips_per_pickup(self):
+        return TIP_BOX_ROWS if self.channels > 1 else 1
+
+    @property
+    def capacity(self):
+        """
+        Number of pick-ups the tip boxes can supply.
+        :return:
+        """
+        tips = max(0, len(self.tip_box_slots) * TIPS_PER_BOX - self.first_index)
+        return tips // self.tips_per_pickup
+
+
+def describe_pickups(pickups):
+    """
+    One line per tip box with the first and last well used from it.
+    :param pickups:
+    :return:
+    """
+    lines = []
+    box_runs = []
+    missing = 0
+    for pickup in pickups:
+        if pickup.slot is None:
+            missing += 1
+        elif box_runs and box_runs[-1][0] == pickup.slot:
+            box_runs[-1][2] = pickup
+        else:
+            box_runs.append([pickup.slot, pickup, pickup])
+
+    for slot, first, last in box_runs:
+        lines.append("Slot {}: {} to {}, pick-ups {} to {}".format(slot, first.well, last.well, first.number,
+                                                                   last.number))
+    if missing:
+        lines.append("{} pick-up(s) with no tip left".format(missing))
+
+    return lines
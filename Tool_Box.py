@@ -37,8 +37,6 @@ from datetime import datetime
 from contextlib import suppress
 import re
 # import magic
-import pkg_resources as resource
-# import resource
 
 __author__ = 'Dennis A. Simpson'
 __version__ = "0.3.0"
@@ -122,9 +120,14 @@ def chromosomes(species, log, include_chrY):
 
 def peak_memory():
     """
-    This will return the peak memory used in Mb for the segment called.
+    This will return the peak memory used in Mb for the segment called.  resource is not available on Windows, where 0
+    is returned.
     :return:
     """
+    try:
+        import resource
+    except ImportError:
+        return 0
 
     peak_memory_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
 
@@ -0,0 +1,109 @@
+"""
+Compare the gantry travel of run plans before and after they are optimized.
+
+Synthetic 96 and 384 well plans are made the way validation makes a PCR plan: water into every well from one tip,
+master mix distributed to the wells of each target, then every sample with its own tip.  The reactions are given their
+wells in a shuffled order, as they are when the sample sheet lists samples in a different order from the plate, or in
+column order with --column-order.  Each plan is reported as compiled, after the optimizer without its travel passes
+and after the full optimizer, with the distance the gantry moves, the time those moves take, the estimated run time
+and how long the optimizer took.
+
+    python TravelBenchmark.py
+    python TravelBenchmark.py --wells 384 --seed 7
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import argparse
+import random
+import time
+
+from GantryTravel import DeckGeometry, plan_travel
+from PlanOptimizer import optimize_plan, plan_cost
+from RunPlan import Distribute, RunPlan, Site, Transfer
+
+__version__ = "1.0.0"
+
+PLATES = {96: "biorad_hardshell_96_wellplate_150ul", 384: "appliedbiosystemsmicroamp_384_wellplate_40ul"}
+PLATE_GRID = {96: (8, 12), 384: (16, 24)}
+TIP_RACK = "opentrons_96_tiprack_20ul"
+TIP_RACK_SLOTS = ["1", "4", "7", "10", "11"]
+REAGENT_RACK = "opentrons_24_tube_rack_vwr_microfuge_tube_1.5ml"
+SAMPLE_PLATE = "biorad_hardshell_96_wellplate_150ul"
+TARGETS = 2
+MASTER_MIX_VOLUME = 10
+
+
+def plate_wells(wells):
+    rows, columns = PLATE_GRID[wells]
+    return ["{}{}".format(chr(ord("A") + row), column + 1) for column in range(columns) for row in range(rows)]
+
+
+def synthetic_plan(wells, seed=1, column_order=False):
+    """
+    A PCR run plan that fills every well of a plate.
+    :param wells: 96 or 384.
+    :param seed:
+    :param column_order: Give the reactions their wells down the columns instead of in a shuffled order.
+    :return:
+    """
+    generator = random.Random(seed)
+    well_names = plate_wells(wells)
+    if not column_order:
+        generator.shuffle(well_names)
+
+    # Reactions are (sample, target, well).  Each sample has one reaction for each target.
+    reactions = [(position // TARGETS, position % TARGETS, name) for position, name in enumerate(well_names)]
+    sample_wells = plate_wells(96)
+    labware = {"2": PLATES[wells], "3": REAGENT_RACK, "5": SAMPLE_PLATE, "6": SAMPLE_PLATE}
+    labware.update({slot: TIP_RACK for slot in TIP_RACK_SLOTS})
+    pipettes = {"right": {"name": "p20_single_gen2", "tip_racks": TIP_RACK_SLOTS, "first_tip": "A1"}}
+
+    steps = []
+    for position, (sample, target, name) in enumerate(reactions):
+        steps.append(Transfer("Water", "right", Site("3", "A1"), Site("2", name), generator.choice([2, 4, 5, 8]), 1,
+                              position == 0, None, False))
+    for target in range(TARGETS):
+        steps.append(Distribute("Target {}".format(target + 1), "right", Site("3", "B{}".format(target + 1)),
+                                [Site("2", name) for sample, reaction_target, name in reactions
+                                 if reaction_target == target], MASTER_MIX_VOLUME))
+    for sample, target, name in reactions:
+        # Samples past the first plate are on the plate in slot 6.
+        slot = "5" if sample < 96 else "6"
+        steps.append(Transfer("Sample {}".format(sample + 1), "right", Site(slot, sample_wells[sample % 96]),
+                              Site("2", name), 2, 1, True, None, True))
+
+    return RunPlan(steps, labware, pipettes, "", "Synthetic {} well PCR".format(wells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the gantry travel of run plans before and after they are "
+                                                 "optimized")
+    parser.add_argument("--wells", type=int, nargs="+", choices=sorted(PLATES), default=sorted(PLATES))
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the shuffled well order")
+    parser.add_argument("--column-order", action="store_true", help="Give the reactions their wells in column order")
+    args = parser.parse_args()
+
+    print("Plan\tSteps\tTips\tTravel m\tTravel min\tRun min\tOptimizer ms")
+    for wells in args.wells:
+        plan = synthetic_plan(wells, args.seed, args.column_order)
+        geometry = DeckGeometry(plan.labware, plan.pipettes)
+        rows = [("{} wells, compiled".format(wells), plan, None)]
+        for label, shorten_travel in (("optimized without travel", False), ("optimized", True)):
+            start = time.perf_counter()
+            optimized, report = optimize_plan(plan, shorten_travel=shorten_travel)
+            rows.append(("{} wells, {}".format(wells, label), optimized, time.perf_counter() - start))
+
+        for label, row_plan, seconds in rows:
+            cost = plan_cost(row_plan, geometry)
+            travel = plan_travel(row_plan, geometry)
+            print("{}\t{}\t{}\t{:.1f}\t{:.1f}\t{:.1f}\t{}".format(
+                label, cost.steps, cost.tips, travel.millimetres / 1000, travel.seconds / 60, cost.seconds / 60,
+                "" if seconds is None else round(seconds * 1000)))
+
+
+if __name__ == "__main__":
+    main()
@@ -47,13 +47,18 @@ class Ui_MainWindow(object):
         self.closeGUI_btn.setObjectName(u"closeGUI_btn")
         self.closeGUI_btn.setGeometry(QRect(310, 700, 351, 81))
         self.closeGUI_btn.setAutoDefault(True)
+        self.queue_plate_btn = QPushButton(self.centralwidget)
+        self.queue_plate_btn.setObjectName(u"queue_plate_btn")
+        self.queue_plate_btn.setEnabled(False)
+        self.queue_plate_btn.setGeometry(QRect(750, 250, 251, 51))
+        self.queue_plate_btn.setAutoDefault(True)
         self.simulate_run_btn = QPushButton(self.centralwidget)
         self.simulate_run_btn.setObjectName(u"simulate_run_btn")
         self.simulate_run_btn.setGeometry(QRect(281, 250, 451, 51))
         self.simulate_run_btn.setAutoDefault(True)
         self.run_simulation_output = QTextBrowser(self.centralwidget)
         self.run_simulation_output.setObjectName(u"run_simulation_output")
-        self.run_simulation_output.setGeometry(QRect(31, 420, 971, 251))
+        self.run_simulation_output.setGeometry(QRect(31, 420, 971, 171))
         font2 = QFont()
         font2.setFamily(u"Arial")
         font2.setPointSize(10)
@@ -77,6 +82,36 @@ class Ui_MainWindow(object):
         self.cancel_run_btn.setContextMenuPolicy(Qt.NoContextMenu)
         self.cancel_run_btn.setAutoFillBackground(True)
         self.cancel_run_btn.setAutoDefault(True)
+        self.job_progress_bar = QProgressBar(self.centralwidget)
+        self.job_progress_bar.setObjectName(u"job_progress_bar")
+        self.job_progress_bar.setGeometry(QRect(31, 395, 850, 22))
+        font4 = QFont()
+        font4.setPointSize(10)
+        self.job_progress_bar.setFont(font4)
+        self.job_progress_bar.setValue(0)
+        self.cancel_job_btn = QPushButton(self.centralwidget)
+        self.cancel_job_btn.setObjectName(u"cancel_job_btn")
+        self.cancel_job_btn.setEnabled(False)
+        self.cancel_job_btn.setGeometry(QRect(890, 393, 112, 26))
+        self.cancel_job_btn.setFont(font4)
+        self.robot_status_table = QTableWidget(self.centralwidget)
+        if (self.robot_status_table.columnCount() < 4):
+            self.robot_status_table.setColumnCount(4)
+        __qtablewidgetitem = QTableWidgetItem()
+        self.robot_status_table.setHorizontalHeaderItem(0, __qtablewidgetitem)
+        __qtablewidgetitem1 = QTableWidgetItem()
+        self.robot_status_table.setHorizontalHeaderItem(1, __qtablewidgetitem1)
+        __qtablewidgetitem2 = QTableWidgetItem()
+        self.robot_status_table.setHorizontalHeaderItem(2, __qtablewidgetitem2)
+        __qtablewidgetitem3 = QTableWidgetItem()
+        self.robot_status_table.setHorizontalHeaderItem(3, __qtablewidgetitem3)
+        self.robot_status_table.setObjectName(u"robot_status_table")
+        self.robot_status_table.setGeometry(QRect(31, 597, 971, 95))
+        self.robot_status_table.setFont(font4)
+        self.robot_status_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.robot_status_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.robot_status_table.horizontalHeader().setStretchLastSection(True)
+        self.robot_status_table.verticalHeader().setVisible(False)
         MainWindow.setCentralWidget(self.centralwidget)
         self.menubar = QMenuBar(MainWindow)
         self.menubar.setObjectName(u"menubar")
@@ -109,5 +144,15 @@ class Ui_MainWindow(object):
         self.select_program_label.setText(QCoreApplication.translate("MainWindow", u"Select Program for Simulation:", None))
         self.run_ot2.setText(QCoreApplication.translate("MainWindow", u"Run OT-2", None))
         self.cancel_run_btn.setText(QCoreApplication.translate("MainWindow", u"Cancel OT-2 Run", None))
+        self.cancel_job_btn.setText(QCoreApplication.translate("MainWindow", u"Cancel", None))
+        self.queue_plate_btn.setText(QCoreApplication.translate("MainWindow", u"Queue Plate", None))
+        ___qtablewidgetitem = self.robot_status_table.horizontalHeaderItem(0)
+        ___qtablewidgetitem.setText(QCoreApplication.translate("MainWindow", u"Robot", None));
+        ___qtablewidgetitem1 = self.robot_status_table.horizontalHeaderItem(1)
+        ___qtablewidgetitem1.setText(QCoreApplication.translate("MainWindow", u"Status", None));
+        ___qtablewidgetitem2 = self.robot_status_table.horizontalHeaderItem(2)
+        ___qtablewidgetitem2.setText(QCoreApplication.translate("MainWindow", u"Plate", None));
+        ___qtablewidgetitem3 = self.robot_status_table.horizontalHeaderItem(3)
+        ___qtablewidgetitem3.setText(QCoreApplication.translate("MainWindow", u"Progress", None));
     # retranslateUi
 
@@ -8,35 +8,49 @@ Chapel Hill NC, 27599
 @copyright 2025
 
 """
-import csv
+import hashlib
+import json
 import math
 import os
-from collections import defaultdict
-from types import SimpleNamespace
+from collections import defaultdict, namedtuple
+import numpy as np
+import TemplateParser
 # import Tool_Box as ToolBox
 
 __version__ = "2.0.0a"
 
+# These match RunPlan.PLAN_VERSION and RunPlan.RUN_PLAN_SUFFIX.  They are repeated so the robot does not need RunPlan.
+RUN_PLAN_VERSION = 3
+RUN_PLAN_SUFFIX = ".plan.json"
+TEMPERATURE_MODULE = "temperature module gen2"
+
+
+class TemperatureModuleError(Exception):
+    def __init__(self, msg, *args):
+        super(TemperatureModuleError, self).__init__(msg, *args)
+
 
 def plate_layout(labware):
     """
-    Define the destination layout for the reactions.  Can be 96-well plate or 8-well strip tubes
+    Define the destination layout for the reactions.  Can be 96-well plate, 384-well plate or 8-well strip tubes.
+    The wells of a 384-well plate are taken down each column in the order an 8-channel pipette reaches them, the odd
+    rows then the even rows, so every eight reactions fill one multichannel column.
     :param labware:
     :return:
     """
 
     layout_data = defaultdict(list)
     column_index = []
-    if labware == "384_ABI":
-        for k in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L']:
-            layout_data[k] = \
-                ['', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '',
-                 '', '', '', '', '', '', '']
-        for i in range(32):
+    rows = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+    if "384" in labware:
+        rows = ['A', 'C', 'E', 'G', 'I', 'K', 'M', 'O', 'B', 'D', 'F', 'H', 'J', 'L', 'N', 'P']
+        for k in sorted(rows):
+            layout_data[k] = ['' for i in range(24)]
+        for i in range(24):
             column_index.append(i+1)
 
     elif labware == "8_well_strip_tubes_200ul":
-        for k in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']:
+        for k in rows:
             layout_data[k] = ['', '', '', '', '', '', '', '', '', '', '', '']
         column_index = [1, 3, 5, 7, 9, 11, 12]
     '''
@@ -45,12 +59,11 @@ def plate_layout(labware):
     '''
 
     if "96" in labware or "ddpcr_plate" in labware:
-        for k in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']:
+        for k in rows:
             layout_data[k] = ['', '', '', '', '', '', '', '', '', '', '', '']
         for i in range(12):
             column_index.append(i+1)
 
-    rows = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
     plate_layout_by_column = []
     for i in column_index:
         for row in rows:
@@ -102,48 +115,36 @@ def res_tip_height(res_vol, well_dia, cone_vol, bottom_offset):
 
 def parse_sample_template(input_file):
     """
-    Parse the TSV file and return data objects to run def.
+    Parse the TSV file and return data objects to run def.  Parsing is done by TemplateParser so an unchanged file
+    is only parsed once.
     :param input_file:
     :return:
     """
-    line_num = 0
-    options_dictionary = defaultdict(str)
-    sample_dictionary = defaultdict(list)
-    template_file = list(csv.reader(open(input_file), delimiter='\t'))
-    for line in template_file:
-        if line_num == 0:
-            options_dictionary["Version"] = line[1]
-            options_dictionary["Template"] = line[0].strip("#")
-        line_num += 1
-
-        # Skip any lines that are blank or comments.
-        if bool(line[0]) and "#" not in line[0]:
-            if "--" in line[0]:
-                key = line[0].strip('--')
-
-                if "Target_" in key:
-                    key_value = (line[1], line[2], line[3])
-                else:
-                    key_value = line[1]
-
-                options_dictionary[key] = key_value
-
-            else:
-                sample_key = line[0], line[1]
-                sample_dictionary[sample_key] = line
+    return TemplateParser.parse_sample_template(input_file)
 
-    return sample_dictionary, SimpleNamespace(**options_dictionary)
 
-
-def initialize_system(ctx):
+def procedure_file_path():
+    """
+    Location of the procedure TSV file.  The simulation worker points at the file being simulated with the
+    OT2_PROCEDURE_TSV environment variable.
+    :return:
+    """
     # TSV file location on OT-2
     tsv_file_path = "{0}var{0}lib{0}jupyter{0}notebooks{0}ProcedureFile.tsv".format(os.sep)
     if not os.path.isfile(tsv_file_path):
+        tsv_file_path = os.environ.get("OT2_PROCEDURE_TSV")
+    if not tsv_file_path:
         # Temp TSV file location on Windows Computers for simulation
         tsv_file_path = "C:{0}Users{0}{1}{0}Documents{0}TempTSV.tsv".format(os.sep, os.getlogin())
 
+    return tsv_file_path
+
+
+def initialize_system(ctx, modules=None):
+    tsv_file_path = procedure_file_path()
+
     sample_parameters, args = parse_sample_template(tsv_file_path)
-    labware_dict, slot_dict, left_tiprack_list, right_tiprack_list = labware_parsing(args, ctx)
+    labware_dict, slot_dict, left_tiprack_list, right_tiprack_list = labware_parsing(args, ctx, modules)
 
     # Pipettes
     left_pipette = ctx.load_instrument(args.LeftPipette, 'left', tip_racks=left_tiprack_list)
@@ -156,27 +157,39 @@ def initialize_system(ctx):
     return args, tsv_file_path, sample_parameters, labware_dict, left_tiprack_list, right_tiprack_list, left_pipette, right_pipette, left_pipette.starting_tip, right_pipette.starting_tip
 
 
-def labware_parsing(args, ctx):
-    # Extract Slot information
+def labware_parsing(args, ctx, modules=None):
+    # Extract Slot information.  Labware in a slot with a module loaded in it sits on the module.
     slot_list = ["Slot1", "Slot2", "Slot3", "Slot4", "Slot5", "Slot6", "Slot7", "Slot8", "Slot9", "Slot10", "Slot11"]
     labware_dict = {}
     slot_dict = {}
     tipbox_dict = \
         {"p10_multi": "opentrons_96_tiprack_10ul", "p10_single": "opentrons_96_tiprack_10ul",
          "p20_single_gen2": ["opentrons_96_tiprack_20ul", "opentrons_96_filtertiprack_20ul"],
-         "p300_single_gen2": ["opentrons_96_tiprack_300ul", "opentrons_96_filtertiprack_300ul"]}
+         "p20_multi_gen2": ["opentrons_96_tiprack_20ul", "opentrons_96_filtertiprack_20ul"],
+         "p300_single_gen2": ["opentrons_96_tiprack_300ul", "opentrons_96_filtertiprack_300ul"],
+         "p300_multi_gen2": ["opentrons_96_tiprack_300ul", "opentrons_96_filtertiprack_300ul"]}
+    # Tip boxes named for a pipette with --LeftPipetteTipBoxes or --RightPipetteTipBoxes are only used by it.
+    named_tipboxes = TemplateParser.named_tip_boxes(args)
     # Pipette Tip Boxes
     left_tiprack_list = []
     right_tiprack_list = []
     for i in range(len(slot_list)):
         labware = getattr(args, "{}".format(slot_list[i]))
         if labware:
-            slot_dict[str(i + 1)] = labware
-            labware_dict[str(i + 1)] = ctx.load_labware(labware, str(i + 1))
-            if labware in tipbox_dict[args.LeftPipette]:
-                left_tiprack_list.append(labware_dict[str(i + 1)])
-            elif labware in tipbox_dict[args.RightPipette]:
-                right_tiprack_list.append(labware_dict[str(i + 1)])
+            slot = str(i + 1)
+            slot_dict[slot] = labware
+            if modules and slot in modules:
+                labware_dict[slot] = modules[slot].load_labware(labware)
+            else:
+                labware_dict[slot] = ctx.load_labware(labware, slot)
+            if slot in named_tipboxes.get("left", []):
+                left_tiprack_list.append(labware_dict[slot])
+            elif slot in named_tipboxes.get("right", []):
+                right_tiprack_list.append(labware_dict[slot])
+            elif labware in tipbox_dict[args.LeftPipette] and "left" not in named_tipboxes:
+                left_tiprack_list.append(labware_dict[slot])
+            elif labware in tipbox_dict[args.RightPipette] and "right" not in named_tipboxes:
+                right_tiprack_list.append(labware_dict[slot])
 
     return labware_dict, slot_dict, left_tiprack_list, right_tiprack_list
 
@@ -242,6 +255,119 @@ def build_labware_dict(protocol, sample_parameters, slot_dict):
     return sample_reagent_labware_dict
 
 
+VolumeArrays = namedtuple("VolumeArrays", ["sample_vol", "diluent_vol", "diluted_sample_vol", "reaction_water_vol",
+                                           "max_template_vol", "too_concentrated", "bad_concentration"])
+
+# Dilutions are made in steps of 2 from 1:2 up to 1:100.
+MAX_DILUTION_STEPS = 50
+
+
+def dilution_slot_msg(args, slot_dict):
+    """
+    Message returned when dilutions are needed but there is no place on the deck to make them.
+    :param args:
+    :param slot_dict:
+    :return:
+    """
+    if not args.DilutionPlateSlot:
+        return "Dilutions are required but no Slot was defined for them."
+    if args.DilutionPlateSlot not in slot_dict:
+        return "Dilution Labware required for Slot {}".format(args.DilutionPlateSlot)
+    return ""
+
+
+def _product_error(a, b, product):
+    """
+    Exact error of the floating point product a*b, by Dekker's method, so a*b is exactly product + error.
+    :param a:
+    :param b:
+    :param product:
+    :return:
+    """
+    def split(x):
+        scaled = 134217729.0*x
+        high = scaled - (scaled - x)
+        return high, x - high
+
+    a_high, a_low = split(a)
+    b_high, b_low = split(b)
+    return ((a_high*b_high - product) + a_high*b_low + a_low*b_high) + a_low*b_low
+
+
+def _round_half_even(values, ndigits):
+    """
+    Round the way the builtin round does, to the nearest and ties to even on the exact value, so the volumes match the
+    ones the robot has always used.  Scaling by 10**ndigits can land on a tie the exact value is not on.  Those are
+    settled by the error of the scaling.
+    :param values:
+    :param ndigits:
+    :return:
+    """
+    scale = 10.0**ndigits
+    with np.errstate(invalid="ignore"):
+        scaled = values*scale
+        error = _product_error(values, scale, scaled)
+        rounded = np.rint(scaled)
+        tie = np.abs(scaled - rounded) == 0.5
+        rounded = np.where(tie & (error > 0), np.ceil(scaled), rounded)
+        rounded = np.where(tie & (error < 0), np.floor(scaled), rounded)
+    return rounded/scale
+
+
+def calculate_volumes_batch(max_template_vol, sample_concentration, template_in_rxn):
+    """
+    Closed form version of calculate_volumes for a whole plate, or several plates, at once.  The inputs can be any
+    broadcastable mix of scalars and arrays.  The smallest dilution that puts more than 2 uL of diluted sample in the
+    reaction is floor(concentration/template)+1 steps of 2.  Because the diluted volume only grows with the dilution,
+    if that one does not fit in the reaction none of the larger ones will.  The neighbouring steps are also tested so
+    floating point rounding picks the same dilution the step by step search did.
+    Samples too concentrated to dilute are flagged and their volumes are NaN.  So are samples with a concentration that
+    is not more than 0.
+    :param max_template_vol:
+    :param sample_concentration:
+    :param template_in_rxn:
+    :return:
+    """
+    concentration = np.asarray(sample_concentration, dtype=float)
+    template = np.asarray(template_in_rxn, dtype=float)
+    max_vol = np.asarray(max_template_vol, dtype=float)
+    concentration, template, max_vol = np.broadcast_arrays(concentration, template, max_vol)
+    bad_concentration = ~(concentration > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        undiluted_vol = template/concentration
+        no_dilution = undiluted_vol >= 2
+
+        guess = np.clip(np.floor(concentration/template), 1, MAX_DILUTION_STEPS)
+        dilution = np.zeros(concentration.shape)
+        diluted_vol = np.zeros(concentration.shape)
+        found = np.zeros(concentration.shape, dtype=bool)
+        for offset in (-1, 0, 1, 2):
+            step = np.clip(guess + offset, 1, MAX_DILUTION_STEPS)
+            step_dilution = step*2
+            step_vol = template/(concentration/step_dilution)
+            fits = ~found & (step_vol > 2) & (step_vol <= max_vol)
+            dilution = np.where(fits, step_dilution, dilution)
+            diluted_vol = np.where(fits, step_vol, diluted_vol)
+            found |= fits
+
+    needs_dilution = ~no_dilution & found & ~bad_concentration
+    too_concentrated = ~no_dilution & ~found & ~bad_concentration
+    undiluted_vol = _round_half_even(undiluted_vol, 2)
+    diluted_vol = _round_half_even(diluted_vol, 2)
+
+    sample_vol = np.where(no_dilution, undiluted_vol, 1.0)
+    diluent_vol = np.where(needs_dilution, dilution - 1, 0.0)
+    diluted_sample_vol = np.where(needs_dilution, diluted_vol, 0.0)
+    reaction_water_vol = np.where(no_dilution, max_vol - undiluted_vol, max_vol - diluted_vol)
+
+    for values in (sample_vol, diluent_vol, diluted_sample_vol, reaction_water_vol):
+        values[too_concentrated | bad_concentration] = np.nan
+
+    return VolumeArrays(sample_vol, diluent_vol, diluted_sample_vol, reaction_water_vol, max_vol, too_concentrated,
+                        bad_concentration)
+
+
 def calculate_volumes(args, sample_concentration, template_in_rxn, sample_name=None, slot_dict=None):
     """
     Calculates volumes for dilution and distribution of sample.
@@ -256,34 +382,27 @@ def calculate_volumes(args, sample_concentration, template_in_rxn, sample_name=N
     """
 
     max_template_vol = round(float(args.PCR_Volume)-float(args.MasterMixPerRxn), 1)
-    msg = ""
-    # If at least 2 uL of sample is needed then no dilution is necessary
-    if template_in_rxn/sample_concentration >= 2:
-        sample_vol = round(template_in_rxn/sample_concentration, 2)
-        return sample_vol, 0, 0, max_template_vol-sample_vol, max_template_vol, msg
-
-    # This will test a series of dilutions up to a 1:200.
-    for i in range(50):
-        dilution = (i+1)*2
-        diluted_dna_conc = sample_concentration/dilution
-
-        # Want to pipette at least 2 uL of diluted sample per well
-        if 2 < template_in_rxn/diluted_dna_conc <= max_template_vol:
-            diluted_sample_vol = round(template_in_rxn/diluted_dna_conc, 2)
-            reaction_water_vol = max_template_vol-diluted_sample_vol
-
-            if not args.DilutionPlateSlot:
-                msg += "Dilutions are required but no Slot was defined for them."
-            else:
-                try:
-                    slot_dict[args.DilutionPlateSlot]
-                except KeyError:
-                    msg += "Dilution Labware required for Slot {}".format(args.DilutionPlateSlot)
+    volumes = calculate_volumes_batch(max_template_vol, sample_concentration, template_in_rxn)
+
+    if volumes.bad_concentration:
+        msg = "Concentration must be greater than 0 for sample {}".format(sample_name)
+        return "", "", "", "", "", msg
+
+    if volumes.too_concentrated:
+        msg = "{} is too concentrated for Douglass to dilute.".format(sample_name)
+        return "", "", "", "", "", msg
 
-            return 1, dilution - 1, diluted_sample_vol, reaction_water_vol, max_template_vol, msg
+    sample_vol = float(volumes.sample_vol)
+    diluent_vol = float(volumes.diluent_vol)
+    diluted_sample_vol = float(volumes.diluted_sample_vol)
+    reaction_water_vol = float(volumes.reaction_water_vol)
+
+    # If at least 2 uL of sample is needed then no dilution is necessary
+    if diluted_sample_vol == 0:
+        return sample_vol, 0, 0, reaction_water_vol, max_template_vol, ""
 
-    msg += "{} is too concentrated for Douglass to dilute.".format(sample_name)
-    return "", "", "", "", "", msg
+    return 1, int(diluent_vol), diluted_sample_vol, reaction_water_vol, max_template_vol, \
+        dilution_slot_msg(args, slot_dict)
 
 
 def dispensing_loop(args, loop_count, pipette, source_location, destination_location, volume, NewTip, MixReaction,
@@ -349,13 +468,11 @@ def distribute_reagents(pipette, source_well, destination_wells, dispense_vol):
     @param destination_wells:
     @param dispense_vol:
     """
-    p20_default_rate = 7.56
-    p300_default_rate = 92.86
-
-    if "P300 Single-Channel GEN2" in str(pipette):
-        default_rate = p300_default_rate
-    elif "P20 Single-Channel GEN2" in str(pipette):
-        default_rate = p20_default_rate
+    # The rates are put back to the default for the pipette size.  Single and multichannel pipettes share them.
+    default_rates = {"p20": 7.56, "p300": 92.86}
+    pipette_size = pipette.name.split("_")[0]
+    default_aspirate = default_rates.get(pipette_size, pipette.flow_rate.aspirate)
+    default_dispense = default_rates.get(pipette_size, pipette.flow_rate.dispense)
 
     pipette.flow_rate.aspirate = 30
     pipette.flow_rate.dispense = 10
@@ -363,6 +480,159 @@ def distribute_reagents(pipette, source_well, destination_wells, dispense_vol):
     pipette.distribute(volume=dispense_vol, source=source_well, dest=destination_wells,
                        touch_tip=True, blow_out=True, disposal_volume=1, blowout_location='source well')
 
-    pipette.flow_rate.aspirate = default_rate
-    pipette.flow_rate.dispense = default_rate
+    pipette.flow_rate.aspirate = default_aspirate
+    pipette.flow_rate.dispense = default_dispense
+
+
+def run_plan_file_path(tsv_file_path):
+    """
+    Location of the run plan.  On the robot it is beside the TSV file.  The GUI keeps its plans in its own directory
+    and the simulation points at the one for the TSV file with the OT2_RUN_PLAN environment variable.
+    @param tsv_file_path:
+    @return:
+    """
+    plan_path = os.environ.get("OT2_RUN_PLAN")
+    if not plan_path:
+        plan_path = "{}{}".format(os.path.splitext(tsv_file_path)[0], RUN_PLAN_SUFFIX)
+
+    return plan_path
+
+
+def load_run_plan(tsv_file_path):
+    """
+    The run plan made for the TSV file when it was validated.  None when there is no plan or it was made from a
+    different version of the file, and the program works the run out from the TSV file as before.
+    @param tsv_file_path:
+    @return:
+    """
+    plan_path = run_plan_file_path(tsv_file_path)
+    if not os.path.isfile(plan_path):
+        return None
+
+    try:
+        with open(plan_path) as plan_file:
+            plan = json.load(plan_file)
+    except ValueError:
+        return None
+    with open(tsv_file_path, 'rb') as tsv_file:
+        digest = hashlib.sha256(tsv_file.read()).hexdigest()
+    if plan.get("version") != RUN_PLAN_VERSION or plan.get("tsv_sha256") != digest:
+        return None
+
+    return plan
+
+
+def run_saved_plan(ctx):
+    """
+    Run the plan saved for the procedure TSV file.  Returns False without loading anything when there is no plan for
+    the file as it is now, so a program can call this first and carry on with its own steps.
+    @param ctx:
+    @return:
+    """
+    plan = load_run_plan(procedure_file_path())
+    if plan is None:
+        return False
+
+    # The plate a temperature step holds is on a temperature module.  It is loaded before the labware that sits on it.
+    temperature_modules = {}
+    for step in plan["steps"]:
+        if step["kind"] == "temperature" and step["slot"] not in temperature_modules:
+            try:
+                temperature_modules[step["slot"]] = ctx.load_module(TEMPERATURE_MODULE, step["slot"])
+            except Exception as error:
+                raise TemperatureModuleError("Unable to load the temperature module in slot {} for {}: {}"
+                                             .format(step["slot"], step["label"], error))
+
+    args, tsv_file_path, sample_parameters, labware_dict, left_tiprack_list, right_tiprack_list, left_pipette, \
+        right_pipette, left_tip, right_tip = initialize_system(ctx, temperature_modules)
+    execute_run_plan(ctx, args, plan, labware_dict, {"left": left_pipette, "right": right_pipette},
+                     temperature_modules)
+    return True
+
+
+def execute_run_plan(ctx, args, plan, labware_dict, pipettes, temperature_modules=None):
+    """
+    Run the steps of a run plan.  Nothing is worked out here, every slot, well, volume and pipette comes from the plan.
+    @param ctx:
+    @param args:
+    @param plan: Plan from load_run_plan.
+    @param labware_dict: Loaded labware by slot, from labware_parsing.
+    @param pipettes: Loaded pipette by mount.
+    @param temperature_modules: Loaded temperature module by slot.
+    @return:
+    """
+    bottom_offset = float(args.BottomOffset)
+
+    def well(site):
+        return labware_dict[site[0]][site[1]]
+
+    def drop_tip(pipette):
+        if pipette.has_tip:
+            pipette.drop_tip()
+
+    for step in plan["steps"]:
+        kind = step["kind"]
+        if kind == "temperature":
+            temperature_module = (temperature_modules or {}).get(step["slot"])
+            if temperature_module is None:
+                raise TemperatureModuleError("{} needs a temperature module in slot {} but none is loaded."
+                                             .format(step["label"], step["slot"]))
+            temperature_module.set_temperature(step["celsius"])
+
+        elif kind == "transfer":
+            pipette = pipettes[step["mount"]]
+            if step["new_tip"]:
+                drop_tip(pipette)
+            dispensing_loop(args, step["loops"], pipette, well(step["source"]).bottom(bottom_offset),
+                            well(step["destination"]), step["volume"], NewTip=False,
+                            MixReaction=bool(step["mix_volume"]), touch=step["touch"], MixVolume=step["mix_volume"])
+
+        elif kind == "column_transfer":
+            # The pipette is placed by its first channel.  The others follow down the column.
+            pipette = pipettes[step["mount"]]
+            if step["new_tip"]:
+                drop_tip(pipette)
+            dispensing_loop(args, step["loops"], pipette, well(step["sources"][0]).bottom(bottom_offset),
+                            well(step["destinations"][0]), step["volume"], NewTip=False,
+                            MixReaction=bool(step["mix_volume"]), touch=step["touch"], MixVolume=step["mix_volume"])
+
+        elif kind == "multi_dispense":
+            pipette = pipettes[step["mount"]]
+            if step["new_tip"]:
+                drop_tip(pipette)
+            if not pipette.has_tip:
+                pipette.pick_up_tip()
+            source = well(step["source"])
+            pipette.aspirate(sum(step["volumes"]) + step["disposal_volume"], source.bottom(bottom_offset), rate=0.75)
+            for site, volume in zip(step["destinations"], step["volumes"]):
+                pipette.dispense(volume, well(site), rate=0.75)
+                if step["touch"]:
+                    pipette.touch_tip(radius=0.75, v_offset=-8)
+            pipette.blow_out(source)
+
+        elif kind == "distribute":
+            pipette = pipettes[step["mount"]]
+            drop_tip(pipette)
+            distribute_reagents(pipette, well(step["source"]), [well(site) for site in step["destinations"]],
+                                step["volume"])
+
+        elif kind == "dilute":
+            diluent_pipette = pipettes[step["diluent_mount"]]
+            sample_pipette = pipettes[step["sample_mount"]]
+            drop_tip(diluent_pipette)
+            dispensing_loop(args, 1, diluent_pipette, well(step["diluent_source"]).bottom(bottom_offset),
+                            well(step["destination"]), step["diluent_volume"], NewTip=True, MixReaction=False)
+            drop_tip(sample_pipette)
+            dispensing_loop(args, 1, sample_pipette, well(step["source"]).bottom(bottom_offset),
+                            well(step["destination"]), step["sample_volume"], NewTip=False, MixReaction=False)
+
+        elif kind == "mix":
+            pipette = pipettes[step["mount"]]
+            if not pipette.has_tip:
+                pipette.pick_up_tip()
+            pipette.mix(repetitions=step["repetitions"], volume=step["volume"], location=well(step["well"]), rate=2.0)
+            pipette.blow_out()
+            pipette.drop_tip()
 
+    for pipette in pipettes.values():
+        drop_tip(pipette)
@@ -0,0 +1,146 @@
+"""
+Running liquid volume of every well on the deck.
+
+The volumes, capacities and dead volumes are flat NumPy arrays with one entry for every well position of every slot, so
+each aspirate or dispense is a single O(1) update whatever the plate size.  A well whose starting volume is not known,
+such as a sample tube, holds NaN and is never reported as running dry, but wells that start empty and the reagent and
+water wells given in the TSV file are checked on every step.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+from collections import namedtuple
+
+import numpy as np
+
+__version__ = "1.0.0"
+
+# Slots 1 to 12 and room for a 384 well plate, 16 rows by 24 columns, in each.
+SLOT_COUNT = 13
+MAX_ROWS = 16
+WELLS_PER_SLOT = MAX_ROWS * 24
+
+# Liquid left in a well that the pipette cannot reach, in uL, by labware load name.  The first match is used.
+DEAD_VOLUMES = [
+    ("1.5ml", 20.0),
+    ("2ml", 20.0),
+    ("500ul", 15.0),
+    ("5ml", 300.0),
+    ("5000ul", 300.0),
+    ("tuberack", 20.0),
+    ("tube_rack", 20.0),
+    ]
+DEFAULT_DEAD_VOLUME = 2.0
+
+LedgerProblem = namedtuple("LedgerProblem", ["step", "command", "slot", "well", "volume", "remaining", "limit",
+                                             "message"])
+
+
+def well_index(well_name):
+    """
+    Column major position of the well within its slot.  A1 is 0, B1 is 1 and so on.
+    :param well_name:
+    :return:
+    """
+    return (int(well_name[1:]) - 1) * MAX_ROWS + ord(well_name[0]) - ord("A")
+
+
+def dead_volume(load_name):
+    for name, volume in DEAD_VOLUMES:
+        if name in load_name:
+            return volume
+    return DEFAULT_DEAD_VOLUME
+
+
+class VolumeLedger:
+    def __init__(self):
+        size = SLOT_COUNT * WELLS_PER_SLOT
+        self.volumes = np.full(size, np.nan)
+        self.capacities = np.full(size, np.inf)
+        self.dead_volumes = np.zeros(size)
+        self.problems = []
+        # Each well is reported once for running low and once for overflowing.
+        self._reported = set()
+
+    @staticmethod
+    def position(slot, well_name):
+        return int(slot) * WELLS_PER_SLOT + well_index(well_name)
+
+    def add_labware(self, slot, load_name, wells, start_empty=False):
+        """
+        Register the capacity of each well.  wells is a list of (well name, capacity in uL).
+        :param slot:
+        :param load_name:
+        :param wells:
+        :param start_empty: The wells hold nothing when the run starts.
+        :return:
+        """
+        positions = [self.position(slot, name) for name, capacity in wells]
+        self.capacities[positions] = [capacity for name, capacity in wells]
+        self.dead_volumes[positions] = dead_volume(load_name)
+        self.volumes[positions] = 0.0 if start_empty else np.nan
+
+    def set_volume(self, slot, well_name, volume):
+        self.volumes[self.position(slot, well_name)] = volume
+
+    def volume(self, slot, well_name):
+        return float(self.volumes[self.position(slot, well_name)])
+
+    def aspirate(self, slot, well_name, volume, step=None):
+        position = self.position(slot, well_name)
+        remaining = self.volumes[position] - volume
+        self.volumes[position] = remaining
+        if remaining < self.dead_volumes[position] and ("aspirate", position) not in self._reported:
+            self._reported.add(("aspirate", position))
+            self.problems.append(
+                LedgerProblem(step, "aspirate", slot, well_name, volume, round(float(remaining), 2),
+                              float(self.dead_volumes[position]),
+                              "Aspirating {} uL from {} in slot {} leaves {} uL, below the {} uL dead volume."
+                              .format(round(volume, 2), well_name, slot, round(float(remaining), 2),
+                                      self.dead_volumes[position])))
+
+    def dispense(self, slot, well_name, volume, step=None):
+        position = self.position(slot, well_name)
+        total = self.volumes[position] + volume
+        self.volumes[position] = total
+        if total > self.capacities[position] and ("dispense", position) not in self._reported:
+            self._reported.add(("dispense", position))
+            self.problems.append(
+                LedgerProblem(step, "dispense", slot, well_name, volume, round(float(total), 2),
+                              float(self.capacities[position]),
+                              "Dispensing {} uL into {} in slot {} fills it to {} uL, over its {} uL capacity."
+                              .format(round(volume, 2), well_name, slot, round(float(total), 2),
+                                      self.capacities[position])))
+
+    def report(self):
+        return "\n".join("Step {}: {}".format(problem.step, problem.message) if problem.step else problem.message
+                         for problem in self.problems)
+
+
+def template_volumes(args):
+    """
+    Starting volumes given in the TSV file as (slot, well, uL).  Water and the PCR targets are in the reagent slot.
+    :param args:
+    :return:
+    """
+    slot = getattr(args, "ReagentSlot", "")
+    volumes = []
+    if not slot:
+        return volumes
+
+    try:
+        volumes.append((slot, args.WaterResWell.upper(), float(args.WaterResVol)))
+    except (AttributeError, ValueError):
+        pass
+
+    for i in range(10):
+        target = getattr(args, "Target_{}".format(i + 1), "")
+        try:
+            volumes.append((slot, target[0].upper(), float(target[2])))
+        except (IndexError, TypeError, ValueError):
+            continue
+
+    return volumes
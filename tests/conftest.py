@@ -0,0 +1,47 @@
+"""
+The modules live at the top of the repository, next to this directory.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture(autouse=True)
+def plan_dir(tmp_path, monkeypatch):
+    """
+    Keep the run plans a test saves in its own directory instead of the user's.
+    :param tmp_path:
+    :param monkeypatch:
+    :return:
+    """
+    import RunPlan
+
+    path = tmp_path / "run_plans"
+    path.mkdir()
+    monkeypatch.setattr(RunPlan, "PLAN_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def sheet(tmp_path):
+    """
+    Copy a TSV file from tests/data into the test's own directory.
+    :param tmp_path:
+    :return:
+    """
+    def copy(name):
+        return shutil.copyfile(os.path.join(DATA_DIR, name), str(tmp_path / name))
+    return copy
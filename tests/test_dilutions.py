@@ -0,0 +1,115 @@
+"""
+calculate_volumes_batch gives the same volumes as the step by step dilution search it replaced.
+
+tests/data/dilution_golden.tsv holds the volumes the old search gave for a grid of reaction volumes, sample
+concentrations and template amounts, including the 2 uL and maximum template volume edges.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import csv
+import os
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+from conftest import DATA_DIR
+from Utilities import _round_half_even, calculate_volumes, calculate_volumes_batch
+
+GOLDEN_FILE = os.path.join(DATA_DIR, "dilution_golden.tsv")
+VOLUME_COLUMNS = ["sample_vol", "diluent_vol", "diluted_sample_vol", "reaction_water_vol"]
+
+
+def loop_volumes(max_template_vol, sample_concentration, template_in_rxn):
+    """
+    The dilution search calculate_volumes used before calculate_volumes_batch.  Returns None for a sample too
+    concentrated to dilute.
+    :param max_template_vol:
+    :param sample_concentration:
+    :param template_in_rxn:
+    :return:
+    """
+    # If at least 2 uL of sample is needed then no dilution is necessary
+    if template_in_rxn/sample_concentration >= 2:
+        sample_vol = round(template_in_rxn/sample_concentration, 2)
+        return sample_vol, 0, 0, max_template_vol-sample_vol
+
+    # This will test a series of dilutions up to a 1:200.
+    for i in range(50):
+        dilution = (i+1)*2
+        diluted_dna_conc = sample_concentration/dilution
+
+        # Want to pipette at least 2 uL of diluted sample per well
+        if 2 < template_in_rxn/diluted_dna_conc <= max_template_vol:
+            diluted_sample_vol = round(template_in_rxn/diluted_dna_conc, 2)
+            return 1, dilution - 1, diluted_sample_vol, max_template_vol-diluted_sample_vol
+
+    return None
+
+
+def read_golden():
+    with open(GOLDEN_FILE) as golden_file:
+        return list(csv.DictReader(golden_file, delimiter='\t'))
+
+
+def check_batch(max_vols, concentrations, templates, expected):
+    volumes = calculate_volumes_batch(max_vols, concentrations, templates)
+    for i, row in enumerate(expected):
+        if row is None:
+            assert volumes.too_concentrated[i]
+            assert np.isnan(volumes.sample_vol[i])
+            continue
+
+        assert not volumes.too_concentrated[i]
+        assert [float(getattr(volumes, column)[i]) for column in VOLUME_COLUMNS] == [float(v) for v in row]
+
+
+def test_golden_volumes():
+    rows = read_golden()
+    assert len(rows) > 300
+    expected = [None if row["too_concentrated"] == "1" else [row[column] for column in VOLUME_COLUMNS]
+                for row in rows]
+    check_batch([float(row["max_template_vol"]) for row in rows], [float(row["concentration"]) for row in rows],
+                [float(row["template"]) for row in rows], expected)
+
+
+def test_golden_file_is_the_old_search():
+    for row in read_golden():
+        old = loop_volumes(float(row["max_template_vol"]), float(row["concentration"]), float(row["template"]))
+        if old is None:
+            assert row["too_concentrated"] == "1"
+        else:
+            assert [float(row[column]) for column in VOLUME_COLUMNS] == [float(v) for v in old]
+
+
+def test_random_plates_match_the_old_search():
+    rng = random.Random(2025)
+    max_vols = [rng.choice([5.0, 8.0, 10.0, 12.5, 18.0]) for i in range(2000)]
+    concentrations = [round(10 ** rng.uniform(-1, 4), rng.choice([0, 1, 2, 3])) or 0.1 for i in range(2000)]
+    templates = [rng.choice([0.5, 1, 2, 5, 10, 20, 50]) for i in range(2000)]
+    check_batch(max_vols, concentrations, templates, [loop_volumes(*values) for values in
+                                                      zip(max_vols, concentrations, templates)])
+
+
+def test_rounding_matches_round():
+    rng = random.Random(2025)
+    # Two place ties, the doubles either side of them and volumes from the template and concentration grid.
+    values = [k/200 for k in range(20000)]
+    values += [float(np.nextafter(value, direction)) for value in values[:5000] for direction in (0, 100)]
+    values += [template/rng.uniform(0.1, 1000) for template in (0.5, 1, 2, 5, 10, 20, 50) for i in range(2000)]
+    assert _round_half_even(np.array(values), 2).tolist() == [round(value, 2) for value in values]
+
+
+def test_concentration_of_zero_is_flagged():
+    volumes = calculate_volumes_batch(10.0, [0.0, -5.0, 20.0], 20.0)
+    assert volumes.bad_concentration.tolist() == [True, True, False]
+    assert not volumes.too_concentrated.any()
+    assert np.isnan(volumes.sample_vol[:2]).all() and volumes.sample_vol[2] == 1.0
+
+    args = SimpleNamespace(PCR_Volume="20", MasterMixPerRxn="10")
+    msg = calculate_volumes(args, 0.0, 20.0, "Sample 1")[5]
+    assert msg == "Concentration must be greater than 0 for sample Sample 1"
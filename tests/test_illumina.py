@@ -0,0 +1,70 @@
+"""
+Illumina dual indexing sheets are checked with their own sample columns: slot, source well, index, name, concentration
+and destination well.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+from TemplateErrorChecking import TemplateErrorChecking
+from TemplateValidator import ILLUMINA, ILLUMINA_SAMPLE_COLUMNS, TemplateValidator
+
+
+def edit_sheet(tsv, *replacements):
+    with open(tsv) as tsv_file:
+        text = tsv_file.read()
+    for old, new in replacements:
+        assert old in text
+        text = text.replace(old, new)
+    with open(tsv, 'w') as tsv_file:
+        tsv_file.write(text)
+
+
+def validate(tsv):
+    validator = TemplateValidator(tsv, ILLUMINA)
+    validator.validate()
+    return validator
+
+
+def test_illumina_sheet_passes(sheet):
+    tsv = sheet("illumina_dual_indexing.tsv")
+    assert validate(tsv).diagnostics == []
+    assert TemplateErrorChecking(tsv).illumina_dual_indexing(ILLUMINA) == ""
+
+
+def test_illumina_sample_problems(sheet):
+    tsv = sheet("illumina_dual_indexing.tsv")
+    edit_sheet(tsv, ("D702+D501", "D701+D501"), ("5\tA3\tD703+D501", "5\tA1\tD703+D501"),
+               ("Sample 4\t20", "Sample 4\t"))
+    found = [(d.line, d.column, d.message) for d in validate(tsv).errors]
+
+    assert (26, ILLUMINA_SAMPLE_COLUMNS["Index"], "Sample index D701+D501 used for samples Sample 1 and Sample 2") \
+        in found
+    assert (27, None, "Slot 5, Well A1 is already used by the sample on line 25.") in found
+    assert (28, ILLUMINA_SAMPLE_COLUMNS["Concentration"], "Concentration not defined for sample Sample 4") in found
+    # The concentration is the fifth column, not the fourth as on a ddPCR sheet.
+    assert not [message for line, column, message in found if "Replica" in message or "Targets" in message]
+
+
+def test_illumina_template_problems(sheet):
+    tsv = sheet("illumina_dual_indexing.tsv")
+    edit_sheet(tsv, ("v2.0.1", "v2.0.0"), ("--IndexPrimerSlot\t4", "--IndexPrimerSlot\t6"),
+               ("--PCR_ReagentWell\tA2\n", ""))
+    messages = [d.message for d in validate(tsv).errors]
+
+    assert "Illumina_Dual_Indexing template must be v2.0.1, you are using v2.0.0" in messages
+    assert "Index Primers slot contains a pipette tip box" in messages
+    assert "--PCR_ReagentWell is not defined." in messages
+
+
+def test_illumina_plate_totals(sheet):
+    tsv = sheet("illumina_dual_indexing.tsv")
+    edit_sheet(tsv, ("--TotalReagentVolume\t500", "--TotalReagentVolume\t90"),
+               ("--WaterResVol\t5000", "--WaterResVol\t60"))
+    messages = [d.message for d in validate(tsv).errors]
+
+    # Half of each 50 uL reaction is PCR mix.  The water is what is left after the sample and 4 uL of index primers.
+    assert messages == ["Program requires minimum of 66.3 uL water.  You have 60 uL.",
+                        "Program requires 100.0 uL of PCR mix.  You have 90 uL"]
@@ -0,0 +1,135 @@
+"""
+The robot code against the stand-in OT-2 SSH server: file sync, cancelling a run and a fleet job.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import os
+import threading
+import time
+
+import paramiko
+import pytest
+
+from FleetDispatcher import FAILED, IDLE, MAX_JOB_ATTEMPTS, FleetDispatcher
+from MockOT2Server import INTERRUPTED_STATUS, NOTEBOOK_DIR, MockOT2Server
+from RobotConnection import ConnectionPool, RobotConnection
+from RobotRun import RemoteRun, execute_command
+from RobotSync import sync_files, sync_to_robot
+
+ROBOT = "127.0.0.1"
+
+
+@pytest.fixture
+def robot(tmp_path):
+    server = MockOT2Server(str(tmp_path / "robot"), line_delay=0.01).start()
+    key_file = str(tmp_path / "ot2_ssh_key")
+    paramiko.RSAKey.generate(2048).write_private_key_file(key_file)
+    yield server, {"key_filename": key_file, "port": server.address[1]}
+    server.stop()
+
+
+@pytest.fixture
+def plate(tmp_path):
+    tsv = tmp_path / "Plate.tsv"
+    tsv.write_text("#Generic PCR\t3.0.1\n--User\tTester\n")
+    program = tmp_path / "PCR.py"
+    program.write_text("def run(ctx):\n    pass\n")
+    return str(tsv), str(program)
+
+
+def test_sync_to_robot(robot, plate):
+    server, options = robot
+    tsv, program = plate
+    connection = RobotConnection(ROBOT, **options)
+    files = sync_files(tsv, "ProcedureFile.tsv", program)
+
+    result = sync_to_robot(connection, NOTEBOOK_DIR, files)
+    assert not result.mismatched
+    assert len(result.uploaded) == len(files)
+    with open(server.local_path(NOTEBOOK_DIR + "ProcedureFile.tsv")) as robot_tsv, open(tsv) as local_tsv:
+        assert robot_tsv.read() == local_tsv.read()
+    assert os.path.isfile(server.local_path(NOTEBOOK_DIR + "PCR.py"))
+    # Utilities imports TemplateParser on the robot.
+    assert os.path.isfile(server.local_path(NOTEBOOK_DIR + "TemplateParser.py"))
+
+    result = sync_to_robot(connection, NOTEBOOK_DIR, files)
+    assert not result.uploaded and len(result.unchanged) == len(files)
+    connection.close()
+
+
+def test_cancel_interrupts_the_run(robot, plate):
+    server, options = robot
+    tsv, program = plate
+    connection = RobotConnection(ROBOT, **options)
+    sync_to_robot(connection, NOTEBOOK_DIR, sync_files(tsv, "ProcedureFile.tsv", program))
+
+    remote_run = RemoteRun(connection, execute_command(NOTEBOOK_DIR, "PCR.py"))
+    remote_run.start()
+    time.sleep(0.03)
+    remote_run.cancel()
+    assert remote_run.wait() == INTERRUPTED_STATUS
+    assert remote_run.cancelled
+    assert server.stats["interrupts"] == 1
+    connection.close()
+
+
+def test_fleet_job_completes(robot, plate, tmp_path):
+    server, options = robot
+    tsv, program = plate
+    done = threading.Event()
+    finished = []
+
+    def on_job_done(job, robot_name, state, message):
+        finished.append((job.label, robot_name, state, message))
+        done.set()
+
+    pool = ConnectionPool(**options)
+    dispatcher = FleetDispatcher([{"name": ROBOT}], pool, NOTEBOOK_DIR, "ProcedureFile.tsv",
+                                 spool_dir=str(tmp_path / "spool"), on_job_done=on_job_done)
+    for future in dispatcher.check_health():
+        assert future.result(timeout=30) == IDLE
+
+    job = dispatcher.submit("Plate 1", tsv, program, total_steps=11)
+    assert done.wait(timeout=30)
+    assert finished == [("Plate 1", ROBOT, IDLE, "Finished Plate 1")]
+    assert dispatcher.unfinished() == 0
+    assert not os.path.exists(job.tsv)
+    assert server.stats["command_opentrons_execute"] == 1
+
+    dispatcher.shutdown()
+    pool.close_all()
+
+
+def test_robot_is_checked_again_after_a_plate_fails_to_start(robot, plate, tmp_path):
+    server, options = robot
+    tsv, program = plate
+    done = threading.Event()
+    finished = []
+
+    def on_job_done(job, robot_name, state, message):
+        finished.append((robot_name, state, message))
+        done.set()
+
+    pool = ConnectionPool(**options)
+    dispatcher = FleetDispatcher([{"name": ROBOT}], pool, NOTEBOOK_DIR, "ProcedureFile.tsv",
+                                 spool_dir=str(tmp_path / "spool"), on_job_done=on_job_done)
+    for future in dispatcher.check_health():
+        assert future.result(timeout=30) == IDLE
+
+    # A directory is in the way of the TSV file so the plate cannot start.  The robot is not left failed after the
+    # first attempt, it is checked again and given the plate until the dispatcher gives up.
+    os.makedirs(server.local_path(NOTEBOOK_DIR + "ProcedureFile.tsv"))
+    dispatcher.submit("Plate 1", tsv, program)
+    assert done.wait(timeout=30)
+    assert len(finished) == 1
+    robot_name, state, message = finished[0]
+    assert (robot_name, state) == (ROBOT, FAILED)
+    assert message.endswith("Gave up after {} attempts.".format(MAX_JOB_ATTEMPTS))
+    assert dispatcher.unfinished() == 0
+
+    dispatcher.shutdown()
+    pool.close_all()
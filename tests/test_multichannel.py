@@ -0,0 +1,64 @@
+"""
+Sheets with a multichannel pipette: the first tip, the pipette a single well move is given and the dispense rates.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import pytest
+
+from DryRun import ProtocolContext
+from TemplateValidator import TemplateValidator
+from Utilities import distribute_reagents
+
+
+def edit_sheet(tsv, old, new):
+    with open(tsv) as tsv_file:
+        text = tsv_file.read()
+    assert old in text
+    with open(tsv, 'w') as tsv_file:
+        tsv_file.write(text.replace(old, new))
+
+
+def test_multichannel_first_tip_in_row_a(sheet):
+    tsv = sheet("qpcr_384.tsv")
+    edit_sheet(tsv, "--RightPipetteFirstTip\tA1", "--RightPipetteFirstTip\tC3")
+    validator = TemplateValidator(tsv, "qPCR")
+    validator.validate()
+    assert [(d.line, d.message) for d in validator.errors] == \
+        [(16, "Starting tip C3 for the Right Pipette is not in row A.  The p20_multi_gen2 picks up a column of tips at "
+              "a time.")]
+
+    # A single channel pipette can start anywhere.
+    edit_sheet(tsv, "--LeftPipetteFirstTip\tA1", "--LeftPipetteFirstTip\tC3")
+    validator = TemplateValidator(tsv, "qPCR")
+    validator.validate()
+    assert [d.line for d in validator.errors] == [16]
+
+
+@pytest.mark.parametrize("pipette_name, rate", [("p20_multi_gen2", 7.56), ("p300_multi_gen2", 92.86),
+                                                ("p20_single_gen2", 7.56)])
+def test_distribute_puts_the_rates_back(pipette_name, rate):
+    ctx = ProtocolContext()
+    tips = ctx.load_labware("opentrons_96_tiprack_300ul" if "p300" in pipette_name else "opentrons_96_tiprack_20ul",
+                            "1")
+    reservoir = ctx.load_labware("nest_12_reservoir_15ml", "3")
+    plate = ctx.load_labware("biorad_hardshell_96_wellplate_150ul", "2")
+    pipette = ctx.load_instrument(pipette_name, "right", tip_racks=[tips])
+
+    distribute_reagents(pipette, reservoir["A1"], [plate["A1"], plate["A2"]], 25 if "p300" in pipette_name else 5)
+    assert (pipette.flow_rate.aspirate, pipette.flow_rate.dispense) == (rate, rate)
+
+
+def test_single_well_moves_use_the_single_channel_pipette(sheet):
+    tsv = sheet("qpcr_384.tsv")
+    edit_sheet(tsv, "--PCR_Volume\t10", "--PCR_Volume\t30")
+    validator = TemplateValidator(tsv, "qPCR")
+    validator.validate()
+    assert validator.errors == []
+
+    # 30 uL is more than the p20 takes, so the single channel pipette fills each well in two loops.
+    fills = [step for step in validator.plan.steps if step.label == "Fill column"]
+    assert fills and {(step.mount, step.loops, step.volume) for step in fills} == {("left", 2, 15.0)}
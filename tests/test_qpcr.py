@@ -0,0 +1,83 @@
+"""
+qPCR sheets are packed into a 384 well plate and run from their run plan.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import os
+
+import pytest
+
+from DryRun import dry_run
+from RunPlan import PLAN_PROTOCOL, run_plan_path, run_protocol
+from SheetPipeline import simulate_sheet, validate_sheet
+from SimulationWorker import SimulationError
+from Utilities import TEMPERATURE_MODULE, plate_layout
+
+PLATE = "appliedbiosystemsmicroamp_384_wellplate_40ul"
+
+
+def test_384_well_layout():
+    layout = plate_layout(PLATE)[0]
+    assert len(layout) == len(set(layout)) == 384
+    assert layout[:9] == ["A1", "C1", "E1", "G1", "I1", "K1", "M1", "O1", "B1"]
+    assert layout[-1] == "P24"
+
+
+def test_qpcr_sheet_runs_from_its_plan(sheet, capsys):
+    tsv = sheet("qpcr_384.tsv")
+    validator, printed = validate_sheet(tsv, "qPCR")
+    assert validator.diagnostics == []
+    # The plan summary comes back with the result instead of going to sys.stdout.
+    assert printed.startswith("Run plan:")
+    assert capsys.readouterr().out == ""
+    assert os.path.isfile(run_plan_path(tsv))
+    # The plan is kept in the GUI's own directory, not beside the user's sheet.
+    assert not os.path.exists(os.path.splitext(tsv)[0] + ".plan.json")
+    assert run_protocol("PCR.py", tsv) == PLAN_PROTOCOL
+
+    result = dry_run(PLAN_PROTOCOL, tsv)
+    assert result.volume_problems == []
+    assert {mount: count for mount, count in result.tips_used.items() if count} == \
+        validator.plan.tips_required()
+
+    # 40 samples with 3 targets and 3 replicates, a no template control for each target and the rest of the last
+    # column filled with water.
+    volumes = [result.ledger.volume("2", well) for well in plate_layout(PLATE)[0]]
+    assert volumes.count(10.0) == 368
+    assert volumes.count(0.0) == 16
+
+
+def test_qpcr_needs_a_384_well_plate(sheet):
+    tsv = sheet("qpcr_384.tsv")
+    with open(tsv) as tsv_file:
+        text = tsv_file.read().replace(PLATE, "biorad_hardshell_96_wellplate_150ul")
+    with open(tsv, 'w') as tsv_file:
+        tsv_file.write(text)
+
+    validator, printed = validate_sheet(tsv, "qPCR")
+    assert "qPCR reactions go in a 384 well plate but Slot 2 holds biorad_hardshell_96_wellplate_150ul." in \
+        [diagnostic.message for diagnostic in validator.errors]
+
+
+def test_qpcr_is_not_simulated_without_a_plan(sheet, tmp_path):
+    tsv = sheet("qpcr_384.tsv")
+    with pytest.raises(SimulationError):
+        simulate_sheet(None, None, "PCR.py", tsv, "qPCR", str(tmp_path / "qpcr_Simulation"))
+
+
+def test_plan_loads_the_temperature_module(sheet):
+    tsv = sheet("qpcr_384.tsv")
+    with open(tsv, 'a') as tsv_file:
+        tsv_file.write("--UseTemperatureModule\tTrue\n--Temperature\t10\n")
+    validator, printed = validate_sheet(tsv, "qPCR")
+    assert validator.diagnostics == []
+
+    result = dry_run(PLAN_PROTOCOL, tsv)
+    module = result.modules[2]
+    assert module.module_name == TEMPERATURE_MODULE
+    assert module.temperature == 10.0
+    assert module.labware.load_name == PLATE
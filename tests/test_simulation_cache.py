@@ -0,0 +1,48 @@
+"""
+The simulation cache key changes with everything that can change the outcome of a simulation.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import os
+
+from RunPlan import run_plan_path
+from SimulationCache import SimulationCache, simulation_key
+
+
+def test_key_follows_the_protocol_modules_and_the_run_plan(sheet, tmp_path):
+    tsv = sheet("qpcr_384.tsv")
+    protocol = tmp_path / "PCR.py"
+    protocol.write_text("import Helpers\n")
+    helpers = tmp_path / "Helpers.py"
+    helpers.write_text("VOLUME = 10\n")
+    key = simulation_key(str(protocol), tsv)
+    assert simulation_key(str(protocol), tsv) == key
+
+    helpers.write_text("VOLUME = 20\n")
+    module_key = simulation_key(str(protocol), tsv)
+    assert module_key != key
+
+    with open(run_plan_path(tsv), 'w') as plan_file:
+        plan_file.write("{}")
+    assert simulation_key(str(protocol), tsv) != module_key
+
+
+def test_evict_leaves_files_being_written(tmp_path):
+    cache = SimulationCache(str(tmp_path / "cache"), max_bytes=100)
+    cache.put("old", ["x" * 40], {})
+    writing = cache.writer("new")
+    writing.write_lines(["y" * 200])
+    stale = tmp_path / "cache" / "gone.log.123.tmp"
+    stale.write_text("z")
+    os.utime(str(stale), (0, 0))
+
+    # The temporary file of an unfinished entry is neither counted nor removed, a day old one is removed.
+    cache.evict()
+    assert cache.get("old") is not None
+    assert os.path.exists(writing.tmp_log)
+    assert not stale.exists()
+    writing.discard()
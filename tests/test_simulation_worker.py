@@ -0,0 +1,52 @@
+"""
+The custom labware cache replaces labware_from_paths where opentrons.simulate looks it up, and a simulation that fails
+part way leaves no step records behind.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from RunlogExport import RecordWriter, load_columns, step_record
+from SimulationWorker import _cache_custom_labware
+
+
+def test_cache_replaces_the_imported_name(tmp_path):
+    reads = []
+
+    def labware_from_paths(paths):
+        reads.append(paths)
+        return {"labware": len(reads)}
+
+    entrypoint_util = SimpleNamespace(labware_from_paths=labware_from_paths)
+    simulate = SimpleNamespace(labware_from_paths=labware_from_paths)
+    _cache_custom_labware(entrypoint_util, simulate)
+    assert simulate.labware_from_paths is entrypoint_util.labware_from_paths is not labware_from_paths
+
+    (tmp_path / "plate.json").write_text("{}")
+    paths = [str(tmp_path)]
+    assert simulate.labware_from_paths(paths) == simulate.labware_from_paths(paths) == {"labware": 1}
+
+    (tmp_path / "rack.json").write_text("{}")
+    assert simulate.labware_from_paths(paths) == {"labware": 2}
+
+
+def test_records_are_removed_when_the_simulation_fails(tmp_path):
+    paths = (str(tmp_path / "run.jsonl"), str(tmp_path / "run.npz"))
+    command = {"level": 0, "payload": {"text": "Picking up tip from A1 of Opentrons 96 Tip Rack 20 uL on slot 1"}}
+
+    with RecordWriter(*paths) as record_writer:
+        record_writer.write(step_record(1, command))
+    assert load_columns(paths[1])["command"].tolist() == ["pick_up_tip"]
+
+    with pytest.raises(RuntimeError):
+        with RecordWriter(*paths) as record_writer:
+            record_writer.write(step_record(1, command))
+            raise RuntimeError("simulation failed")
+    assert not any(os.path.exists(path) for path in paths)
@@ -0,0 +1,30 @@
+"""
+Malformed TSV files are reported as diagnostics with the line they are on.
+
+Dennis A. Simpson
+University of North Carolina at Chapel Hill
+Chapel Hill NC, 27599
+
+@copyright 2025
+"""
+import pytest
+
+from TemplateParser import HEADER_PROBLEM
+from TemplateValidator import TemplateValidator
+
+
+@pytest.mark.parametrize("text", ["garbage\n", "", "#ddPCR\n--Slot1\n"])
+def test_header_without_a_version(tmp_path, text):
+    tsv = tmp_path / "bad.tsv"
+    tsv.write_text(text)
+    validator = TemplateValidator(str(tsv), "ddPCR")
+    validator.validate()
+    assert (1, HEADER_PROBLEM) in [(d.line, d.message) for d in validator.errors]
+
+
+def test_line_that_is_not_an_option_or_sample(tmp_path):
+    tsv = tmp_path / "bad.tsv"
+    tsv.write_text("#ddPCR\t3.0.1\n--User\tTester\nfoo\tbar\n")
+    validator = TemplateValidator(str(tsv), "ddPCR")
+    validator.validate()
+    assert (3, "\"foo\" is not an option or a sample slot.") in [(d.line, d.message) for d in validator.errors]